@@ -15,6 +15,15 @@ MICRODROP_PARSER = ArgumentParser(description='MicroDrop: graphical user '
                                   'Microfluidics control system.',
                                   add_help=False)
 MICRODROP_PARSER.add_argument('-c', '--config', type=path, default=None)
+#: .. versionadded:: X.X.X
+MICRODROP_PARSER.add_argument('--profile-startup', action='store_true',
+                              help='Record startup timeline (see '
+                              '`microdrop.startup_profiler`).')
+#: .. versionadded:: X.X.X
+MICRODROP_PARSER.add_argument('--watchdog-threshold', type=float, default=1.,
+                              metavar='SECONDS', help='Report GTK main loop '
+                              'stalls longer than threshold (0 to disable; '
+                              'default=%(default)s).')
 
 
 def base_path():
@@ -14,11 +14,12 @@ from flatland import Integer, Form, String, Enum, Boolean
 from logging_helpers import _L, caller_name  #: .. versionadded:: 2.20
 from pygtkhelpers.ui.extra_widgets import Filepath
 from pygtkhelpers.ui.form_view_dialog import FormViewDialog
+import gobject
 import gtk
 import path_helpers as ph
 
 from . import base_path, MICRODROP_PARSER
-from . import plugin_manager, __version__
+from . import plugin_manager, startup_profiler, __version__
 from .app_context import (MODE_PROGRAMMING, MODE_REAL_TIME_PROGRAMMING,
                           MODE_RUNNING, MODE_REAL_TIME_RUNNING, SCREEN_LEFT,
                           SCREEN_TOP, SCREEN_WIDTH, SCREEN_HEIGHT,
@@ -32,6 +33,7 @@ from .plugin_helpers import AppDataController
 from .plugin_manager import (ExtensionPoint, SingletonPlugin,
                              implements, PluginGlobals)
 from .protocol import Step
+from .watchdog import MainLoopWatchdog
 from .default_paths import PROTOCOLS_DIR
 
 
@@ -110,6 +112,10 @@ class App(SingletonPlugin, AppDataController):
         .. versionchanged:: 2.17
             Remove :attr:`version` attribute.  Use
             :attr:`microdrop.__version__` instead.
+
+        .. versionchanged:: X.X.X
+            Record configuration loading as startup phase (see
+            :mod:`microdrop.startup_profiler`).
         '''
         args = parse_args()
 
@@ -138,7 +144,8 @@ class App(SingletonPlugin, AppDataController):
 
         # config model
         try:
-            self.config = Config(args.config)
+            with startup_profiler.phase('config', path=args.config):
+                self.config = Config(args.config)
         except IOError:
             logging.error('Could not read configuration file, `%s`.  Make sure'
                           ' it exists and is readable.', args.config)
@@ -157,6 +164,11 @@ class App(SingletonPlugin, AppDataController):
         # protocol
         self.protocol = None
 
+        #: .. versionadded:: X.X.X
+        #:     GTK main loop watchdog (see :meth:`run`).
+        self.watchdog = None
+        self._watchdog_threshold = args.watchdog_threshold
+
     @property
     def realtime_mode(self):
         '''
@@ -321,6 +333,20 @@ class App(SingletonPlugin, AppDataController):
         .. versionchanged:: 2.27
             Check for default device setting in ``MICRODROP_DEFAULT_DEVICE``
             environment variable.
+
+        .. versionchanged:: X.X.X
+            Record startup phases and write startup profile once the GUI is
+            ready, if enabled (see :mod:`microdrop.startup_profiler`).
+
+        .. versionchanged:: X.X.X
+            Once the GUI is ready, coalesce step options and protocol change
+            notifications emitted within the same GTK idle cycle (see
+            :func:`microdrop.plugin_manager.coalesce_signal`).
+
+        .. versionchanged:: X.X.X
+            Start GTK main loop watchdog (see
+            :class:`microdrop.watchdog.MainLoopWatchdog`) unless disabled with
+            ``--watchdog-threshold 0``.
         '''
         logger = _L()  # use logger with method context
         self.gtk_thread = threading.current_thread()
@@ -330,7 +356,8 @@ class App(SingletonPlugin, AppDataController):
                 'realtime_mode' in self.config.data[self.name]:
             self.config.data[self.name]['realtime_mode'] = False
 
-        plugin_manager.emit_signal('on_plugin_enable')
+        with startup_profiler.phase('on_plugin_enable (core plugins)'):
+            plugin_manager.emit_signal('on_plugin_enable')
         log_file = self.get_app_values()['log_file']
         if not log_file:
             self.set_app_values({'log_file':
@@ -354,7 +381,12 @@ class App(SingletonPlugin, AppDataController):
         plugins_dirs += [site_plugins_dir]
         for d in plugins_dirs:
             if d.isdir():
-                plugin_manager.load_plugins(d, import_from_parent=False)
+                # Only import enabled plugins (other plugins are imported
+                # when enabled).
+                with startup_profiler.phase('load_plugins', path=d):
+                    plugin_manager.load_plugins(d, import_from_parent=False,
+                                                enabled=self.config['plugins']
+                                                ['enabled'])
         self.update_log_file()
 
         logger.info('User data directory: %s', self.config['data_dir'])
@@ -388,15 +420,16 @@ class App(SingletonPlugin, AppDataController):
         schedule = plugin_manager.get_schedule(observers, "on_plugin_enable")
 
         # Load optional plugins marked as enabled in config
-        for p in schedule:
-            try:
-                plugin_manager.enable(p)
-            except KeyError:
-                logger.warning('Requested plugin (%s) is not available.\n\n'
-                               'Please check that it exists in the plugins '
-                               'directory:\n\n    %s' %
-                               (p, self.config['plugins']['directory']),
-                               exc_info=True)
+        with startup_profiler.phase('enable plugins'):
+            for p in schedule:
+                try:
+                    plugin_manager.enable(p)
+                except KeyError:
+                    logger.warning('Requested plugin (%s) is not available.'
+                                   '\n\nPlease check that it exists in the '
+                                   'plugins directory:\n\n    %s' %
+                                   (p, self.config['plugins']['directory']),
+                                   exc_info=True)
         plugin_manager.log_summary()
 
         self.experiment_log = None
@@ -438,7 +471,8 @@ class App(SingletonPlugin, AppDataController):
             device_path = DEVICES_DIR.joinpath(device_path)
 
         # load the device.
-        self.dmf_device_controller.load_device(device_path)
+        with startup_profiler.phase('load_device', path=device_path):
+            self.dmf_device_controller.load_device(device_path)
 
         if 'name' in self.config['protocol']:
             if self.config['protocol']['name'] is not None:
@@ -459,7 +493,8 @@ class App(SingletonPlugin, AppDataController):
                 # Assume protocol path is relative to protocols directory.
                 protocol_path = PROTOCOLS_DIR.joinpath(protocol_path)
             # load the protocol.
-            self.protocol_controller.load_protocol(protocol_path)
+            with startup_profiler.phase('load_protocol', path=protocol_path):
+                self.protocol_controller.load_protocol(protocol_path)
         else:
             # Create new protocol.
             self.protocol_controller.create_protocol()
@@ -472,7 +507,20 @@ class App(SingletonPlugin, AppDataController):
 
         self.main_window_controller.view.resize(data['width'], data['height'])
         self.main_window_controller.view.move(data['x'], data['y'])
-        plugin_manager.emit_signal('on_gui_ready')
+        with startup_profiler.phase('on_gui_ready'):
+            plugin_manager.emit_signal('on_gui_ready')
+        startup_profiler.finish()
+
+        # Deliver bursts of step options changes (e.g., while dragging across
+        # electrodes) once per distinct `(plugin, step_number)`, and the
+        # resulting `on_protocol_changed` cascade once, per GTK idle cycle.
+        plugin_manager.coalesce_signal('on_step_options_changed', key=tuple)
+        plugin_manager.coalesce_signal('on_protocol_changed')
+        plugin_manager.set_coalesce_scheduler(gobject.idle_add)
+
+        if self._watchdog_threshold > 0:
+            self.watchdog = MainLoopWatchdog(self._watchdog_threshold)\
+                .start(self.gtk_thread)
         self.main_window_controller.main()
 
     def _set_log_level(self, level):
@@ -541,6 +589,16 @@ class App(SingletonPlugin, AppDataController):
             else:
                 self._destroy_log_file_handler()
 
+    def on_app_exit(self):
+        '''
+        .. versionadded:: X.X.X
+            Stop GTK main loop watchdog and log ranked stall report.
+        '''
+        if self.watchdog is not None:
+            self.watchdog.stop()
+            _L().info(self.watchdog.report())
+            self.watchdog = None
+
     def on_dmf_device_swapped(self, old_dmf_device, dmf_device):
         self.dmf_device = dmf_device
 
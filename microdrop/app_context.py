@@ -1,16 +1,63 @@
 '''
 .. versionchanged:: 2.26
     Add screen geometry and window titlebar height constants.
+
+.. versionchanged:: X.X.X
+    Do not import GTK when running headless (see :func:`is_headless`).
 '''
 import os
 
-import gtk
+
+#: .. versionadded:: X.X.X
+#:     Environment variable set to run without GTK (e.g., headless protocol
+#:     runner, see :mod:`microdrop.headless`).
+HEADLESS_ENV = 'MICRODROP_HEADLESS'
+
+
+def is_headless():
+    '''
+    .. versionadded:: X.X.X
+
+    Returns
+    -------
+    bool
+        ``True`` if running without GTK main loop (i.e., if
+        :data:`HEADLESS_ENV` environment variable is set).
+    '''
+    return bool(os.environ.get(HEADLESS_ENV))
+
+
+def gtk_threadsafe(function):
+    '''
+    .. versionadded:: X.X.X
+
+    Wrap function to be called in the GTK main loop (see
+    :func:`pygtkhelpers.gthreads.gtk_threadsafe`).
+
+    If running headless (see :func:`is_headless`), function is returned
+    unwrapped (i.e., called directly).
+    '''
+    if is_headless():
+        return function
+    from pygtkhelpers.gthreads import gtk_threadsafe as gtk_threadsafe_
+
+    return gtk_threadsafe_(function)
 
 
 def get_app():
+    '''
+    .. versionchanged:: X.X.X
+        Fall back to headless application (see
+        :class:`microdrop.headless.HeadlessApp`) if GUI application is not
+        registered.
+    '''
     import plugin_manager
 
-    class_ = plugin_manager.get_service_class('App', env='microdrop')
+    try:
+        class_ = plugin_manager.get_service_class('App', env='microdrop')
+    except KeyError:
+        class_ = plugin_manager.get_service_class('HeadlessApp',
+                                                  env='microdrop')
     return plugin_manager.get_service_instance(class_, env='microdrop')
 
 
@@ -42,8 +89,27 @@ MODE_REAL_TIME_MASK = MODE_REAL_TIME_PROGRAMMING | MODE_REAL_TIME_RUNNING
 MODE_RUNNING_MASK = MODE_RUNNING | MODE_REAL_TIME_RUNNING
 MODE_PROGRAMMING_MASK = MODE_PROGRAMMING | MODE_REAL_TIME_PROGRAMMING
 
-SCREEN_HEIGHT = int(os.environ.get('SCREEN_HEIGHT', gtk.gdk.screen_height()))
-SCREEN_WIDTH = int(os.environ.get('SCREEN_WIDTH', gtk.gdk.screen_width()))
+
+def _screen_size():
+    '''
+    .. versionadded:: X.X.X
+
+    Returns
+    -------
+    tuple
+        Screen ``(width, height)`` from GTK, or ``(1024, 768)`` if running
+        headless.
+    '''
+    if is_headless():
+        return 1024, 768
+    import gtk
+
+    return gtk.gdk.screen_width(), gtk.gdk.screen_height()
+
+
+_SCREEN_SIZE = _screen_size()
+SCREEN_HEIGHT = int(os.environ.get('SCREEN_HEIGHT', _SCREEN_SIZE[1]))
+SCREEN_WIDTH = int(os.environ.get('SCREEN_WIDTH', _SCREEN_SIZE[0]))
 SCREEN_LEFT = int(os.environ.get('SCREEN_LEFT', 0))
 SCREEN_TOP = int(os.environ.get('SCREEN_TOP', 0))
 TITLEBAR_HEIGHT = int(os.environ.get('TITLEBAR_HEIGHT', 23))
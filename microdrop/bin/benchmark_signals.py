@@ -0,0 +1,129 @@
+'''
+Benchmark plugin signal dispatch rate of
+:func:`microdrop.plugin_manager.emit_signal`.
+
+Signals are emitted to a set of dummy plugins, with the first few plugins
+requesting to be scheduled in order (like typical plugin schedule requests).  The dispatch rate is measured using
+cached dispatch tables, with dispatch tables rebuilt for every signal (i.e.,
+the cost of querying observers and schedule requests), and using concurrent
+dispatch (i.e., the thread pool overhead).
+
+Example
+-------
+
+    python -m microdrop.bin.benchmark_signals --plugins 20 --duration 2
+
+.. versionadded:: X.X.X
+'''
+import argparse
+import logging
+import time
+
+from pyutilib.component.core import Plugin, PluginGlobals, implements
+
+from microdrop.interfaces import IPlugin
+import microdrop.plugin_manager as pm
+
+
+#: Number of plugins with schedule requests.
+SCHEDULED_PLUGINS = 3
+
+
+PluginGlobals.push_env('microdrop.benchmark')
+
+
+class BenchmarkPlugin(Plugin):
+    '''
+    Dummy plugin.  Plugins with index 1 to :data:`SCHEDULED_PLUGINS` - 1 are
+    scheduled after the plugin with the preceding index.
+    '''
+    implements(IPlugin)
+
+    def __init__(self, index):
+        self.index = index
+        self.name = 'microdrop.benchmark_plugin_%d' % index
+
+    def get_schedule_requests(self, function_name):
+        if 0 < self.index < SCHEDULED_PLUGINS:
+            return [pm.ScheduleRequest('microdrop.benchmark_plugin_%d' %
+                                       (self.index - 1), self.name)]
+        return []
+
+    def on_step_options_changed(self, plugin, step_number):
+        return step_number
+
+
+PluginGlobals.pop_env()
+
+
+def signals_per_second(duration, invalidate=False, concurrent=False):
+    '''
+    Parameters
+    ----------
+    duration : float
+        Minimum benchmark duration (in seconds).
+    invalidate : bool, optional
+        If ``True``, rebuild dispatch tables for every signal.
+    concurrent : bool, optional
+        If ``True``, use concurrent dispatch.
+
+    Returns
+    -------
+    float
+        Number of signals emitted per second.
+    '''
+    count = 0
+    start = time.time()
+    while True:
+        if invalidate:
+            pm.invalidate_dispatch_tables()
+        pm.emit_signal('on_step_options_changed',
+                       ['microdrop.benchmark_plugin_0', count],
+                       concurrent=concurrent)
+        count += 1
+        elapsed = time.time() - start
+        if elapsed >= duration:
+            return count / elapsed
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark plugin signal '
+                                     'dispatch rate.')
+    parser.add_argument('-n', '--plugins', type=int, default=20,
+                        help='Number of plugins (default=%(default)s).')
+    parser.add_argument('-t', '--duration', type=float, default=2.,
+                        help='Duration of each benchmark in seconds '
+                        '(default=%(default)s).')
+    parser.add_argument('--debug', action='store_true', help='Enable debug '
+                        'logging in plugin manager (e.g., caller lookup).')
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    # Discard plugin manager log records (debug records are still created if
+    # debug logging is enabled).
+    logger = logging.getLogger(pm.__name__)
+    logger.setLevel(logging.DEBUG if args.debug else logging.INFO)
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    plugins = [BenchmarkPlugin(i) for i in xrange(args.plugins)]
+    try:
+        print '%d plugins, debug logging %s' % (len(plugins), 'on' if
+                                                args.debug else 'off')
+        for label, invalidate, concurrent in (('cached', False, False),
+                                              ('uncached', True, False),
+                                              ('concurrent', False, True)):
+            print '  %-10s: %10.0f signals/s' % \
+                (label, signals_per_second(args.duration,
+                                           invalidate=invalidate,
+                                           concurrent=concurrent))
+    finally:
+        for plugin_i in plugins:
+            plugin_i.deactivate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+'''
+Run a protocol without the GTK user interface and print the duration of each
+step (see :mod:`microdrop.headless`).
+
+Only the core plugins required to execute steps and the plugins listed with
+``--plugin`` are enabled.  Plugins are loaded from the directories listed in
+the ``MICRODROP_PLUGINS_PATH`` environment variable (``;``-separated) and
+from ``<prefix>/etc/microdrop/plugins/enabled``, or from the directories
+listed with ``--plugins-dir``.
+
+Example
+-------
+
+    python -m microdrop.bin.run_protocol device.svg protocol.json \\
+        --plugin dropbot_plugin --repeats 3
+
+To benchmark step execution without hardware, use the simulated electrode
+actuator and waveform generator (see
+:mod:`microdrop.core_plugins.simulator_plugin`)::
+
+    python -m microdrop.bin.run_protocol device.svg protocol.json \\
+        --simulate --latency 0.01 --jitter 0.005 --duration-scale 0
+
+Use ``--pipeline`` to start each step while the previous step is executing,
+and compare the gap between the actuations of consecutive steps.
+
+.. versionadded:: X.X.X
+'''
+import argparse
+import logging
+import os
+import sys
+
+# Import before any module depending on GTK.
+import microdrop.headless as headless
+from microdrop.app_context import get_app
+import microdrop.plugin_manager as pm
+import path_helpers as ph
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description='Run protocol without GUI '
+                                     'and print step timings.')
+    parser.add_argument('device', type=ph.path, help='Device SVG file.')
+    parser.add_argument('protocol', type=ph.path, help='Protocol file.')
+    parser.add_argument('-p', '--plugin', dest='plugins', action='append',
+                        default=[], metavar='PACKAGE_NAME', help='Package '
+                        'name of plugin to enable (may be repeated).')
+    parser.add_argument('-d', '--plugins-dir', dest='plugins_dirs',
+                        action='append', type=ph.path, metavar='DIR',
+                        help='Directory to load plugins from (may be '
+                        'repeated).')
+    parser.add_argument('-c', '--config', type=ph.path, default=None,
+                        help='MicroDrop configuration file (default: user '
+                        'configuration file).')
+    parser.add_argument('-n', '--repeats', type=int, default=None,
+                        help='Number of times to run protocol (default: '
+                        'protocol repeats setting).')
+    parser.add_argument('--pipeline', action='store_true', help='Start each '
+                        'step while the previous step is executing.')
+    simulator = parser.add_argument_group('simulator')
+    simulator.add_argument('-s', '--simulate', action='store_true',
+                           help='Enable simulated electrode actuator and '
+                           'waveform generator.')
+    simulator.add_argument('--latency', type=float, help='Simulated request '
+                           'latency in seconds.')
+    simulator.add_argument('--jitter', type=float, help='Maximum simulated '
+                           'latency jitter in seconds.')
+    simulator.add_argument('--failure-rate', type=float, help='Probability '
+                           'of simulated request failure.')
+    simulator.add_argument('--duration-scale', type=float, help='Scale '
+                           'simulated actuation durations (e.g., 0 to skip '
+                           'waiting).')
+    simulator.add_argument('--seed', type=int, help='Simulator random seed.')
+    parser.add_argument('-l', '--log-level', default='warning',
+                        choices=('debug', 'info', 'warning', 'error'),
+                        help='Log level (default=%(default)s).')
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()))
+
+    plugins_dirs = args.plugins_dirs
+    if plugins_dirs is None:
+        plugins_dirs = [ph.path(p.strip())
+                        for p in os.environ.get('MICRODROP_PLUGINS_PATH',
+                                                '').split(';') if p.strip()]
+        plugins_dirs += [ph.path(sys.prefix).joinpath('etc', 'microdrop',
+                                                      'plugins', 'enabled')]
+
+    app = get_app()
+    app.load_config(args.config)
+    enabled = headless.initialize_plugins(args.plugins, plugins_dirs,
+                                          simulate=args.simulate)
+    if args.simulate:
+        simulator = pm.get_service_instance_by_name('microdrop'
+                                                    '.simulator_plugin',
+                                                    env='microdrop')
+        simulator.set_app_values({'latency_s': args.latency,
+                                  'jitter_s': args.jitter,
+                                  'failure_rate': args.failure_rate,
+                                  'duration_scale': args.duration_scale,
+                                  'seed': args.seed})
+        simulator.reset()
+    print 'Enabled plugins: %s' % ', '.join(enabled)
+    app.load_device(args.device)
+    protocol = app.load_protocol(args.protocol)
+    print 'Protocol `%s`: %d steps' % (args.protocol.name, len(protocol))
+
+    try:
+        timings = headless.run(protocol, repeats=args.repeats,
+                               pipeline=args.pipeline)
+    finally:
+        pm.emit_signal('on_app_exit')
+    print headless.format_timings(timings)
+
+
+if __name__ == '__main__':
+    main()
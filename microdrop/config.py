@@ -29,6 +29,12 @@ class Config(object):
         # Path to most recently used DMF device
         filepath = string(default='')
 
+        # Number of recently used DMF devices to keep in memory (0 to disable)
+        cache_size = integer(min=0, default=4)
+
+        # Maximum memory (in MB) used by recently used DMF devices
+        cache_memory_mb = float(min=0, default=256)
+
         [protocol]
         # name of the most recently used protocol
         filepath = string(default='')
@@ -0,0 +1,322 @@
+'''
+.. versionadded:: X.X.X
+
+Parallel, tiled auto-detection of connections between adjacent electrodes.
+
+Electrodes are considered adjacent according to the same rule as
+:func:`svg_model.connections.extract_adjacent_shapes`, i.e., each electrode
+is stretched independently in the ``x`` and ``y`` direction by an absolute
+distance, and is adjacent to all electrodes overlapped by the edges of the
+stretched electrode.
+
+Instead of testing every electrode against every other electrode, the device
+is partitioned into spatial tiles.  Each tile tests the electrodes *centered*
+in the tile against candidate electrodes looked up in a bounding box index,
+i.e., electrodes overlapping the tile extent plus an overlap margin of the
+stretch distance.  Tiles are processed in a process pool and the connections
+found in each tile are merged.
+
+Example
+-------
+
+    >>> def on_progress(fraction):
+    ...     print 'Detecting connections: %.0f%%' % (100 * fraction)
+    >>> svg_output = auto_detect_adjacent_shapes('device.svg',
+    ...                                          progress=on_progress)
+'''
+import math
+import multiprocessing
+
+from svg_model import svg_shapes_to_df
+from svg_model.draw import draw_lines_svg_layer
+import numpy as np
+import pandas as pd
+
+from spatial_index import ElectrodeSpatialIndex
+
+
+#: Default target number of electrodes centered in each tile.
+SHAPES_PER_TILE = 256
+#: Minimum number of shapes to use a process pool for by default (for smaller
+#: devices, the cost of starting worker processes outweighs the speed-up).
+PARALLEL_MIN_SHAPES = 5000
+
+
+def stretched_bounding_boxes(bounding_boxes, extend):
+    '''
+    Parameters
+    ----------
+    bounding_boxes : numpy.ndarray
+        ``N x 4`` array of shape bounding boxes, with the columns ``xmin``,
+        ``ymin``, ``xmax``, and ``ymax``.
+    extend : float
+        Absolute distance to stretch each shape away from its center.
+
+    Returns
+    -------
+    tuple
+        ``(x_stretched, y_stretched)`` bounding boxes of each shape stretched
+        in the ``x`` and ``y`` direction, respectively.
+
+        .. note:: Matching :func:`svg_model.connections.extend_shapes`,
+            vertices at the center of a shape (i.e., of a shape with zero
+            width or height) are moved in the positive direction.
+    '''
+    xmin, ymin, xmax, ymax = np.asarray(bounding_boxes, dtype=float).T
+    x_stretched = np.column_stack([np.where(xmax > xmin, xmin - extend,
+                                            xmin + extend),
+                                   ymin, xmax + extend, ymax])
+    y_stretched = np.column_stack([xmin, np.where(ymax > ymin, ymin - extend,
+                                                  ymin + extend),
+                                   xmax, ymax + extend])
+    return x_stretched, y_stretched
+
+
+def adjacent_pairs(boxes, x_stretched, y_stretched, candidate_boxes):
+    '''
+    Test shapes against candidate shapes for adjacency.
+
+    Parameters
+    ----------
+    boxes, x_stretched, y_stretched : numpy.ndarray
+        Bounding boxes of ``N`` shapes to test, and of the same shapes
+        stretched in the ``x`` and ``y`` direction (see
+        :func:`stretched_bounding_boxes`).
+    candidate_boxes : numpy.ndarray
+        Bounding boxes of ``M`` candidate shapes.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``N x M`` boolean array, ``True`` where the candidate shape is
+        adjacent to the tested shape.
+    '''
+    cx0, cy0, cx1, cy1 = [column[None, :] for column in candidate_boxes.T]
+    xx0, xy0, xx1, xy1 = [column[:, None] for column in x_stretched.T]
+    yx0, yy0, yx1, yy1 = [column[:, None] for column in y_stretched.T]
+    # Stretched shape edge in `x` direction overlaps candidate...
+    x_adjacent = ((((cx0 < xx1) & (cx1 >= xx1)) |
+                   ((cx0 < xx0) & (cx1 >= xx0))) &
+                  # ...and shapes overlap in `y` direction.
+                  (cy0 < xy1) & (cy1 > xy0))
+    # Stretched shape edge in `y` direction overlaps candidate...
+    y_adjacent = ((((cy0 < yy1) & (cy1 >= yy1)) |
+                   ((cy0 < yy0) & (cy1 >= yy0))) &
+                  # ...and shapes overlap in `x` direction.
+                  (cx0 < yx1) & (cx1 > yx0))
+    return x_adjacent | y_adjacent
+
+
+def _detect_tile(args):
+    '''
+    Returns
+    -------
+    numpy.ndarray
+        ``K x 2`` array of ``(shape, candidate)`` integer index pairs, where
+        the candidate is adjacent to the shape.
+    '''
+    shapes, candidates, boxes, candidate_boxes, extend = args
+    x_stretched, y_stretched = stretched_bounding_boxes(boxes, extend)
+    rows, columns = np.nonzero(adjacent_pairs(boxes, x_stretched, y_stretched,
+                                              candidate_boxes))
+    return np.column_stack([shapes[rows], candidates[columns]])
+
+
+def tile_tasks(index, extend, shapes_per_tile=SHAPES_PER_TILE):
+    '''
+    Partition shapes into spatial tiles.
+
+    Parameters
+    ----------
+    index : microdrop.spatial_index.ElectrodeSpatialIndex
+        Bounding box index of shapes.
+    extend : float
+        Absolute distance to stretch each shape; used as tile overlap margin.
+    shapes_per_tile : int, optional
+        Target number of shapes centered in each tile.
+
+    Returns
+    -------
+    list
+        One ``(shapes, candidates, boxes, candidate_boxes, extend)`` task per
+        non-empty tile, where ``shapes`` are the integer indexes of the shapes
+        centered in the tile and ``candidates`` are the integer indexes of the
+        shapes overlapping the tile extent (including the margin).
+    '''
+    boxes = index.bounding_boxes
+    centers = .5 * (boxes[:, :2] + boxes[:, 2:])
+    origin = centers.min(axis=0)
+    extent = np.maximum(centers.max(axis=0) - origin, 1e-9)
+    # Choose square tiles such that each tile has roughly the target number
+    # of shape centers (assuming evenly distributed shapes).
+    tile_count = max(int(math.ceil(boxes.shape[0] /
+                                   float(shapes_per_tile))), 1)
+    tile_size = math.sqrt(extent.prod() / tile_count)
+    tile_size = max(tile_size, extent.max() / tile_count)
+    tile_shape = np.minimum(np.floor(extent / tile_size).astype(int) + 1,
+                            tile_count)
+    tiles = np.minimum(np.floor((centers - origin) / tile_size).astype(int),
+                       tile_shape - 1)
+    tile_ids = tiles[:, 1] * tile_shape[0] + tiles[:, 0]
+
+    order = np.argsort(tile_ids, kind='mergesort')
+    boundaries = np.flatnonzero(np.diff(tile_ids[order])) + 1
+    tasks = []
+    for shapes in np.split(order, boundaries):
+        if not shapes.size:
+            continue
+        # Shapes centered in tile may extend beyond the tile, so use extent
+        # of their bounding boxes (plus margin) to look up candidates.
+        xmin, ymin = boxes[shapes, :2].min(axis=0) - extend
+        xmax, ymax = boxes[shapes, 2:].max(axis=0) + extend
+        candidates = index.electrode_indexes_in_rect(xmin, ymin, xmax, ymax)
+        tasks.append((shapes, candidates, boxes[shapes], boxes[candidates],
+                      extend))
+    return tasks
+
+
+def detect_adjacent_shapes(df_shapes, shape_i_column='id', extend=1.5,
+                           shapes_per_tile=SHAPES_PER_TILE, processes=None,
+                           progress=None):
+    '''
+    Find connections between adjacent shapes.
+
+    Parameters
+    ----------
+    df_shapes : pandas.DataFrame
+        Table of shape vertices, with one row per vertex and the columns
+        ``vertex_i``, ``x``, and ``y``.
+    shape_i_column : str, optional
+        Column identifying the shape of each vertex.
+    extend : float, optional
+        Absolute distance to stretch each shape in the ``x`` and ``y``
+        direction.
+    shapes_per_tile : int, optional
+        Target number of shapes centered in each tile.
+    processes : int, optional
+        Number of worker processes.  By default, the number of CPUs is used
+        for devices with at least :data:`PARALLEL_MIN_SHAPES` shapes.  If
+        there is only a single tile or ``processes`` is 1, tiles are processed
+        in the current process.
+    progress : function, optional
+        Callback called with the fraction of tiles processed (i.e., from 0
+        to 1) after each tile is processed.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Frame with the columns ``source`` and ``target``, with one row per
+        connection, sorted by ``source`` and ``target``.
+
+        Equivalent to the result of
+        :func:`svg_model.connections.extract_adjacent_shapes` (i.e., the
+        source of each connection is the shape listed first in ``df_shapes``
+        among the shapes adjacent to each other).
+    '''
+    if not df_shapes.shape[0]:
+        return pd.DataFrame(None, columns=['source', 'target'])
+
+    index = ElectrodeSpatialIndex(df_shapes, shape_i_column)
+    tasks = tile_tasks(index, extend, shapes_per_tile=shapes_per_tile)
+
+    if processes is None:
+        processes = (multiprocessing.cpu_count()
+                     if index.electrode_ids.size >= PARALLEL_MIN_SHAPES else 1)
+    processes = min(processes, len(tasks))
+
+    if processes > 1:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.imap_unordered(_detect_tile, tasks)
+            pairs = _collect(results, len(tasks), progress)
+        finally:
+            pool.terminate()
+    else:
+        pairs = _collect((_detect_tile(task_i) for task_i in tasks),
+                         len(tasks), progress)
+
+    # Rank of each shape in order of appearance in `df_shapes`.
+    appearance = pd.unique(df_shapes[shape_i_column].values)
+    rank = np.empty(appearance.size, dtype=int)
+    rank[np.searchsorted(index.electrode_ids, appearance)] = \
+        np.arange(appearance.size)
+
+    # Keep a single connection for each pair of adjacent shapes, preferring
+    # the connection from the shape listed first.
+    sources, targets = pairs.T
+    first = np.minimum(rank[sources], rank[targets])
+    second = np.maximum(rank[sources], rank[targets])
+    reverse = rank[sources] > rank[targets]
+    order = np.lexsort([reverse, second, first])
+    keys = first[order] * appearance.size + second[order]
+    unique = order[np.r_[True, keys[1:] != keys[:-1]]] if keys.size else order
+
+    df_connections = pd.DataFrame({'source': index.electrode_ids
+                                   [sources[unique]],
+                                   'target': index.electrode_ids
+                                   [targets[unique]]},
+                                  columns=['source', 'target'])
+    return (df_connections.sort_values(['source', 'target'])
+            .reset_index(drop=True))
+
+
+def _collect(results, task_count, progress):
+    '''
+    Returns
+    -------
+    numpy.ndarray
+        Concatenated ``(shape, candidate)`` pairs of all tile results.
+    '''
+    frames = [np.empty((0, 2), dtype=int)]
+    for i, pairs_i in enumerate(results):
+        frames.append(pairs_i)
+        if progress is not None:
+            progress((i + 1) / float(task_count))
+    return np.concatenate(frames)
+
+
+def auto_detect_adjacent_shapes(svg_source, shape_i_attr='id',
+                                layer_name='Connections',
+                                shapes_xpath='//svg:path | //svg:polygon',
+                                extend=1.5, shapes_per_tile=SHAPES_PER_TILE,
+                                processes=None, progress=None):
+    '''
+    Automatically find adjacent shapes in a SVG document and draw each
+    connection as a line between the centers of the corresponding shapes.
+
+    Drop-in replacement for
+    :func:`svg_model.detect_connections.auto_detect_adjacent_shapes`, see
+    :func:`detect_adjacent_shapes` for additional parameters.
+
+    Returns
+    -------
+    StringIO.StringIO
+        File-like object containing SVG document with layer named according to
+        :data:`layer_name` with the detected connections drawn as ``svg:line``
+        instances.
+    '''
+    df_shapes = svg_shapes_to_df(svg_source, xpath=shapes_xpath)
+    df_connections = detect_adjacent_shapes(df_shapes, shape_i_attr,
+                                            extend=extend,
+                                            shapes_per_tile=shapes_per_tile,
+                                            processes=processes,
+                                            progress=progress)
+
+    # Center coordinate of each shape bounding box.
+    df_bounding_boxes = df_shapes.groupby(shape_i_attr).agg({'x': ['min',
+                                                                   'max'],
+                                                             'y': ['min',
+                                                                   'max']})
+    df_shape_centers = pd.DataFrame({'x': df_bounding_boxes.x.mean(axis=1),
+                                     'y': df_bounding_boxes.y.mean(axis=1)})
+    sources = (df_shape_centers.loc[df_connections.source]
+               .reset_index(drop=True))
+    targets = (df_shape_centers.loc[df_connections.target]
+               .reset_index(drop=True))
+    df_endpoints = pd.DataFrame({'x_source': sources.x,
+                                 'y_source': sources.y,
+                                 'x_target': targets.x,
+                                 'y_target': targets.y},
+                                columns=['x_source', 'y_source', 'x_target',
+                                         'y_target'])
+    return draw_lines_svg_layer(df_endpoints, layer_name=layer_name)
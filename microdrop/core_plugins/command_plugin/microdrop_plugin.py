@@ -1,7 +1,6 @@
 import logging
 
 from logging_helpers import _L
-from pygtkhelpers.gthreads import gtk_threadsafe
 import threading
 import zmq
 
@@ -44,16 +44,49 @@ class DeviceInfoZmqPlugin(ZmqPlugin):
         .. versionchanged:: 2.25
             Emit ``on_dmf_device_changed`` in main GTK thread to ensure
             thread-safety.
+
+        .. versionchanged:: X.X.X
+            Only emit ``on_dmf_device_changed`` if channels of electrode were
+            changed by this request.
         '''
         data = decode_content_data(request)
         app = get_app()
-        modified = (app.dmf_device
-                    .set_electrode_channels(data['electrode_id'],
-                                            data['channels']))
-        if modified:
+        changed = (app.dmf_device
+                   .set_electrode_channels_many({data['electrode_id']:
+                                                 data['channels']}))
+        if changed:
             gtk_threadsafe(emit_signal)("on_dmf_device_changed",
                                         [app.dmf_device])
-        return modified
+        return app.dmf_device.dirty
+
+    def on_execute__set_electrode_channels_many(self, request):
+        '''
+        Set channels for multiple electrodes.
+
+        .. note:: Existing channels assigned to each electrode are
+            overwritten.
+
+        Parameters
+        ----------
+        electrode_channels : dict
+            Mapping from electrode identifier to list of channel identifiers
+            assigned to the electrode.
+
+        Returns
+        -------
+        list
+            Identifiers of electrodes with changed channels.
+
+        .. versionadded:: X.X.X
+        '''
+        data = decode_content_data(request)
+        app = get_app()
+        changed = (app.dmf_device
+                   .set_electrode_channels_many(data['electrode_channels']))
+        if changed:
+            gtk_threadsafe(emit_signal)("on_dmf_device_changed",
+                                        [app.dmf_device])
+        return sorted(changed)
 
     def on_execute__dumps(self, request):
         app = get_app()
@@ -71,6 +104,9 @@ class DeviceInfoZmqPlugin(ZmqPlugin):
               - e.g., ``"electrode028"``
 
         .. versionadded:: 2.25
+
+        .. versionchanged:: X.X.X
+            Look up current channels using :meth:`DmfDevice.get_channels`.
         '''
         data = decode_content_data(request)
         electrode_id = data['electrode_id']
@@ -79,18 +115,7 @@ class DeviceInfoZmqPlugin(ZmqPlugin):
         # Create schema to only accept a well-formed comma-separated list
         # of integer channel numbers.  Default to list of channels
         # currently mapped to electrode.
-        if electrode_id in app.dmf_device.channels_by_electrode.index:
-            # If there is a single channel mapped to the electrode, the
-            # `...ix[electrode_id]` lookup below returns a `pandas.Series`.
-            # However, if multiple channels are mapped to the electrode the
-            # `...ix[electrode_id]` lookup returns a `pandas.DataFrame`.
-            # Calling `.values.ravel()` returns data in the same form in either
-            # situation.
-            current_channels = (app.dmf_device.channels_by_electrode
-                                .ix[[electrode_id]].values.ravel().tolist())
-        else:
-            # Electrode has no channels currently mapped to it.
-            current_channels = []
+        current_channels = app.dmf_device.get_channels(electrode_id)
         schema = {'type': 'object',
                   'properties': {'channels':
                                  {'type': 'string', 'pattern':
@@ -5,12 +5,118 @@ import datetime as dt
 import logging
 
 from logging_helpers import _L
+import blinker
 import pandas as pd
 import si_prefix as si
 import trollius as asyncio
 
 NAME = 'microdrop.electrode_controller_plugin'
 
+# Caller lookup of `_L()` is too slow for the path between actuations.
+logger = logging.getLogger(__name__)
+
+
+class WaveformCache(object):
+    '''
+    .. versionadded:: X.X.X
+
+    Waveform parameters (e.g., ``voltage``, ``frequency``) last set by
+    :func:`execute_actuation`, along with the waveform generators they were
+    set on (see :func:`waveform_generators`).
+
+    A parameter is only set again if its value changed.  The whole cache is
+    invalidated if any parameter is handled by a different set of waveform
+    generators (see :meth:`update_generators`), e.g., when a waveform
+    generator plugin is enabled.  The cache must also be invalidated whenever
+    the waveform generator state is otherwise unknown (e.g., after an error,
+    a hardware reconnect, or a protocol pause).
+
+    .. note::
+        Waveform generators are held by reference (not by ``id()``), so a
+        generator collected after a step can not be mistaken for a new one.
+    '''
+    def __init__(self):
+        self._values = {}
+
+    def is_set(self, key, value, generators):
+        '''
+        Parameters
+        ----------
+        key : str
+            Waveform parameter name.
+        value : float
+            Waveform parameter value.
+        generators : frozenset
+            Waveform generators handling ``set-<key>`` signal (see
+            :func:`waveform_generators`).
+
+        Returns
+        -------
+        bool
+            ``True`` if :data:`value` was last set on :data:`generators`.
+        '''
+        return self._values.get(key) == (value, generators)
+
+    def update(self, key, value, generators):
+        self._values[key] = (value, generators)
+
+    def update_generators(self, generators):
+        '''
+        Invalidate cache if any parameter was last set on different waveform
+        generators.
+
+        Parameters
+        ----------
+        generators : dict
+            Waveform generators handling each ``set-<key>`` signal (see
+            :func:`waveform_generators`), keyed by parameter name.
+        '''
+        if any(key in self._values and self._values[key][1] != generators_i
+               for key, generators_i in generators.iteritems()):
+            self.invalidate()
+
+    def invalidate(self):
+        self._values.clear()
+
+
+def waveform_generators(signal):
+    '''
+    .. versionadded:: X.X.X
+
+    Identify the waveform generators receiving a ``set-<parameter>`` signal.
+
+    Each receiver is identified by, in order of precedence:
+
+     - its ``waveform_generator`` attribute, e.g., for a closure connected in
+       each ``on_step_run()`` call::
+
+           def set_voltage(voltage):
+               ...
+           set_voltage.waveform_generator = self.name
+           signals.signal('set-voltage').connect(set_voltage, weak=False)
+
+     - the object it is bound to (for bound methods);
+     - the receiver itself (e.g., a function connected once per run, see
+       ``on_protocol_signals()``).
+
+    Parameters
+    ----------
+    signal : blinker.NamedSignal
+        ``set-<parameter>`` signal.
+
+    Returns
+    -------
+    frozenset
+        Waveform generator identities.
+    '''
+    generators = set()
+    for receiver in signal.receivers_for(blinker.ANY):
+        generator = getattr(receiver, 'waveform_generator', None)
+        if generator is None:
+            generator = getattr(receiver, '__self__', None)
+        generators.add(receiver if generator is None else generator)
+    return frozenset(generators)
+
 
 @asyncio.coroutine
 def _warning(signal, message, **kwargs):
@@ -40,7 +146,7 @@ def _warning(signal, message, **kwargs):
 
 @asyncio.coroutine
 def execute_actuation(signals, static_states, dynamic_states,
-                        voltage, frequency, duration_s):
+                        voltage, frequency, duration_s, waveform_cache=None):
     '''
     XXX Coroutine XXX
 
@@ -62,6 +168,9 @@ def execute_actuation(signals, static_states, dynamic_states,
     duration_s : float
         Actuation duration (in seconds).  If not specified, use value from
         step options.
+    waveform_cache : WaveformCache, optional
+        Waveform parameters already set.  If specified, only set parameters
+        that changed.
 
     Returns
     -------
@@ -95,6 +204,15 @@ def execute_actuation(signals, static_states, dynamic_states,
     .. versionchanged:: 2.31.1
         Prevent error dialog prompt if coroutine is cancelled while calling
         ``set_waveform()`` callbacks.
+
+    .. versionchanged:: X.X.X
+        Send ``actuation-started`` signal before requesting actuation and
+        ``actuation-completed`` signal once actuation has completed (e.g., to
+        measure the gap between consecutive actuations).
+
+    .. versionchanged:: X.X.X
+        Add :data:`waveform_cache` parameter.  Set frequency and voltage
+        concurrently.
     '''
     # Notify other plugins that dynamic electrodes states have changed.
     responses = (signals.signal('dynamic-electrode-states-changed')
@@ -142,13 +260,46 @@ def execute_actuation(signals, static_states, dynamic_states,
                                     title='Warning: failed to set %s' % key,
                                     key='waveform-%s' % key))
 
-    for key, value, unit in (('frequency', frequency, 'Hz'),
-                             ('voltage', voltage, 'V')):
+    @asyncio.coroutine
+    def update_waveform(key, value, unit):
+        if waveform_cache is not None:
+            if waveform_cache.is_set(key, value, generators[key]):
+                raise asyncio.Return(True)
         waveform_result = yield asyncio.From(set_waveform(key, value))
 
         if waveform_result:
-            _L().info('%s set to %s%s (receivers: `%s`)', key,
-                      si.si_format(value), unit, zip(*waveform_result)[0])
+            logger.info('%s set to %s%s (receivers: `%s`)', key,
+                        si.si_format(value), unit,
+                        zip(*waveform_result)[0])
+        raise asyncio.Return(bool(waveform_result))
+
+    waveform = [('frequency', frequency, 'Hz'), ('voltage', voltage, 'V')]
+    generators = dict((key, waveform_generators(signals.signal('set-%s' %
+                                                               key)))
+                      for key, value, unit in waveform)
+    if waveform_cache is not None:
+        waveform_cache.update_generators(generators)
+    try:
+        waveform_set = yield asyncio.From(asyncio.gather(
+            *[update_waveform(*args) for args in waveform]))
+    except BaseException:
+        if waveform_cache is not None:
+            waveform_cache.invalidate()
+        raise
+    # Update cache once all parameters are set, so a parameter set
+    # concurrently with a failure is not cached.
+    if waveform_cache is not None:
+        if all(waveform_set):
+            for key, value, unit in waveform:
+                waveform_cache.update(key, value, generators[key])
+        else:
+            # Failure to set parameter was ignored; state is unknown.
+            waveform_cache.invalidate()
+
+    responses = (signals.signal('actuation-started')
+                 .send(NAME, electrodes=s_electrodes_to_actuate,
+                       duration_s=duration_s))
+    yield asyncio.From(asyncio.gather(*(r[1] for r in responses)))
 
     electrode_actuators = signals.signal('on-actuation-request')\
         .send(s_electrodes_to_actuate, duration_s=duration_s)
@@ -184,6 +335,10 @@ def execute_actuation(signals, static_states, dynamic_states,
                 exceptions.append(exception)
 
         if (electrodes_to_actuate - actuated_electrodes) or exceptions:
+            if waveform_cache is not None:
+                # Hardware state is unknown after an actuation error.
+                waveform_cache.invalidate()
+
             def _error_message():
                 missing_electrodes = (electrodes_to_actuate -
                                       actuated_electrodes)
@@ -217,16 +372,21 @@ def execute_actuation(signals, static_states, dynamic_states,
                 yield asyncio.From(asyncio.sleep(remaining_duration))
         else:
             # Requested actuations were completed successfully.
-            _L().info('actuation completed (actuated electrodes: %s)',
-                      actuated_electrodes)
+            logger.info('actuation completed (actuated electrodes: %s)',
+                        actuated_electrodes)
+
+    responses = (signals.signal('actuation-completed')
+                 .send(NAME, electrodes=s_electrodes_to_actuate))
+    yield asyncio.From(asyncio.gather(*(r[1] for r in responses)))
 
+    if electrode_actuators:
         raise asyncio.Return({'start': start, 'end': end,
                               'actuated_electrodes':
                               sorted(actuated_electrodes)})
 
 @asyncio.coroutine
 def execute_actuations(signals, static_states, voltage, frequency,
-                       duration_s=0, dynamic=False):
+                       duration_s=0, dynamic=False, waveform_cache=None):
     '''
     XXX Coroutine XXX
 
@@ -255,6 +415,8 @@ def execute_actuations(signals, static_states, voltage, frequency,
         If ``True``, query `IElectrodeMutator` plugins for **dynamic**
         actuation states.  Otherwise, only apply local **static** electrode
         actuation states.
+    waveform_cache : WaveformCache, optional
+        Waveform parameters already set (see :func:`execute_actuation`).
 
     Returns
     -------
@@ -294,6 +456,9 @@ def execute_actuations(signals, static_states, voltage, frequency,
         apply during the execution of a step.  Instead, the changes will
         **only** take effect on _subsequent_ executions of the modified
         step.
+
+    .. versionchanged:: X.X.X
+        Add :data:`waveform_cache` parameter.
     '''
     @asyncio.coroutine
     def _dynamic_states():
@@ -336,7 +501,8 @@ def execute_actuations(signals, static_states, voltage, frequency,
         # Execute **static** and **dynamic** electrode states actuation.
         actuation_task = execute_actuation(signals, static_states,
                                            dynamic_electrode_states, voltage,
-                                           frequency, duration_s)
+                                           frequency, duration_s,
+                                           waveform_cache=waveform_cache)
         actuated_electrodes = yield asyncio.From(actuation_task)
         actuations.append(actuated_electrodes)
 
@@ -349,7 +515,7 @@ def execute_actuations(signals, static_states, voltage, frequency,
 
 
 @asyncio.coroutine
-def execute(plugin_kwargs, signals):
+def execute(plugin_kwargs, signals, waveform_cache=None):
     '''
     XXX Coroutine XXX
 
@@ -359,29 +525,42 @@ def execute(plugin_kwargs, signals):
         Plugin settings as JSON serializable dictionary.
     signals : blinker.Namespace
         Signals namespace.
+    waveform_cache : WaveformCache, optional
+        Waveform parameters already set (see :func:`execute_actuation`).
+
+
+    .. versionchanged:: X.X.X
+        Stage step parameters *before* waiting for ``signals-connected``, so a
+        step started ahead of time (see
+        :func:`microdrop.core_plugins.protocol_controller.execute_steps`)
+        starts actuating as soon as it is released.
+
+    .. versionchanged:: X.X.X
+        Add :data:`waveform_cache` parameter.
     '''
     if NAME not in plugin_kwargs:
         raise asyncio.Return([])
     else:
         kwargs = plugin_kwargs[NAME]
 
+    voltage = kwargs['Voltage (V)']
+    frequency = kwargs['Frequency (Hz)']
+    duration_s = kwargs['Duration (s)']
+    static_states = kwargs.get('electrode_states', pd.Series())
+    static_states = static_states[static_states > 0]
+    dynamic = kwargs.get('dynamic', True)
+
     # Wait for plugins to connect to signals as necessary.
     event = asyncio.Event()
     signals.signal('signals-connected').connect(lambda *args: event.set(),
                                                 weak=False)
     yield asyncio.From(event.wait())
 
-    voltage = kwargs['Voltage (V)']
-    frequency = kwargs['Frequency (Hz)']
-    duration_s = kwargs['Duration (s)']
-    static_states = kwargs.get('electrode_states', pd.Series())
-    dynamic = kwargs.get('dynamic', True)
-    result = yield asyncio.From(execute_actuations(signals, static_states,
-                                                   voltage, frequency,
-                                                   duration_s,
-                                                   dynamic=dynamic))
+    actuations = execute_actuations(signals, static_states, voltage,
+                                    frequency, duration_s, dynamic=dynamic,
+                                    waveform_cache=waveform_cache)
+    result = yield asyncio.From(actuations)
 
-    logger = _L()  # use logger with function context
     logger.info('%d/%d actuations completed', len(result), len(result))
     logger.debug('completed actuations: `%s`', result)
     raise asyncio.Return(result)
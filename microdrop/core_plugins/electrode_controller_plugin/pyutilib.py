@@ -2,6 +2,10 @@
 .. versionadded:: 2.30
 
 MicroDrop Pyutilib electrode controller plugin.
+
+.. versionchanged:: X.X.X
+    Use :func:`microdrop.app_context.gtk_threadsafe` to support running
+    headless (see :mod:`microdrop.headless`).
 '''
 from __future__ import division, print_function, unicode_literals
 from concurrent.futures import ThreadPoolExecutor
@@ -13,21 +17,21 @@ import threading
 from flatland import Float, Form
 from flatland.validation import ValueAtLeast
 from logging_helpers import _L, caller_name
-from pygtkhelpers.gthreads import gtk_threadsafe
 from zmq_plugin.plugin import Plugin as ZmqPlugin
 from zmq_plugin.schema import decode_content_data
+import numpy as np
 import pandas as pd
 import trollius as asyncio
 import zmq
 
-from ...app_context import (get_app, get_hub_uri, MODE_RUNNING_MASK,
-                            MODE_REAL_TIME_MASK)
+from ...app_context import (get_app, get_hub_uri, gtk_threadsafe,
+                            MODE_RUNNING_MASK, MODE_REAL_TIME_MASK)
 from ...interfaces import (IApplicationMode, IElectrodeController)
 from ...plugin_helpers import (StepOptionsController, AppDataController,
                                hub_execute, hub_execute_async)
 from ...plugin_manager import (PluginGlobals, SingletonPlugin, IPlugin,
                                implements, ScheduleRequest)
-from .execute import execute
+from .execute import execute, WaveformCache
 
 logger = logging.getLogger(__name__)
 
@@ -88,32 +92,41 @@ class ElectrodeControllerZmqPlugin(ZmqPlugin, StepOptionsController):
     def get_actuated_area(self, electrode_states):
         '''
         Get area of actuated electrodes.
+
+        .. versionchanged:: X.X.X
+            Use integer-indexed device lookup tables.
         '''
         app = get_app()
-        actuated_electrodes = electrode_states[electrode_states > 0].index
-        return app.dmf_device.electrode_areas.ix[actuated_electrodes].sum()
+        return app.dmf_device.get_actuated_electrodes_area(electrode_states)
 
     def get_state(self, electrode_states):
+        '''
+        .. versionchanged:: X.X.X
+            Resolve electrode/channel mappings using integer-indexed device
+            lookup tables instead of label-based ``pandas`` lookups.
+        '''
         app = get_app()
+        channel_map = app.dmf_device.channel_map
 
-        electrode_channels = (app.dmf_device
-                              .actuated_channels(electrode_states.index)
-                              .dropna().astype(int))
+        electrode_indexes = channel_map.electrode_indexes(electrode_states
+                                                          .index)
+        valid = np.flatnonzero(electrode_indexes >= 0)
+        channels, positions = (channel_map
+                               .electrode_channels(electrode_indexes[valid]))
 
         # Each channel should be represented *at most* once in
         # `channel_states`.
-        channel_states = pd.Series(electrode_states
-                                   .ix[electrode_channels.index].values,
-                                   index=electrode_channels)
+        channel_states = pd.Series(electrode_states.values[valid[positions]],
+                                   index=channels)
         # Duplicate entries may result from multiple electrodes mapped to the
         # same channel or vice versa.
         channel_states = drop_duplicates_by_index(channel_states)
 
-        channel_electrodes = (app.dmf_device.electrodes_by_channel
-                              .ix[channel_states.index])
-        electrode_states = pd.Series(channel_states
-                                     .ix[channel_electrodes.index].values,
-                                     index=channel_electrodes.values)
+        electrode_indexes, positions = \
+            channel_map.channel_electrodes(channel_states.index.values)
+        electrode_states = pd.Series(channel_states.values[positions],
+                                     index=channel_map
+                                     .electrode_ids[electrode_indexes])
 
         # Each electrode should be represented *at most* once in
         # `electrode_states`.
@@ -160,18 +173,26 @@ class ElectrodeControllerZmqPlugin(ZmqPlugin, StepOptionsController):
 
             (dict) : States of modified channels and electrodes, as well as the
                 total area of all actuated electrodes.
+
+
+        .. versionchanged:: X.X.X
+            Use integer-indexed device lookup tables.
         '''
         app = get_app()
+        channel_map = app.dmf_device.channel_map
 
         # Resolve list of electrodes _and respective **channels**_ from channel
         # mapping in DMF device definition.
-        channel_electrodes = (app.dmf_device.electrodes_by_channel
-                              .ix[channel_states.index])
-        electrode_states = pd.Series(channel_states
-                                     .ix[channel_electrodes.index].values,
-                                     index=channel_electrodes.values)
+        electrode_indexes, positions = \
+            channel_map.channel_electrodes(channel_states.index.values)
+        electrode_states = pd.Series(channel_states.values[positions],
+                                     index=channel_map
+                                     .electrode_ids[electrode_indexes])
         logger = _L()  # use logger with method context
         if logger.getEffectiveLevel() <= logging.DEBUG:
+            channel_electrodes = pd.Series(electrode_states.index,
+                                           index=channel_states.index
+                                           [positions])
             map(logger.debug, 'Translate channel states:\n%sto electrode '
                 'states:\n%s' % (pprint.pformat(channel_electrodes),
                                  pprint.pformat(electrode_states))
@@ -271,6 +292,18 @@ class ElectrodeControllerZmqPlugin(ZmqPlugin, StepOptionsController):
     def on_execute__clear_electrode_states(self, request):
         self.electrode_states = pd.Series()
 
+    def on_execute__invalidate_waveform_cache(self, request):
+        '''
+        .. versionadded:: X.X.X
+
+        Set waveform parameters again on next actuation.
+
+        Waveform generator plugins **must** send this command after
+        reconnecting to hardware, since the same plugin still receives
+        waveform parameters (see :class:`.execute.WaveformCache`).
+        '''
+        self.parent.waveform_cache.invalidate()
+
 
 PluginGlobals.push_env('microdrop')
 
@@ -279,6 +312,16 @@ class ElectrodeControllerPlugin(SingletonPlugin, StepOptionsController,
                                 AppDataController):
     """
     This class is automatically registered with the PluginManager.
+
+    Attributes
+    ----------
+    waveform_cache : WaveformCache
+        Waveform parameters set during the current protocol run (see
+        :func:`execute`).
+
+
+    .. versionchanged:: X.X.X
+        Add :attr:`waveform_cache` attribute.
     """
     implements(IPlugin)
     implements(IApplicationMode)
@@ -292,6 +335,7 @@ class ElectrodeControllerPlugin(SingletonPlugin, StepOptionsController,
         self.stopped = threading.Event()
         self._active_actuation = None
         self.executor = ThreadPoolExecutor(max_workers=1)
+        self.waveform_cache = WaveformCache()
 
     @property
     def AppFields(self):
@@ -408,6 +452,7 @@ class ElectrodeControllerPlugin(SingletonPlugin, StepOptionsController,
 
     def cleanup(self):
         self.stopped.set()
+        self.waveform_cache.invalidate()
         if self.plugin is not None:
             self.plugin = None
 
@@ -423,6 +468,26 @@ class ElectrodeControllerPlugin(SingletonPlugin, StepOptionsController,
         """
         self.cleanup()
 
+    def on_protocol_run(self):
+        '''
+        .. versionadded:: X.X.X
+        '''
+        self.waveform_cache.invalidate()
+
+    def on_protocol_pause(self):
+        '''
+        .. versionadded:: X.X.X
+
+        Waveform may be changed while protocol is paused.
+        '''
+        self.waveform_cache.invalidate()
+
+    def on_protocol_finished(self):
+        '''
+        .. versionadded:: X.X.X
+        '''
+        self.waveform_cache.invalidate()
+
     def on_step_swapped(self, old_step_number, step_number):
         '''
         .. versionchanged:: 2.25
@@ -453,6 +518,10 @@ class ElectrodeControllerPlugin(SingletonPlugin, StepOptionsController,
             Use default options if plugin parameters not found in
             :data:`plugin_kwargs`.
 
+        .. versionchanged:: X.X.X
+            Skip setting waveform parameters that are unchanged since the
+            previous step of the protocol run (see :attr:`waveform_cache`).
+
         Parameters
         ----------
         plugin_kwargs : dict
@@ -467,9 +536,16 @@ class ElectrodeControllerPlugin(SingletonPlugin, StepOptionsController,
         if app.mode & MODE_REAL_TIME_MASK & ~MODE_RUNNING_MASK:
             kwargs['Duration (s)'] = 0
 
-        result = yield asyncio.From(execute(plugin_kwargs, signals))
+        # Only cache waveform state for the duration of a protocol run.
+        waveform_cache = self.waveform_cache if app.running else None
+        try:
+            result = yield asyncio.From(execute(plugin_kwargs, signals,
+                                                waveform_cache))
+        except BaseException:
+            # Waveform state is unknown after an error or cancellation.
+            self.waveform_cache.invalidate()
+            raise
 
-        logger = _L()  # use logger with function context
         logger.info('%d/%d step actuations completed', len(result),
                     len(result))
         logger.debug('completed actuations: `%s`', result)
@@ -2,6 +2,7 @@
 .. versionadded:: 2.33
 '''
 import copy
+import time
 
 from logging_helpers import _L
 import blinker
@@ -10,48 +11,132 @@ import trollius as asyncio
 from ...plugin_manager import emit_signal
 
 
-@asyncio.coroutine
-def execute_step(plugin_kwargs):
+class StepNamespace(blinker.Namespace):
     '''
-    .. versionadded:: 2.32
+    .. versionadded:: X.X.X
 
-    XXX Coroutine XXX
+    Signals namespace of a single step.
 
-    Execute a single protocol step.
+    Each signal is also connected to the receivers of the same signal in the
+    run-scoped :attr:`parent` namespace (i.e., receivers subscribed once per
+    run, see ``on_protocol_signals()`` in
+    :class:`microdrop.interfaces.IPlugin`), so plugins do not need to connect
+    to each step namespace.
+
+    .. note::
+        Only receivers connected to *any* sender in :attr:`parent`, at the
+        time a signal is first looked up in the step namespace, are
+        connected.
+
+    Parameters
+    ----------
+    parent : blinker.Namespace, optional
+        Run-scoped signals namespace.
+    '''
+    def __init__(self, parent=None):
+        super(StepNamespace, self).__init__()
+        self.parent = parent
+
+    def signal(self, name, doc=None):
+        try:
+            return self[name]
+        except KeyError:
+            signal = self.setdefault(name, blinker.NamedSignal(name, doc))
+            if self.parent is not None and name in self.parent:
+                for receiver in self.parent[name].receivers_for(blinker.ANY):
+                    signal.connect(receiver, weak=False)
+            return signal
+
+
+def start_step(plugin_kwargs, signals=None):
+    '''
+    .. versionadded:: X.X.X
+
+    Start plugin ``on_step_run()`` coroutines for a single protocol step,
+    *without* sending the ``signals-connected`` signal.
+
+    Plugins may connect to the step signals and stage step parameters, but
+    do not start actuating until ``signals-connected`` is sent.
 
     Parameters
     ----------
     plugin_kwargs : dict
         Plugin keyword arguments, indexed by plugin name.
+    signals : blinker.Namespace, optional
+        Run-scoped signals namespace (see :class:`StepNamespace`).
 
     Returns
     -------
-    list
-        Return values from plugin ``on_step_run()`` coroutines.
+    tuple
+        Step signals namespace (`StepNamespace`) and plugin
+        ``on_step_run()`` futures (`list`).
     '''
     # Take snapshot of arguments for current step.
     plugin_kwargs = copy.deepcopy(plugin_kwargs)
 
-    signals = blinker.Namespace()
-
-    @asyncio.coroutine
-    def notify_signals_connected():
-        yield asyncio.From(asyncio.sleep(0))
-        signals.signal('signals-connected').send(None)
+    step_signals = StepNamespace(signals)
 
-    loop = asyncio.get_event_loop()
     # Get list of coroutine futures by emitting `on_step_run()`.
     plugin_step_tasks = emit_signal("on_step_run", args=[plugin_kwargs,
-                                                         signals])
-    future = asyncio.wait(plugin_step_tasks.values())
+                                                         step_signals])
+    return step_signals, [asyncio.ensure_future(task)
+                          for task in plugin_step_tasks.values()]
+
+
+@asyncio.coroutine
+def _prepare_step(plugin_kwargs, signals):
+    # Let released step run until it waits (e.g., on hardware) first.
+    yield asyncio.From(asyncio.sleep(0))
+    raise asyncio.Return(start_step(plugin_kwargs, signals))
+
+
+def _cancel_step(step):
+    signals, tasks = step
+    for task in tasks:
+        task.cancel()
+
+
+@asyncio.coroutine
+def execute_step(plugin_kwargs, step=None, signals=None):
+    '''
+    .. versionadded:: 2.32
+
+    XXX Coroutine XXX
 
-    loop.create_task(notify_signals_connected())
-    result = yield asyncio.From(future)
+    Execute a single protocol step.
+
+    Parameters
+    ----------
+    plugin_kwargs : dict
+        Plugin keyword arguments, indexed by plugin name.
+    step : tuple, optional
+        Step already started using :func:`start_step`.
+    signals : blinker.Namespace, optional
+        Run-scoped signals namespace (see :class:`StepNamespace`).  Ignored
+        if :data:`step` is specified.
+
+    Returns
+    -------
+    tuple
+        Done and pending plugin ``on_step_run()`` futures (see
+        :func:`asyncio.wait`).
+
+
+    .. versionchanged:: X.X.X
+        Add :data:`step` and :data:`signals` parameters.
+    '''
+    if step is None:
+        step = start_step(plugin_kwargs, signals)
+        # Wait for plugins to connect to step signals.
+        yield asyncio.From(asyncio.sleep(0))
+    signals, tasks = step
+    signals.signal('signals-connected').send(None)
+    result = yield asyncio.From(asyncio.wait(tasks))
     raise asyncio.Return(result)
 
 
 @asyncio.coroutine
-def execute_steps(steps, signals=None):
+def execute_steps(steps, signals=None, pipeline=False):
     '''
     .. versionadded:: 2.32
 
@@ -60,7 +145,18 @@ def execute_steps(steps, signals=None):
     steps : list[dict]
         List of plugin keyword argument dictionaries.
     signals : blinker.Namespace, optional
-        Signals namespace where signals are sent through.
+        Run-scoped signals namespace where signals are sent through.  Step
+        signals are also sent to receivers subscribed to this namespace (see
+        :class:`StepNamespace`).
+    pipeline : bool, optional
+        If ``True``, start the next step (see :func:`start_step`) while the
+        current step is executing, such that the next step is staged and
+        starts actuating as soon as the current step completes.
+
+        .. warning::
+            Plugin ``on_step_run()`` coroutines for the next step are called
+            while the current step is executing.  Plugins must not act on a
+            step before ``signals-connected`` is sent.
 
     Signals
     -------
@@ -75,51 +171,115 @@ def execute_steps(steps, signals=None):
         - ``plugin_kwargs``: plugin keyword arguments
         - ``steps_count``: total number of steps
         - ``result``: list of plugin step return values
+        - ``gap_s``: time (in seconds) between the end of the last actuation
+          of the previous step and the start of the first actuation of the
+          step (``None`` if either step has no actuations).
+
+
+    .. versionchanged:: X.X.X
+        Add :data:`pipeline` parameter.  Add ``gap_s`` parameter to
+        ``step-completed`` signal.  Connect step signals namespaces to
+        receivers in :data:`signals`.
     '''
     if signals is None:
         signals = blinker.Namespace()
 
-    for i, step_i in enumerate(steps):
-        # Send notification that step has completed.
-        responses = signals.signal('step-started')\
-            .send('execute_steps', i=i, plugin_kwargs=step_i,
-                  steps_count=len(steps))
-        yield asyncio.From(asyncio.gather(*(r[1] for r in responses)))
-        # XXX Execute `on_step_run` coroutines in background thread
-        # event-loop.
-        try:
-            done, pending = yield asyncio.From(execute_step(step_i))
-
-            exceptions = []
-
-            for d in done:
-                try:
-                    d.result()
-                except Exception as exception:
-                    exceptions.append(exception)
-                    _L().debug('Error: %s', exception, exc_info=True)
-
-            if exceptions:
-                use_markup = False
-                monospace_format = '<tt>%s</tt>' if use_markup else '%s'
-
-                if len(exceptions) == 1:
-                    message = (' ' + monospace_format % exceptions[0])
-                elif exceptions:
-                    message = ('\n%s' % '\n'.join(' - ' + monospace_format
-                                                    % e for e in exceptions))
-                raise RuntimeError('Error executing step:%s' % message)
-        except asyncio.CancelledError:
-            _L().debug('Cancelling protocol.', exc_info=True)
-            raise
-        except Exception as exception:
-            _L().debug('Error executing step: `%s`', exception, exc_info=True)
-            raise
-        else:
-            # All plugins have completed the step.
-            # Send notification that step has completed.
-            responses = signals.signal('step-completed')\
+    # Start/end times of first/last actuation of current/previous step.
+    actuations = {'started': None, 'completed': None}
+    last_completed = None
+
+    @asyncio.coroutine
+    def on_actuation_started(sender, **kwargs):
+        if actuations['started'] is None:
+            actuations['started'] = time.time()
+
+    @asyncio.coroutine
+    def on_actuation_completed(sender, **kwargs):
+        actuations['completed'] = time.time()
+
+    # Subscribe once for all steps (see `StepNamespace`).
+    signals.signal('actuation-started').connect(on_actuation_started,
+                                                weak=False)
+    signals.signal('actuation-completed').connect(on_actuation_completed,
+                                                  weak=False)
+    next_step = None
+
+    try:
+        for i, step_i in enumerate(steps):
+            # Send notification that step has started.
+            responses = signals.signal('step-started')\
                 .send('execute_steps', i=i, plugin_kwargs=step_i,
-                      result=[r.result() for r in done],
                       steps_count=len(steps))
             yield asyncio.From(asyncio.gather(*(r[1] for r in responses)))
+
+            if next_step is None:
+                step = start_step(step_i, signals)
+                # Wait for plugins to connect to step signals.
+                yield asyncio.From(asyncio.sleep(0))
+            else:
+                # Plugins connected while previous step was executing.
+                step = yield asyncio.From(next_step)
+                next_step = None
+            actuations['started'] = actuations['completed'] = None
+
+            if pipeline and i + 1 < len(steps):
+                next_step = asyncio.ensure_future(_prepare_step(steps[i + 1],
+                                                                 signals))
+
+            # XXX Execute `on_step_run` coroutines in background thread
+            # event-loop.
+            try:
+                done, pending = yield asyncio.From(execute_step(step_i,
+                                                                step=step))
+
+                exceptions = []
+
+                for d in done:
+                    try:
+                        d.result()
+                    except Exception as exception:
+                        exceptions.append(exception)
+                        _L().debug('Error: %s', exception, exc_info=True)
+
+                if exceptions:
+                    use_markup = False
+                    monospace_format = '<tt>%s</tt>' if use_markup else '%s'
+
+                    if len(exceptions) == 1:
+                        message = (' ' + monospace_format % exceptions[0])
+                    elif exceptions:
+                        message = ('\n%s' % '\n'
+                                   .join(' - ' + monospace_format % e
+                                         for e in exceptions))
+                    raise RuntimeError('Error executing step:%s' % message)
+            except asyncio.CancelledError:
+                _L().debug('Cancelling protocol.', exc_info=True)
+                raise
+            except Exception as exception:
+                _L().debug('Error executing step: `%s`', exception,
+                           exc_info=True)
+                raise
+            else:
+                if last_completed is None or actuations['started'] is None:
+                    gap_s = None
+                else:
+                    gap_s = actuations['started'] - last_completed
+                last_completed = actuations['completed']
+                # All plugins have completed the step.
+                # Send notification that step has completed.
+                responses = signals.signal('step-completed')\
+                    .send('execute_steps', i=i, plugin_kwargs=step_i,
+                          result=[r.result() for r in done],
+                          steps_count=len(steps), gap_s=gap_s)
+                yield asyncio.From(asyncio.gather(*(r[1] for r in responses)))
+    finally:
+        signals.signal('actuation-started').disconnect(on_actuation_started)
+        signals.signal('actuation-completed')\
+            .disconnect(on_actuation_completed)
+        if next_step is not None:
+            # Cancel next step started ahead of time.
+            if next_step.done() and not next_step.cancelled() and \
+                    next_step.exception() is None:
+                _cancel_step(next_step.result())
+            else:
+                next_step.cancel()
@@ -0,0 +1,165 @@
+'''
+.. versionadded:: X.X.X
+
+Persistent step executor.
+
+Step coroutines (e.g., :func:`.execute_step`, :func:`.execute_steps`) are
+run as tasks on a single event loop, running in a long-lived background
+thread, instead of starting a new thread and event loop for each step or
+protocol run.
+
+Example
+-------
+
+    >>> executor = StepExecutor().start()
+    >>> future = executor.submit(execute_steps, steps, signals=signals)
+    >>> ...
+    >>> executor.cancel(future)
+    >>> ...
+    >>> executor.stop()
+'''
+from concurrent.futures import Future
+import logging
+import threading
+
+import trollius as asyncio
+
+logger = logging.getLogger(__name__)
+
+
+class StepExecutor(object):
+    '''
+    Run coroutines on a long-lived event loop thread.
+
+    Parameters
+    ----------
+    name : str, optional
+        Name of event loop thread.
+
+    Attributes
+    ----------
+    loop : asyncio.AbstractEventLoop
+        Event loop, ``None`` until executor is started.
+    '''
+    def __init__(self, name='StepExecutor'):
+        self.name = name
+        self.loop = None
+        self.thread = None
+        # Task of each submitted future (only accessed in event loop thread).
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        '''
+        Start event loop thread (if not already running).
+
+        Returns
+        -------
+        StepExecutor
+            Executor.
+        '''
+        with self._lock:
+            if self.thread is None:
+                ready = threading.Event()
+                self.thread = threading.Thread(target=self._run,
+                                               args=(ready, ),
+                                               name=self.name)
+                self.thread.daemon = True
+                self.thread.start()
+                ready.wait()
+        return self
+
+    def _run(self, ready):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self.loop = loop
+        ready.set()
+        try:
+            loop.run_forever()
+            # Let cancelled tasks complete.
+            tasks = self._tasks.values()
+            if tasks:
+                loop.run_until_complete(asyncio.wait(tasks))
+        finally:
+            loop.close()
+            logger.debug('Event loop thread `%s` stopped.', self.name)
+
+    def stop(self):
+        '''
+        Cancel all tasks and stop event loop thread.
+        '''
+        with self._lock:
+            thread, self.thread = self.thread, None
+            if thread is None:
+                return
+            loop, self.loop = self.loop, None
+        loop.call_soon_threadsafe(self._cancel, None)
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not threading.current_thread():
+            thread.join()
+
+    def submit(self, func, *args, **kwargs):
+        '''
+        Schedule coroutine function to run on event loop thread.
+
+        Parameters
+        ----------
+        func : function
+            Coroutine function.
+        *args, **kwargs
+            Passed to :data:`func`.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Coroutine result.  If coroutine is cancelled (see
+            :meth:`cancel`), the future exception is
+            :class:`asyncio.CancelledError`.
+        '''
+        future = Future()
+
+        def _start():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                task = asyncio.ensure_future(func(*args, **kwargs))
+            except Exception as exception:
+                future.set_exception(exception)
+                return
+            self._tasks[future] = task
+            task.add_done_callback(lambda task: self._set_result(future,
+                                                                  task))
+
+        self.start().loop.call_soon_threadsafe(_start)
+        return future
+
+    def _set_result(self, future, task):
+        del self._tasks[future]
+        if task.cancelled():
+            future.set_exception(asyncio.CancelledError())
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+
+    def _cancel(self, future):
+        if future is None:
+            tasks = self._tasks.values()
+        else:
+            tasks = filter(None, [self._tasks.get(future)])
+        for task in tasks:
+            task.cancel()
+
+    def cancel(self, future=None):
+        '''
+        Cancel coroutine (thread-safe).
+
+        Parameters
+        ----------
+        future : concurrent.futures.Future, optional
+            Future returned by :meth:`submit` (default: cancel all
+            coroutines).
+        '''
+        loop = self.loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._cancel, future)
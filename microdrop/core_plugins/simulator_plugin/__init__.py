@@ -0,0 +1,169 @@
+'''
+.. versionadded:: X.X.X
+
+Simulated electrode actuator and waveform generator.
+
+Answers step signals (see
+:mod:`microdrop.core_plugins.electrode_controller_plugin.execute`) like a
+hardware plugin would:
+
+ - ``on-actuation-request``: hold the requested electrodes for the requested
+   duration and return the actuated electrode IDs;
+ - ``set-voltage``, ``set-frequency``: return the value set.
+
+Each request is answered after a simulated command latency (``latency_s``,
+plus or minus up to ``jitter_s``) and fails with probability
+``failure_rate``, so step execution may be benchmarked (and regression
+tested) without hardware.
+
+The simulator is not loaded by the GUI.  It is enabled by the headless
+protocol runner with the ``--simulate`` flag (see
+:mod:`microdrop.bin.run_protocol`).
+'''
+import logging
+import random
+
+from flatland import Float, Form, Integer
+from flatland.validation import ValueAtLeast, ValueAtMost
+import trollius as asyncio
+
+from ...plugin_helpers import AppDataController
+from ...plugin_manager import (PluginGlobals, SingletonPlugin, IPlugin,
+                               implements)
+
+logger = logging.getLogger(__name__)
+
+
+class SimulatedFailure(RuntimeError):
+    '''
+    Injected simulator request failure.
+    '''
+    pass
+
+
+PluginGlobals.push_env('microdrop')
+
+
+class SimulatorPlugin(SingletonPlugin, AppDataController):
+    """
+    This class is automatically registered with the PluginManager.
+
+    Attributes
+    ----------
+    voltage : float
+        Last voltage set (in volts).
+    frequency : float
+        Last frequency set (in Hz).
+    actuations : list
+        Actuated electrode IDs of each completed actuation request.
+    """
+    implements(IPlugin)
+    plugin_name = 'microdrop.simulator_plugin'
+
+    AppFields = Form.of(
+        Float.named('latency_s').using(default=0.005, optional=True,
+                                       validators=[ValueAtLeast(minimum=0)]),
+        Float.named('jitter_s').using(default=0., optional=True,
+                                      validators=[ValueAtLeast(minimum=0)]),
+        Float.named('failure_rate').using(default=0., optional=True,
+                                          validators=[ValueAtLeast(minimum=0),
+                                                      ValueAtMost(maximum=1)]),
+        Float.named('duration_scale')
+        .using(default=1., optional=True,
+               validators=[ValueAtLeast(minimum=0)]),
+        Integer.named('seed').using(optional=True))
+
+    def __init__(self):
+        self.name = self.plugin_name
+        self.random = random.Random()
+        self.voltage = None
+        self.frequency = None
+        self.actuations = []
+
+    def on_plugin_enable(self):
+        super(SimulatorPlugin, self).on_plugin_enable()
+        self.reset()
+
+    def reset(self):
+        '''
+        Clear simulated state and seed random generator (if ``seed`` is set).
+        '''
+        self.random.seed(self.get_app_values().get('seed'))
+        self.voltage = None
+        self.frequency = None
+        self.actuations = []
+
+    @asyncio.coroutine
+    def _respond(self, request):
+        '''
+        XXX Coroutine XXX
+
+        Wait for simulated command latency.
+
+        Raises
+        ------
+        SimulatedFailure
+            With probability ``failure_rate``.
+        '''
+        app_values = self.get_app_values()
+        delay = (app_values['latency_s'] +
+                 self.random.uniform(-1, 1) * app_values['jitter_s'])
+        yield asyncio.From(asyncio.sleep(max(delay, 0)))
+        if self.random.random() < app_values['failure_rate']:
+            raise SimulatedFailure('Simulated %s failure.' % request)
+
+    @asyncio.coroutine
+    def actuate(self, electrode_states, duration_s=0):
+        '''
+        XXX Coroutine XXX
+
+        Parameters
+        ----------
+        electrode_states : pandas.Series
+            Electrode actuation states, indexed by electrode ID.
+        duration_s : float, optional
+            Actuation duration (in seconds), scaled by ``duration_scale``.
+
+        Returns
+        -------
+        list
+            Actuated electrode IDs.
+        '''
+        yield asyncio.From(self._respond('actuation'))
+        actuated = electrode_states[electrode_states > 0].index.tolist()
+        yield asyncio.From(asyncio.sleep(duration_s *
+                                         self.get_app_values()
+                                         ['duration_scale']))
+        self.actuations.append(actuated)
+        logger.debug('actuated electrodes: %s', actuated)
+        raise asyncio.Return(actuated)
+
+    @asyncio.coroutine
+    def set_voltage(self, voltage):
+        yield asyncio.From(self._respond('set voltage'))
+        self.voltage = voltage
+        raise asyncio.Return(voltage)
+
+    @asyncio.coroutine
+    def set_frequency(self, frequency):
+        yield asyncio.From(self._respond('set frequency'))
+        self.frequency = frequency
+        raise asyncio.Return(frequency)
+
+    def on_protocol_signals(self, signals):
+        '''
+        Connect simulated hardware to step signals once for the whole run.
+
+        Parameters
+        ----------
+        signals : blinker.Namespace
+            Run-scoped signals namespace.
+        '''
+        signals.signal('on-actuation-request')\
+            .connect(self.actuate, weak=False)
+        signals.signal('set-voltage').connect(self.set_voltage, weak=False)
+        signals.signal('set-frequency').connect(self.set_frequency,
+                                                weak=False)
+
+
+PluginGlobals.pop_env()
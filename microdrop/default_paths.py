@@ -16,8 +16,12 @@ USER_DATA_DIR = (ph.path('~/MicroDrop').expand() if platform.system() != 'Window
 DEVICES_DIR = USER_DATA_DIR.joinpath('devices')
 PROTOCOLS_DIR = USER_DATA_DIR.joinpath('protocols')
 EXPERIMENT_LOG_DIR = USER_DATA_DIR.joinpath('experiment-log')
+#: .. versionadded:: X.X.X
+#:     Parsed-device cache, keyed by SVG content hash.
+DEVICE_CACHE_DIR = USER_DATA_DIR.joinpath('cache', 'devices')
 
-for dir_i in (DEVICES_DIR, PROTOCOLS_DIR, EXPERIMENT_LOG_DIR):
+for dir_i in (DEVICES_DIR, PROTOCOLS_DIR, EXPERIMENT_LOG_DIR,
+              DEVICE_CACHE_DIR):
     if not dir_i.isdir():
         _L().debug('Create default directory `%s` since it does not exist.',
                    dir_i)
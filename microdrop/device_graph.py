@@ -0,0 +1,629 @@
+'''
+.. versionadded:: X.X.X
+
+Integer-indexed graph structures and routing on the electrode connection
+graph of a DMF device.
+'''
+from collections import OrderedDict
+import heapq
+import math
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import scipy.sparse.csgraph as csgraph
+
+
+#: Maximum number of electrodes for which :class:`ElectrodeRouter` computes
+#: all-pairs routing tables (memory use is quadratic in the number of
+#: electrodes, i.e., 2 x 4 x N x N bytes, or 8 MiB for 1024 electrodes).
+#: Larger devices use cached breadth-first searches instead.
+TABLE_MAX_ELECTRODES = 1024
+
+
+def csr_from_pairs(rows, values, row_count):
+    '''
+    Parameters
+    ----------
+    rows : numpy.ndarray
+        Integer row of each value.
+    values : numpy.ndarray
+        Values to store.
+    row_count : int
+        Number of rows.
+
+    Returns
+    -------
+    tuple
+        ``(indptr, indices)`` compressed sparse row (CSR) representation, where
+        the values for row ``i`` are ``indices[indptr[i]:indptr[i + 1]]``.
+        The order of values within each row is preserved.
+    '''
+    order = np.argsort(rows, kind='mergesort')
+    indptr = np.zeros(row_count + 1, dtype=int)
+    np.cumsum(np.bincount(rows, minlength=row_count), out=indptr[1:])
+    return indptr, values[order]
+
+
+def csr_gather(indptr, indices, rows):
+    '''
+    Parameters
+    ----------
+    indptr, indices : numpy.ndarray
+        Compressed sparse row (CSR) representation.
+    rows : numpy.ndarray
+        Integer rows to gather values from.
+
+    Returns
+    -------
+    tuple
+        ``(values, positions)``, where ``values`` is the concatenation of the
+        values for each of the specified ``rows`` and ``positions`` is the
+        position in ``rows`` corresponding to each value.
+    '''
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    offsets = np.cumsum(counts) - counts
+    positions = np.repeat(np.arange(rows.size), counts)
+    return (indices[np.repeat(starts - offsets, counts) +
+                    np.arange(counts.sum())], positions)
+
+
+def bfs_distances(indptr, indices, source, max_depth=None):
+    '''
+    Parameters
+    ----------
+    indptr, indices : numpy.ndarray
+        Symmetric adjacency in compressed sparse row (CSR) form.
+    source : int
+        Source node.
+    max_depth : int, optional
+        Maximum number of hops from source node.
+
+    Returns
+    -------
+    tuple
+        ``(distances, nodes)``, where ``distances`` is the hop distance from
+        the source to each node (``-1`` if not reached) and ``nodes`` lists
+        the reached nodes in breadth-first order.
+    '''
+    distances = np.full(indptr.size - 1, -1, dtype=int)
+    frontier = np.array([source])
+    distances[frontier] = 0
+    levels = [frontier]
+    level = 0
+    while frontier.size and (max_depth is None or level < max_depth):
+        level += 1
+        neighbours = csr_gather(indptr, indices, frontier)[0]
+        frontier = np.unique(neighbours[distances[neighbours] < 0])
+        distances[frontier] = level
+        levels.append(frontier)
+    return distances, np.concatenate(levels)
+
+
+def bfs_tables(indptr, indices):
+    '''
+    Compute all-pairs hop distances and next-hop tables using a breadth-first
+    search from *all* nodes at once.
+
+    Each BFS level expands the frontier of ``(source, node)`` pairs of every
+    source simultaneously using vectorised CSR lookups.
+
+    Parameters
+    ----------
+    indptr, indices : numpy.ndarray
+        Symmetric adjacency in compressed sparse row (CSR) form.
+
+    Returns
+    -------
+    tuple
+        ``(hop_distances, next_hops)``, each a ``N x N`` array, where:
+
+        - ``hop_distances[i, j]`` is the number of hops on a shortest path
+          from node ``i`` to node ``j`` (``-1`` if no path exists).
+        - ``next_hops[i, j]`` is the node following node ``i`` on a shortest
+          path from node ``i`` to node ``j`` (``-1`` if no path exists).
+    '''
+    node_count = indptr.size - 1
+    hop_distances = np.full((node_count, node_count), -1, dtype=np.int32)
+    next_hops = np.full((node_count, node_count), -1, dtype=np.int32)
+
+    nodes = np.arange(node_count)
+    hop_distances[nodes, nodes] = 0
+    next_hops[nodes, nodes] = nodes
+
+    # Frontier of `(source, node)` pairs reached at the current level.
+    sources = nodes
+    frontier = nodes
+    level = 0
+    while frontier.size:
+        level += 1
+        neighbours, positions = csr_gather(indptr, indices, frontier)
+        sources_i = sources[positions]
+        parents_i = frontier[positions]
+
+        # Only keep pairs that have not been reached yet.
+        new = hop_distances[sources_i, neighbours] < 0
+        sources_i = sources_i[new]
+        neighbours = neighbours[new]
+        parents_i = parents_i[new]
+
+        # Keep a single parent for each newly reached `(source, node)` pair.
+        _, first = np.unique(sources_i * node_count + neighbours,
+                             return_index=True)
+        sources_i = sources_i[first]
+        neighbours = neighbours[first]
+        parents_i = parents_i[first]
+
+        hop_distances[sources_i, neighbours] = level
+        # First hop towards a node is either the node itself (if reached
+        # directly from the source) or the first hop towards its parent.
+        next_hops[sources_i, neighbours] = \
+            np.where(parents_i == sources_i, neighbours,
+                     next_hops[sources_i, parents_i])
+        sources = sources_i
+        frontier = neighbours
+    return hop_distances, next_hops
+
+
+class ElectrodeAdjacency(object):
+    '''
+    Sparse electrode connection graph.
+
+    Connections are stored in both directions in compressed sparse row (CSR)
+    form, i.e., memory use is linear in the number of connections.  Each
+    connected electrode is identified by a dense integer index, i.e., the
+    position of the electrode identifier in :attr:`electrode_ids`.
+
+    Parameters
+    ----------
+    electrode_ids : array-like
+        Identifiers of connected electrodes, ordered by integer node index.
+    indptr, indices : numpy.ndarray
+        Symmetric adjacency in compressed sparse row (CSR) form.
+    '''
+    def __init__(self, electrode_ids, indptr, indices):
+        self.electrode_ids = np.asarray(electrode_ids, dtype=object)
+        self.indptr = indptr
+        self.indices = indices
+        self._electrode_index = dict(zip(self.electrode_ids,
+                                         xrange(self.electrode_ids.size)))
+
+    @classmethod
+    def from_connections(cls, df_shape_connections):
+        '''
+        Parameters
+        ----------
+        df_shape_connections : pandas.DataFrame
+            Table of connections with ``source`` and ``target`` columns.
+
+        Returns
+        -------
+        ElectrodeAdjacency
+            Adjacency of all connected electrodes, sorted by identifier.
+            Duplicate connections and self-connections are ignored.
+        '''
+        endpoints = df_shape_connections[['source', 'target']].values
+        electrode_ids = np.unique(endpoints.ravel())
+        index = dict(zip(electrode_ids, xrange(electrode_ids.size)))
+        sources = np.fromiter((index[e] for e in endpoints[:, 0]), dtype=int,
+                              count=endpoints.shape[0])
+        targets = np.fromiter((index[e] for e in endpoints[:, 1]), dtype=int,
+                              count=endpoints.shape[0])
+        # Store each connection in both directions (ignoring duplicates and
+        # self-connections).
+        rows = np.concatenate([sources, targets])
+        columns = np.concatenate([targets, sources])
+        keys = np.unique(rows[rows != columns] * electrode_ids.size +
+                         columns[rows != columns])
+        rows, columns = np.divmod(keys, max(electrode_ids.size, 1))
+        indptr, indices = csr_from_pairs(rows, columns, electrode_ids.size)
+        return cls(electrode_ids, indptr, indices)
+
+    def __len__(self):
+        return self.electrode_ids.size
+
+    def __contains__(self, electrode_id):
+        return electrode_id in self._electrode_index
+
+    def _index(self, electrode_id):
+        try:
+            return self._electrode_index[electrode_id]
+        except KeyError:
+            raise KeyError('Electrode `%s` is not connected to any other '
+                           'electrode.' % electrode_id)
+
+    @property
+    def degrees(self):
+        '''
+        Returns
+        -------
+        numpy.ndarray
+            Number of connections of each electrode, ordered by integer node
+            index.
+        '''
+        return np.diff(self.indptr)
+
+    def degree(self, electrode_id):
+        '''
+        Returns
+        -------
+        int
+            Number of connections of electrode (zero for electrodes without
+            connections).
+        '''
+        index = self._electrode_index.get(electrode_id)
+        if index is None:
+            return 0
+        return int(self.indptr[index + 1] - self.indptr[index])
+
+    def neighbours(self, electrode_id):
+        '''
+        Returns
+        -------
+        list
+            Identifiers of electrodes connected to electrode (empty for
+            electrodes without connections).
+        '''
+        index = self._electrode_index.get(electrode_id)
+        if index is None:
+            return []
+        return self.electrode_ids[self.indices[self.indptr[index]:
+                                               self.indptr[index + 1]]]\
+            .tolist()
+
+    def bfs(self, source_id, max_depth=None):
+        '''
+        Breadth-first search from an electrode.
+
+        Parameters
+        ----------
+        source_id : str
+            Source electrode identifier.
+        max_depth : int, optional
+            Maximum number of hops from source electrode.
+
+        Returns
+        -------
+        pandas.Series
+            Hop distance from source electrode to each reachable electrode,
+            indexed by electrode identifier, in breadth-first order.
+        '''
+        distances, nodes = bfs_distances(self.indptr, self.indices,
+                                         self._index(source_id),
+                                         max_depth=max_depth)
+        return pd.Series(distances[nodes], index=self.electrode_ids[nodes])
+
+    def component_labels(self):
+        '''
+        Returns
+        -------
+        numpy.ndarray
+            Connected component label of each electrode, ordered by integer
+            node index.
+        '''
+        if not self.electrode_ids.size:
+            return np.empty(0, dtype=int)
+        return csgraph.connected_components(self.to_sparse(),
+                                            directed=False)[1]
+
+    def connected_components(self):
+        '''
+        Returns
+        -------
+        list
+            List of connected components, each a sorted list of electrode
+            identifiers.  Components are ordered by their first electrode.
+        '''
+        labels = self.component_labels()
+        order = np.argsort(labels, kind='mergesort')
+        boundaries = np.flatnonzero(np.diff(labels[order])) + 1
+        return [self.electrode_ids[nodes].tolist()
+                for nodes in np.split(order, boundaries) if nodes.size]
+
+    def to_sparse(self):
+        '''
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            Symmetric ``N x N`` adjacency matrix, ordered by integer node
+            index.
+        '''
+        return sp.csr_matrix((np.ones(self.indices.size, dtype=int),
+                              self.indices, self.indptr),
+                             shape=(self.electrode_ids.size, ) * 2)
+
+    def to_dense(self):
+        '''
+        .. warning:: Memory use is quadratic in the number of electrodes.
+
+        Returns
+        -------
+        numpy.ndarray
+            Symmetric ``N x N`` adjacency matrix, ordered by integer node
+            index.
+        '''
+        return self.to_sparse().toarray()
+
+
+class ElectrodeRouter(object):
+    '''
+    Shortest path queries on an electrode connection graph.
+
+    Hop-count shortest paths are answered from all-pairs hop distance and
+    next-hop tables, computed on first use.  For graphs with more than
+    :data:`max_table_size` electrodes, hop-count queries instead use a
+    breadth-first search from the target electrode (the most recent searches
+    are cached).  Distance-weighted shortest paths
+    are found using A* search, where the cost of each connection is the
+    Euclidean distance between electrode centers and the heuristic is the
+    Euclidean distance to the target electrode center.
+
+    Parameters
+    ----------
+    electrode_ids : array-like
+        Electrode identifiers, ordered by integer node index.
+    indptr, indices : numpy.ndarray
+        Symmetric adjacency in compressed sparse row (CSR) form.
+    centers : numpy.ndarray
+        ``N x 2`` array of electrode center coordinates, ordered by integer
+        node index.
+    max_table_size : int, optional
+        Maximum number of electrodes to compute all-pairs routing tables for.
+    '''
+    #: Number of breadth-first searches to cache when routing tables are not
+    #: used.
+    distance_cache_size = 64
+
+    def __init__(self, electrode_ids, indptr, indices, centers,
+                 max_table_size=TABLE_MAX_ELECTRODES):
+        self.electrode_ids = np.asarray(electrode_ids, dtype=object)
+        self.indptr = indptr
+        self.indices = indices
+        self.centers = np.asarray(centers, dtype=float)
+        self._electrode_index = dict(zip(self.electrode_ids,
+                                         xrange(self.electrode_ids.size)))
+        self.max_table_size = max_table_size
+        self._hop_distances = None
+        self._next_hops = None
+        self._weighted_paths = {}
+        # Most recent breadth-first search results, for graphs too large for
+        # routing tables.
+        self._target_distances = OrderedDict()
+
+    @classmethod
+    def from_adjacency(cls, adjacency, df_shape_centers):
+        '''
+        Parameters
+        ----------
+        adjacency : ElectrodeAdjacency
+            Electrode connection graph.
+        df_shape_centers : pandas.DataFrame
+            Table of electrode center coordinates with ``x_center`` and
+            ``y_center`` columns, indexed by electrode identifier.
+
+        Returns
+        -------
+        ElectrodeRouter
+            Router over all connected electrodes.
+        '''
+        centers = (df_shape_centers.loc[adjacency.electrode_ids,
+                                        ['x_center', 'y_center']]
+                   .values.reshape(-1, 2))
+        return cls(adjacency.electrode_ids, adjacency.indptr,
+                   adjacency.indices, centers)
+
+    @classmethod
+    def from_connections(cls, df_shape_connections, df_shape_centers):
+        '''
+        Parameters
+        ----------
+        df_shape_connections : pandas.DataFrame
+            Table of connections with ``source`` and ``target`` columns.
+        df_shape_centers : pandas.DataFrame
+            Table of electrode center coordinates with ``x_center`` and
+            ``y_center`` columns, indexed by electrode identifier.
+
+        Returns
+        -------
+        ElectrodeRouter
+            Router over all connected electrodes.
+        '''
+        return cls.from_adjacency(ElectrodeAdjacency.from_connections
+                                  (df_shape_connections), df_shape_centers)
+
+    def _index(self, electrode_id):
+        try:
+            return self._electrode_index[electrode_id]
+        except KeyError:
+            raise KeyError('Electrode `%s` is not connected to any other '
+                           'electrode.' % electrode_id)
+
+    def _compute_tables(self):
+        if self._hop_distances is None:
+            self._hop_distances, self._next_hops = bfs_tables(self.indptr,
+                                                              self.indices)
+
+    @property
+    def hop_distances(self):
+        '''
+        Returns
+        -------
+        numpy.ndarray
+            All-pairs hop distance table (see :func:`bfs_tables`).
+        '''
+        self._compute_tables()
+        return self._hop_distances
+
+    @property
+    def next_hops(self):
+        '''
+        Returns
+        -------
+        numpy.ndarray
+            All-pairs next-hop table (see :func:`bfs_tables`).
+        '''
+        self._compute_tables()
+        return self._next_hops
+
+    @property
+    def use_tables(self):
+        '''
+        Returns
+        -------
+        bool
+            ``True`` if hop-count queries use all-pairs routing tables.
+        '''
+        return (self._hop_distances is not None or
+                self.electrode_ids.size <= self.max_table_size)
+
+    def distances(self, node):
+        '''
+        Parameters
+        ----------
+        node : int
+            Integer node index.
+
+        Returns
+        -------
+        numpy.ndarray
+            Hop distance between ``node`` and each node, ordered by integer
+            node index (``-1`` if no path exists).
+        '''
+        if self.use_tables:
+            return self.hop_distances[node]
+        distances = self._target_distances.pop(node, None)
+        if distances is None:
+            distances = bfs_distances(self.indptr, self.indices, node)[0]
+            if len(self._target_distances) >= self.distance_cache_size:
+                self._target_distances.popitem(last=False)
+        self._target_distances[node] = distances
+        return distances
+
+    def hop_distance(self, source_id, target_id):
+        '''
+        Returns
+        -------
+        int
+            Number of hops on a shortest path from source to target electrode
+            (``-1`` if no path exists).
+        '''
+        source = self._index(source_id)
+        target = self._index(target_id)
+        return int(self.distances(target)[source])
+
+    def path(self, source_id, target_id):
+        '''
+        Returns
+        -------
+        list
+            Electrode identifiers on a shortest (hop-count) path from source to
+            target electrode.
+
+        Raises
+        ------
+        networkx.NetworkXNoPath
+            If no path exists between source and target.
+        '''
+        source = self._index(source_id)
+        target = self._index(target_id)
+        if not self.use_tables:
+            distances = self.distances(target)
+            if distances[source] < 0:
+                raise nx.NetworkXNoPath('No path between `%s` and `%s`.' %
+                                        (source_id, target_id))
+            # Step to any neighbour one hop closer to the target.
+            nodes = [source]
+            while nodes[-1] != target:
+                neighbours = self.indices[self.indptr[nodes[-1]]:
+                                          self.indptr[nodes[-1] + 1]]
+                nodes.append(neighbours[distances[neighbours] ==
+                                        distances[nodes[-1]] - 1][0])
+            return self.electrode_ids[nodes].tolist()
+
+        next_hops = self.next_hops
+        if next_hops[source, target] < 0:
+            raise nx.NetworkXNoPath('No path between `%s` and `%s`.' %
+                                    (source_id, target_id))
+        nodes = [source]
+        while nodes[-1] != target:
+            nodes.append(next_hops[nodes[-1], target])
+        return self.electrode_ids[nodes].tolist()
+
+    def weighted_path(self, source_id, target_id, avoid=None):
+        '''
+        Find shortest path by distance between electrode centers using A*
+        search.
+
+        Parameters
+        ----------
+        source_id, target_id : str
+            Source and target electrode identifiers.
+        avoid : set, optional
+            Electrode identifiers that the path must not pass through.
+
+            Results are only cached for queries that do not specify electrodes
+            to avoid.
+
+        Returns
+        -------
+        list
+            Electrode identifiers on path from source to target electrode.
+
+        Raises
+        ------
+        networkx.NetworkXNoPath
+            If no path exists between source and target.
+        '''
+        key = (source_id, target_id)
+        if not avoid and key in self._weighted_paths:
+            return list(self._weighted_paths[key])
+
+        source = self._index(source_id)
+        target = self._index(target_id)
+        blocked = (set(self._electrode_index[e] for e in avoid
+                       if e in self._electrode_index) if avoid else set())
+        blocked.discard(source)
+        blocked.discard(target)
+
+        indptr = self.indptr.tolist()
+        indices = self.indices.tolist()
+        xs, ys = self.centers.T.tolist()
+        target_x, target_y = xs[target], ys[target]
+
+        def _heuristic(node):
+            return math.hypot(xs[node] - target_x, ys[node] - target_y)
+
+        costs = {source: 0.}
+        parents = {source: None}
+        closed = set()
+        queue = [(_heuristic(source), 0., source)]
+        while queue:
+            _, cost, node = heapq.heappop(queue)
+            if node == target:
+                break
+            if node in closed:
+                continue
+            closed.add(node)
+            for neighbour in indices[indptr[node]:indptr[node + 1]]:
+                if neighbour in blocked or neighbour in closed:
+                    continue
+                cost_i = cost + math.hypot(xs[neighbour] - xs[node],
+                                           ys[neighbour] - ys[node])
+                if cost_i < costs.get(neighbour, float('inf')):
+                    costs[neighbour] = cost_i
+                    parents[neighbour] = node
+                    heapq.heappush(queue, (cost_i + _heuristic(neighbour),
+                                           cost_i, neighbour))
+        else:
+            raise nx.NetworkXNoPath('No path between `%s` and `%s`.' %
+                                    (source_id, target_id))
+
+        nodes = [target]
+        while parents[nodes[-1]] is not None:
+            nodes.append(parents[nodes[-1]])
+        path_ids = self.electrode_ids[nodes[::-1]].tolist()
+        if not avoid:
+            self._weighted_paths[key] = tuple(path_ids)
+        return path_ids
@@ -1,16 +1,25 @@
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+from collections import OrderedDict
+import hashlib
 import logging
+import os
+import tempfile
 
-from droplet_planning.connections import get_adjacency_matrix
 from lxml import etree
-from lxml.etree import XPathEvaluator
 from path_helpers import path
-from svg_model import (INKSCAPE_NSMAP, svg_shapes_to_df, INKSCAPE_PPmm,
-                       compute_shape_centers)
-from svg_model.connections import extract_connections
-from svg_model.shapes_canvas import ShapesCanvas
+from svg_model import INKSCAPE_NSMAP, INKSCAPE_PPmm, compute_shape_centers
 import networkx as nx
 import numpy as np
 import pandas as pd
+import scipy.sparse as sp
+
+from device_graph import (ElectrodeAdjacency, ElectrodeRouter, csr_from_pairs,
+                          csr_gather)
+from spatial_index import ElectrodeSpatialIndex
+from svg_stream import read_device_svg
 
 
 logger = logging.getLogger(__name__)
@@ -20,6 +29,21 @@ ELECTRODES_XPATH = (r'//svg:g[@inkscape:label="Device"]//svg:path | '
                     r'//svg:g[@inkscape:label="Device"]//svg:polygon')
 
 
+#: .. versionadded:: X.X.X
+#:     Version of parsed-device cache format.  Cache entries written with a
+#:     different version are ignored (and overwritten).
+#:
+#: .. versionchanged:: X.X.X
+#:     Version 2: only parsed attributes are cached (derived connection
+#:     attributes are computed on first access).
+DEVICE_CACHE_VERSION = 2
+
+#: .. versionadded:: X.X.X
+#:     Device attributes stored in parsed-device cache entries.
+DEVICE_CACHE_ATTRIBUTES = ('df_shapes', 'df_shape_connections',
+                           'electrode_areas', 'df_shape_centers')
+
+
 class DeviceScaleNotSet(Exception):
     pass
 
@@ -46,26 +70,66 @@ class DmfDevice(object):
         """
         return cls(svg_filepath, **kwargs)
 
-    def __init__(self, svg_filepath, name=None, **kwargs):
+    def __init__(self, svg_filepath, name=None, cache_dir=None, **kwargs):
+        '''
+        .. versionchanged:: X.X.X
+            Add :data:`cache_dir` parameter.  If specified, parsed device
+            attributes are read from (or written to) a cache entry keyed by
+            the hash of the SVG file contents.
+        '''
         self.name = name or path(svg_filepath).namebase
 
-        # Read SVG paths and polygons from `Device` layer into data frame, one
-        # row per polygon vertex.
-        self.df_shapes = svg_shapes_to_df(svg_filepath, xpath=ELECTRODES_XPATH)
-
         # Add SVG file path as attribute.
         self.svg_filepath = svg_filepath
         self.shape_i_columns = 'id'
 
-        # Create temporary shapes canvas with same scale as original shapes
-        # frame.  This canvas is used for to conduct point queries to detect
-        # which shape (if any) overlaps with the endpoint of a connection line.
-        svg_canvas = ShapesCanvas(self.df_shapes, self.shape_i_columns)
+        attributes = None
+        if cache_dir is not None:
+            cache_path = device_cache_path(cache_dir, svg_filepath)
+            attributes = read_device_cache(cache_path)
+
+        if attributes is None:
+            # No cached attributes available.  Parse SVG file.
+            self._load_svg(svg_filepath)
+            if cache_dir is not None:
+                write_device_cache(cache_path,
+                                   dict([(k, getattr(self, k))
+                                         for k in DEVICE_CACHE_ATTRIBUTES]))
+        else:
+            for k, v in attributes.iteritems():
+                setattr(self, k, v)
+
+        df_electrode_channels = self.get_electrode_channels()
+        #: .. versionadded:: X.X.X
+        #:     Channels mapped to each electrode in SVG file.
+        self._original_channels = \
+            channels_by_electrode_id(df_electrode_channels)
+        self.df_electrode_channels = df_electrode_channels
+
+        # Modified state (`True` if electrode channels have been updated).
+        self._dirty = False
+
+    def _load_svg(self, svg_filepath):
+        '''
+        Parse electrode shapes and connections from SVG file and compute
+        electrode areas and centers.
+
+        Each attribute listed in :data:`DEVICE_CACHE_ATTRIBUTES` is set.
+
+        .. versionadded:: X.X.X
 
-        # Detect connected shapes based on lines in "Connection" layer of the
-        # SVG.
-        self.df_shape_connections = extract_connections(self.svg_filepath,
-                                                        svg_canvas)
+        .. versionchanged:: X.X.X
+            Parse SVG file using streaming reader (see
+            :func:`microdrop.svg_stream.read_device_svg`).
+        '''
+        # Read SVG paths and polygons from `Device` layer into data frame, one
+        # row per polygon vertex, and detect connected shapes based on lines in
+        # "Connection" layer of the SVG.
+        #
+        # The SVG is parsed in a single streaming pass, i.e., other layers are
+        # skipped without building a document tree.
+        self.df_shapes, self.df_shape_connections = \
+            read_device_svg(svg_filepath, self.shape_i_columns)
 
         # Scale coordinates to millimeter units.
         self.df_shapes[['x', 'y']] -= self.df_shapes[['x', 'y']].min().values
@@ -74,71 +138,465 @@ class DmfDevice(object):
         self.df_shapes = compute_shape_centers(self.df_shapes,
                                                self.shape_i_columns)
 
-        self.df_electrode_channels = self.get_electrode_channels()
-
-        self.graph = nx.Graph()
-        for index, row in self.df_shape_connections.iterrows():
-            self.graph.add_edge(row['source'], row['target'])
+        # Electrode areas only depend on electrode shapes (not on channel
+        # mappings), so compute them once.
+        self.electrode_areas = self.get_electrode_areas()
 
         # Get data frame, one row per electrode, indexed by electrode path id,
         # each row denotes electrode center coordinates.
         self.df_shape_centers = (self.df_shapes.drop_duplicates(subset=['id'])
                                  .set_index('id')[['x_center', 'y_center']])
-        (self.adjacency_matrix, self.indexed_shapes,
-         self.shape_indexes) = get_adjacency_matrix(self.df_shape_connections)
-        self.df_indexed_shape_centers = (self.df_shape_centers
-                                         .loc[self.shape_indexes.index]
-                                         .reset_index())
-        self.df_indexed_shape_centers.rename(columns={'index': 'shape_id'},
-                                             inplace=True)
-
-        self.df_shape_connections_indexed = self.df_shape_connections.copy()
-        self.df_shape_connections_indexed['source'] = \
-            map(str, self.shape_indexes[self.df_shape_connections['source']])
-        self.df_shape_connections_indexed['target'] \
-            = map(str, self.shape_indexes[self.df_shape_connections
-                                          ['target']])
-
-        self.df_shapes_indexed = self.df_shapes.copy()
-        self.df_shapes_indexed['id'] = map(str, self.shape_indexes
-                                           [self.df_shapes['id']])
-
-        #: .. versionadded:: 2.28
-        #:     Up, down, left, and right neighbours for each electrode.
-        if not self.df_shape_connections.shape[0]:
-            # No connections defined between electrodes, so no neighbours.
-            self.electrode_neighbours = pd.DataFrame(None, columns=['up',
-                                                                    'down',
-                                                                    'left',
-                                                                    'right'])
-        else:
-            self.electrode_neighbours = electrode_neighbours(self)
 
-        # Modified state (`True` if electrode channels have been updated).
-        self._dirty = False
+    def _update_connections(self):
+        '''
+        Discard attributes derived from :attr:`df_shape_connections` (e.g.,
+        :attr:`graph`, :attr:`router`).  Derived attributes are recomputed on
+        next access.
+
+        .. versionadded:: X.X.X
+        '''
+        self._router = None
+        self._connection_cache = {}
+
+    def _connection_table(self, name, function):
+        '''
+        .. versionadded:: X.X.X
+
+        Returns
+        -------
+        object
+            Cached attribute derived from current electrode connections,
+            computed using :data:`function` if not cached.
+        '''
+        cache = getattr(self, '_connection_cache', None)
+        if cache is None:
+            cache = self._connection_cache = {}
+        if name not in cache:
+            cache[name] = function()
+        return cache[name]
+
+    @property
+    def adjacency(self):
+        '''
+        .. versionadded:: X.X.X
+
+        Returns
+        -------
+        microdrop.device_graph.ElectrodeAdjacency
+            Sparse (CSR) electrode connection graph.
+
+            This is the canonical connection structure; :attr:`graph`,
+            :attr:`adjacency_matrix`, :attr:`router`, etc. are derived from
+            it on first access.
+        '''
+        return self._connection_table('adjacency', lambda:
+                                      ElectrodeAdjacency.from_connections
+                                      (self.df_shape_connections))
+
+    @property
+    def graph(self):
+        '''
+        .. versionchanged:: X.X.X
+            Computed on first access after connections are updated.
+
+        Returns
+        -------
+        networkx.Graph
+            Electrode connection graph.
+        '''
+        def _graph():
+            graph = nx.Graph()
+            graph.add_edges_from(self.df_shape_connections[['source',
+                                                            'target']].values)
+            return graph
+        return self._connection_table('graph', _graph)
+
+    @property
+    def adjacency_matrix(self):
+        '''
+        .. versionchanged:: X.X.X
+            Computed on first access after connections are updated (see
+            :attr:`adjacency`).
+
+        .. warning:: Memory use is quadratic in the number of connected
+            electrodes.  Prefer :attr:`adjacency`.
+
+        Returns
+        -------
+        numpy.ndarray
+            Dense symmetric adjacency matrix of connected electrodes, ordered
+            by :attr:`indexed_shapes`.
+        '''
+        return self._connection_table('adjacency_matrix',
+                                      self.adjacency.to_dense)
+
+    @property
+    def indexed_shapes(self):
+        '''
+        .. versionchanged:: X.X.X
+            Computed on first access after connections are updated.
+
+        Returns
+        -------
+        pandas.Series
+            Identifier of each connected electrode, indexed by integer node
+            index.
+        '''
+        return self._connection_table('indexed_shapes', lambda:
+                                      pd.Series(self.adjacency.electrode_ids))
+
+    @property
+    def shape_indexes(self):
+        '''
+        .. versionchanged:: X.X.X
+            Computed on first access after connections are updated.
+
+        Returns
+        -------
+        pandas.Series
+            Integer node index of each connected electrode, indexed by
+            electrode identifier.
+        '''
+        return self._connection_table('shape_indexes', lambda:
+                                      pd.Series(np.arange(len(self
+                                                              .adjacency)),
+                                                index=self.adjacency
+                                                .electrode_ids))
+
+    @property
+    def df_indexed_shape_centers(self):
+        '''
+        .. versionchanged:: X.X.X
+            Computed on first access after connections are updated.
+        '''
+        def _table():
+            df_indexed_shape_centers = (self.df_shape_centers
+                                        .loc[self.shape_indexes.index]
+                                        .reset_index())
+            df_indexed_shape_centers.rename(columns={'index': 'shape_id'},
+                                            inplace=True)
+            return df_indexed_shape_centers
+        return self._connection_table('df_indexed_shape_centers', _table)
+
+    @property
+    def df_shape_connections_indexed(self):
+        '''
+        .. versionchanged:: X.X.X
+            Computed on first access after connections are updated.
+        '''
+        def _table():
+            df_shape_connections_indexed = self.df_shape_connections.copy()
+            df_shape_connections_indexed['source'] = \
+                map(str, self.shape_indexes[self.df_shape_connections
+                                            ['source']])
+            df_shape_connections_indexed['target'] = \
+                map(str, self.shape_indexes[self.df_shape_connections
+                                            ['target']])
+            return df_shape_connections_indexed
+        return self._connection_table('df_shape_connections_indexed', _table)
+
+    @property
+    def df_shapes_indexed(self):
+        '''
+        .. versionchanged:: X.X.X
+            Computed on first access after connections are updated.
+        '''
+        def _table():
+            df_shapes_indexed = self.df_shapes.copy()
+            df_shapes_indexed['id'] = map(str, self.shape_indexes
+                                          [self.df_shapes['id']])
+            return df_shapes_indexed
+        return self._connection_table('df_shapes_indexed', _table)
+
+    @property
+    def electrode_neighbours(self):
+        '''
+        .. versionadded:: 2.28
+
+        .. versionchanged:: X.X.X
+            Computed on first access after connections are updated.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Up, down, left, and right neighbours for each electrode (see
+            :func:`electrode_neighbours`).
+        '''
+        def _table():
+            if not self.df_shape_connections.shape[0]:
+                # No connections defined between electrodes, so no
+                # neighbours.
+                return pd.DataFrame(None, columns=['up', 'down', 'left',
+                                                   'right'])
+            return electrode_neighbours(self)
+        return self._connection_table('electrode_neighbours', _table)
+
+    def set_shape_connections(self, df_shape_connections):
+        '''
+        Replace electrode connections and update derived attributes.
+
+        .. versionadded:: X.X.X
+
+        Parameters
+        ----------
+        df_shape_connections : pandas.DataFrame
+            Table of connections with ``source`` and ``target`` columns, each
+            containing an electrode identifier.
+        '''
+        self.df_shape_connections = df_shape_connections
+        self._update_connections()
+
+    @property
+    def router(self):
+        '''
+        .. versionadded:: X.X.X
+
+        Returns
+        -------
+        microdrop.device_graph.ElectrodeRouter
+            Shortest path router for electrode connection graph.
+
+            Routing tables are computed on first use and discarded whenever
+            electrode connections are updated.
+        '''
+        if getattr(self, '_router', None) is None:
+            self._router = \
+                ElectrodeRouter.from_adjacency(self.adjacency,
+                                               self.df_shape_centers)
+        return self._router
+
+    @property
+    def spatial_index(self):
+        '''
+        .. versionadded:: X.X.X
+
+        Returns
+        -------
+        microdrop.spatial_index.ElectrodeSpatialIndex
+            Spatial index of electrode shapes (in millimeter units), built on
+            first use.
+        '''
+        if getattr(self, '_spatial_index', None) is None:
+            self._spatial_index = ElectrodeSpatialIndex(self.df_shapes,
+                                                        self.shape_i_columns)
+        return self._spatial_index
+
+    def __getstate__(self):
+        '''
+        .. versionadded:: X.X.X
+
+        Do not pickle cached routing tables, spatial index, or SVG
+        document.
+
+        .. versionchanged:: X.X.X
+            Do not pickle cached attributes derived from connections.
+        '''
+        state = self.__dict__.copy()
+        state.pop('_router', None)
+        state.pop('_connection_cache', None)
+        state.pop('_spatial_index', None)
+        state.pop('_channel_cache', None)
+        state.pop('_svg_document', None)
+        state.pop('_lru_key', None)
+        return state
+
+    def copy(self):
+        '''
+        .. versionadded:: X.X.X
+
+        Returns
+        -------
+        DmfDevice
+            Copy of device with independent electrode channel mappings.
+
+            Electrode shapes, connections, and attributes derived from them
+            (e.g., :attr:`router`, :attr:`spatial_index`) are *shared* with
+            this device and must be treated as read-only.
+        '''
+        device = self.__class__.__new__(self.__class__)
+        device.__dict__.update(self.__dict__)
+        device._electrode_channels = OrderedDict(self._electrode_channels)
+        device._modified_electrodes = set(self._modified_electrodes)
+        device._svg_pending = set(getattr(self, '_svg_pending', ()))
+        device._channel_cache = dict(getattr(self, '_channel_cache', None) or
+                                     {})
+        # SVG document is modified in place, so it cannot be shared.
+        device.__dict__.pop('_svg_document', None)
+        return device
+
+    def saved_as(self, svg_filepath):
+        '''
+        .. versionadded:: X.X.X
+
+        Parameters
+        ----------
+        svg_filepath : str
+            Path the output of :meth:`to_svg` was saved to.
+
+        Returns
+        -------
+        DmfDevice
+            Copy of device (see :meth:`copy`) equivalent to loading the saved
+            SVG file, i.e., with the current channel mappings as original
+            mappings.
+        '''
+        device = self.copy()
+        device.__dict__.pop('_lru_key', None)
+        device.svg_filepath = svg_filepath
+        device.name = path(svg_filepath).namebase
+        if self._modified_electrodes:
+            # Update channels read from SVG file for modified electrodes.
+            df_shapes = self.df_shapes.copy()
+            modified = df_shapes['id'].isin(self._modified_electrodes)
+            df_shapes.loc[modified, 'data-channels'] = \
+                df_shapes.loc[modified, 'id'].map(lambda electrode_id:
+                                                  ','.join(map(str, self
+                                                               .get_channels
+                                                               (electrode_id)
+                                                               )))
+            device.df_shapes = df_shapes
+        device._original_channels = OrderedDict(self._electrode_channels)
+        device._modified_electrodes = set()
+        device._svg_pending = set()
+        device._dirty = False
+        # Channel tables are unchanged, but SVG output refers to the previous
+        # source file.
+        device._channel_cache.pop('svg', None)
+        return device
+
+    def _channel_table(self, name, function):
+        '''
+        .. versionadded:: X.X.X
+
+        Returns
+        -------
+        object
+            Cached table derived from current electrode channel mappings,
+            computed using :data:`function` if not cached.
+        '''
+        cache = getattr(self, '_channel_cache', None)
+        if cache is None:
+            cache = self._channel_cache = {}
+        if name not in cache:
+            cache[name] = function()
+        return cache[name]
 
     @property
     def df_electrode_channels(self):
-        return self._df_electrode_channels
+        '''
+        .. versionchanged:: X.X.X
+            Build table from electrode channel mappings on first access after
+            mappings are modified.
+        '''
+        def _table():
+            rows = [(electrode_id, channel) for electrode_id, channels in
+                    self._electrode_channels.iteritems()
+                    for channel in channels]
+            df_electrode_channels = pd.DataFrame(rows or None,
+                                                 columns=['electrode_id',
+                                                          'channel'])
+            df_electrode_channels['channel'] = \
+                df_electrode_channels['channel'].astype(int)
+            return df_electrode_channels
+        return self._channel_table('df_electrode_channels', _table)
 
     @df_electrode_channels.setter
     def df_electrode_channels(self, value):
-        self._df_electrode_channels = value
-        self.electrodes_by_channel = (self.df_electrode_channels
-                                      .set_index('channel')['electrode_id'])
-        self.channels_by_electrode = (self.df_electrode_channels
-                                      .set_index('electrode_id')['channel'])
-        self.electrode_areas = self.get_electrode_areas()
-        self.channel_areas = pd.Series([self.electrode_areas
-                                        [self.electrodes_by_channel.ix[c]]
-                                        .sum() for c in
-                                        self.electrodes_by_channel.index],
-                                       index=self.electrodes_by_channel.index)
+        '''
+        .. versionchanged:: X.X.X
+            Compile integer-indexed electrode/channel lookup tables (see
+            :attr:`channel_map`) and compute channel areas from them.
+
+        .. versionchanged:: X.X.X
+            Store channels mapped to each electrode and track electrodes with
+            modified channels.  Derived tables (e.g., :attr:`channel_map`) are
+            computed on first access.
+        '''
+        # Electrodes (possibly) modified _before_ update.
+        modified_electrodes = getattr(self, '_modified_electrodes', set())
+        self._electrode_channels = channels_by_electrode_id(value)
+        self._modified_electrodes = \
+            set(electrode_id for electrode_id in
+                set(self._electrode_channels) | set(self._original_channels)
+                if self._electrode_channels.get(electrode_id, ()) !=
+                self._original_channels.get(electrode_id, ()))
+        # Electrodes that may need to be updated in SVG document.
+        self._svg_pending = (getattr(self, '_svg_pending', set()) |
+                             modified_electrodes | self._modified_electrodes)
+        self._channel_cache = {}
+
+    @property
+    def electrodes_by_channel(self):
+        '''
+        .. versionchanged:: X.X.X
+            Computed on first access after channel mappings are modified.
+        '''
+        return self._channel_table('electrodes_by_channel', lambda:
+                                   self.df_electrode_channels
+                                   .set_index('channel')['electrode_id'])
+
+    @property
+    def channels_by_electrode(self):
+        '''
+        .. versionchanged:: X.X.X
+            Computed on first access after channel mappings are modified.
+        '''
+        return self._channel_table('channels_by_electrode', lambda:
+                                   self.df_electrode_channels
+                                   .set_index('electrode_id')['channel'])
+
+    @property
+    def channel_map(self):
+        '''
+        .. versionadded:: X.X.X
+
+        Returns
+        -------
+        ElectrodeChannelMap
+            Integer-indexed electrode/channel lookup tables.
+        '''
+        return self._channel_table('channel_map', lambda:
+                                   ElectrodeChannelMap(self.electrode_areas,
+                                                       self
+                                                       .df_electrode_channels))
+
+    @property
+    def channel_areas(self):
+        '''
+        .. versionchanged:: X.X.X
+            Computed on first access after channel mappings are modified.
+        '''
+        return self._channel_table('channel_areas',
+                                   self.channel_map.channel_areas)
 
     @property
     def dirty(self):
         return self._dirty
 
+    @property
+    def modified_electrodes(self):
+        '''
+        .. versionadded:: X.X.X
+
+        Returns
+        -------
+        set
+            Identifiers of electrodes with channels that differ from the
+            channels in the SVG file.
+        '''
+        return set(self._modified_electrodes)
+
+    def get_channels(self, electrode_id):
+        '''
+        .. versionadded:: X.X.X
+
+        Returns
+        -------
+        list
+            Channels mapped to electrode (empty if no channels are mapped).
+        '''
+        return list(self._electrode_channels.get(electrode_id, ()))
+
     def set_electrode_channels(self, electrode_id, channels):
         '''
         Set channels for electrode `electrode_id` to `channels`.
@@ -158,31 +616,64 @@ class DmfDevice(object):
         -------
         bool
             ``True`` if channel mappings have changed.
+
+
+        .. versionchanged:: X.X.X
+            Update electrode channel mappings incrementally (see
+            :meth:`set_electrode_channels_many`).
         '''
-        # Get electrode channels frame for all electrodes except
-        # `electrode_id`.
-        df_electrode_channels = (self.df_electrode_channels
-                                 .loc[self.df_electrode_channels.electrode_id
-                                      != electrode_id])
-        if len(channels) > 0:
-            # Add new list of channels for electrode.
-            df_electrode_channels_i = pd.DataFrame([[electrode_id, channel]
-                                                    for channel in
-                                                    channels],
-                                                   columns=['electrode_id',
-                                                            'channel'])
-            self.df_electrode_channels = (pd.concat([df_electrode_channels,
-                                                     df_electrode_channels_i])
-                                          .reset_index(drop=True))
-        else:
-            # No channels assigned to electrode.
-            self.df_electrode_channels = df_electrode_channels
+        self.set_electrode_channels_many({electrode_id: channels})
+        return self.dirty
+
+    def set_electrode_channels_many(self, electrode_channels):
+        '''
+        Set channels for multiple electrodes.
+
+        Only electrodes with changed channels are updated, and tables derived
+        from the channel mappings (e.g., :attr:`df_electrode_channels`) are
+        only rebuilt on next access.
+
+        .. note:: Existing channels assigned to each electrode are
+            overwritten.
+
+        .. versionadded:: X.X.X
+
+        Parameters
+        ----------
+        electrode_channels : dict or list
+            Mapping (or list of ``(electrode_id, channels)`` pairs) from
+            electrode identifier to list of channel identifiers assigned to
+            the electrode.
+
+        Returns
+        -------
+        set
+            Identifiers of electrodes with changed channels.
+        '''
+        if isinstance(electrode_channels, dict):
+            electrode_channels = electrode_channels.iteritems()
+        changed = set()
+        for electrode_id, channels in electrode_channels:
+            channels = tuple(int(channel) for channel in channels)
+            if self._electrode_channels.get(electrode_id, ()) == channels:
+                continue
+            changed.add(electrode_id)
+            # Move electrode to end of mapping (same as order of rows added to
+            # `df_electrode_channels`).
+            self._electrode_channels.pop(electrode_id, None)
+            if channels:
+                self._electrode_channels[electrode_id] = channels
+            if channels != self._original_channels.get(electrode_id, ()):
+                self._modified_electrodes.add(electrode_id)
+            else:
+                self._modified_electrodes.discard(electrode_id)
 
-        # If the channels mappings have changed, update modified state.
-        df_diff_channels = self.diff_electrode_channels()
-        if df_diff_channels.shape[0] > 0:
+        if changed:
+            self._svg_pending.update(changed)
+            self._channel_cache = {}
+        if self._modified_electrodes:
             self._dirty = True
-        return self.dirty
+        return changed
 
     @property
     def electrodes(self):
@@ -255,6 +746,40 @@ class DmfDevice(object):
         '''
         return self.df_electrode_channels.channel.max()
 
+    def channels_for(self, electrode_indexes):
+        '''
+        .. versionadded:: X.X.X
+
+        Parameters
+        ----------
+        electrode_indexes : array-like
+            Integer electrode indexes (see :attr:`channel_map`).
+
+        Returns
+        -------
+        numpy.ndarray
+            Sorted unique channels mapped to the specified electrodes.
+        '''
+        return self.channel_map.channels_for(electrode_indexes)
+
+    def area_of(self, state_vector):
+        '''
+        .. versionadded:: X.X.X
+
+        Parameters
+        ----------
+        state_vector : array-like
+            Actuation state of each electrode, ordered by integer electrode
+            index (see :attr:`channel_map`).  Any state greater than zero is
+            considered actuated.
+
+        Returns
+        -------
+        float
+            Area of actuated electrodes in square millimeters.
+        '''
+        return self.channel_map.area_of(state_vector)
+
     def get_actuated_electrodes_area(self, electrode_states):
         '''
         Compute area of actuated electrodes.
@@ -268,13 +793,13 @@ class DmfDevice(object):
         Returns:
 
             float : Area of actuated electrodes in square millimeters.
+
+
+        .. versionchanged:: X.X.X
+            Use integer-indexed lookup tables (see :meth:`area_of`).
         '''
-        actuated_electrodes = electrode_states[electrode_states > 0]
-        # Look up the area of each actuated electrode.
-        actuated_electrode_areas = (self.electrode_areas
-                                    .ix[actuated_electrodes.index])
-        # Compute the total actuated electrode area and scale by device scale.
-        return actuated_electrode_areas.sum()
+        return self.area_of(self.channel_map
+                            .electrode_state_vector(electrode_states))
 
     def actuated_area(self, state_of_all_channels):
         '''
@@ -288,84 +813,330 @@ class DmfDevice(object):
         Returns:
 
             float : Area of actuated electrodes in square millimeters.
+
+
+        .. versionchanged:: X.X.X
+            Use integer-indexed lookup tables.  The area of an electrode
+            mapped to multiple actuated channels is only counted once.
         '''
-        if state_of_all_channels.max() == 0:
+        state_of_all_channels = np.asarray(state_of_all_channels)
+        if not state_of_all_channels.size or state_of_all_channels.max() == 0:
             # No channels are actuated.
             return 0
 
-        # Get the index of all actuated channels.
-        actuated_channels_index = np.where(state_of_all_channels > 0)[0]
         # Based on the actuated channels, look up the electrodes that are
         # actuated.
-        actuated_electrodes = self.actuated_electrodes(actuated_channels_index)
-        # Look up the area of each actuated electrode.
-        actuated_electrode_areas = (self.electrode_areas
-                                    .ix[actuated_electrodes.values])
-        # Compute the total actuated electrode area and scale by device scale.
-        return actuated_electrode_areas.sum()
+        actuated_channels = np.flatnonzero(state_of_all_channels > 0)
+        electrode_indexes = self.channel_map.electrodes_for(actuated_channels)
+        # Compute the total actuated electrode area.
+        return self.channel_map.electrode_areas[electrode_indexes].sum()
 
-    def actuated_electrodes(self, actuated_channels_index):
+    def electrode_state_matrix(self, electrode_states):
         '''
+        .. versionadded:: X.X.X
+
         Parameters
         ----------
-        actuated_channels_index : list or array-like
-            Actuated channel indexes.
+        electrode_states : list
+            Electrode states (:class:`pandas.Series` indexed by electrode
+            identifier) for each step, e.g., from the electrode controller
+            plugin data of each protocol step::
+
+                electrode_states = [step.get_data('microdrop.electrode_'
+                                                  'controller_plugin')
+                                    ['electrode_states']
+                                    for step in protocol.steps]
 
         Returns
         -------
-        pandas.Series
-            Actuated electrode identifiers, indexed by channel index.
+        scipy.sparse.csr_matrix
+            Boolean ``steps x electrodes`` matrix, with electrodes ordered by
+            integer electrode index (see :attr:`channel_map`).
         '''
-        return self.electrodes_by_channel.ix[actuated_channels_index]
+        return self.channel_map.electrode_state_matrix(electrode_states)
 
-    def actuated_channels(self, actuated_electrodes_index):
+    def areas_of(self, state_matrix):
         '''
+        .. versionadded:: X.X.X
+
+        Batch version of :meth:`area_of`.
+
         Parameters
         ----------
-        actuated_electrodes_index : list or array-like
-            Actuated electrode identifiers.
+        state_matrix : array-like or scipy.sparse.spmatrix
+            ``steps x electrodes`` actuation states, ordered by integer
+            electrode index (see :meth:`electrode_state_matrix`).  Any state
+            greater than zero is considered actuated.
 
         Returns
         -------
-        pandas.Series
-            Actuated channel index values, indexed by electrode identifier.
+        numpy.ndarray
+            Area of actuated electrodes in each step, in square millimeters.
         '''
-        # Get `pd.Series` of channels corresponding to electrodes.
-        return self.channels_by_electrode.ix[actuated_electrodes_index]
+        return self.channel_map.areas_of(state_matrix)
 
-    def find_path(self, source_id, target_id):
+    def actuated_areas(self, channel_matrix):
         '''
-        Returns
-        -------
-        list
-            A list of nodes on the shortest path from source to target.
+        .. versionadded:: X.X.X
+
+        Batch version of :meth:`actuated_area`.
+
+        Parameters
+        ----------
+        channel_matrix : array-like or scipy.sparse.spmatrix
+            ``steps x channels`` actuation states.  Any state greater than
+            zero is considered actuated.
+
+        Returns
+        -------
+        numpy.ndarray
+            Area of electrodes mapped to actuated channels in each step, in
+            square millimeters.  The area of an electrode mapped to multiple
+            actuated channels is only counted once.
+        '''
+        return self.channel_map.areas_of(self.channel_map
+                                         .electrodes_matrix_for
+                                         (channel_matrix))
+
+    def channel_counts(self, state_matrix):
+        '''
+        .. versionadded:: X.X.X
+
+        Parameters
+        ----------
+        state_matrix : array-like or scipy.sparse.spmatrix
+            ``steps x electrodes`` actuation states (see
+            :meth:`areas_of`).
+
+        Returns
+        -------
+        numpy.ndarray
+            Number of channels actuated in each step.
+        '''
+        return np.asarray(self.channel_map.channel_state_matrix(state_matrix)
+                          .sum(axis=1)).ravel()
+
+    def channel_collisions(self, state_matrix):
+        '''
+        .. versionadded:: X.X.X
+
+        Find actuated channels that are mapped to multiple electrodes.
+
+        Parameters
+        ----------
+        state_matrix : array-like or scipy.sparse.spmatrix
+            ``steps x electrodes`` actuation states (see
+            :meth:`areas_of`).
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per step and actuated channel mapped to more than one
+            electrode, with the columns:
+
+            - ``step``: step index.
+            - ``channel``: channel index.
+            - ``electrode_ids``: identifiers of *all* electrodes mapped to the
+              channel (i.e., actuated when the channel is actuated).
+            - ``unrequested``: identifiers of electrodes mapped to the channel
+              that are *not* actuated in the step.
+        '''
+        channel_map = self.channel_map
+        state_matrix = _boolean_matrix(state_matrix,
+                                       channel_map.electrode_ids.size)
+        channel_matrix = (channel_map.channel_state_matrix(state_matrix)
+                          .tocoo())
+        shared = np.diff(channel_map.channel_electrodes_indptr) > 1
+        collisions = shared[channel_matrix.col]
+        steps = channel_matrix.row[collisions]
+        channels = channel_matrix.col[collisions]
+        order = np.lexsort([channels, steps])
+        steps = steps[order]
+        channels = channels[order]
+
+        columns = ['step', 'channel', 'electrode_ids', 'unrequested']
+        if not steps.size:
+            return pd.DataFrame(None, columns=columns)
+
+        electrode_indexes, positions = \
+            channel_map.channel_electrodes(channels)
+        requested = np.asarray(state_matrix[steps[positions],
+                                            electrode_indexes]).ravel()
+        electrode_ids = channel_map.electrode_ids[electrode_indexes]
+        # Electrodes of each collision are contiguous (ordered by position).
+        boundaries = np.searchsorted(positions, np.arange(1, steps.size))
+        rows = [[step_i, channel_i, ids_i.tolist(),
+                 ids_i[~requested_i].tolist()]
+                for step_i, channel_i, ids_i, requested_i in
+                zip(steps, channels, np.split(electrode_ids, boundaries),
+                    np.split(requested, boundaries))]
+        return pd.DataFrame(rows, columns=columns)
+
+    def actuated_electrodes(self, actuated_channels_index):
+        '''
+        Parameters
+        ----------
+        actuated_channels_index : list or array-like
+            Actuated channel indexes.
+
+        Returns
+        -------
+        pandas.Series
+            Actuated electrode identifiers, indexed by channel index.
+
+
+        .. versionchanged:: X.X.X
+            Use integer-indexed lookup tables.  Channels not mapped to any
+            electrode are omitted.
+        '''
+        channels = np.asarray(actuated_channels_index, dtype=int).ravel()
+        electrode_indexes, positions = \
+            self.channel_map.channel_electrodes(channels)
+        return pd.Series(self.channel_map.electrode_ids[electrode_indexes],
+                         index=channels[positions])
+
+    def actuated_channels(self, actuated_electrodes_index):
+        '''
+        Parameters
+        ----------
+        actuated_electrodes_index : list or array-like
+            Actuated electrode identifiers.
+
+        Returns
+        -------
+        pandas.Series
+            Actuated channel index values, indexed by electrode identifier.
+
+
+        .. versionchanged:: X.X.X
+            Use integer-indexed lookup tables.  Electrodes not mapped to any
+            channel are omitted.
+        '''
+        electrode_ids = np.asarray(actuated_electrodes_index,
+                                   dtype=object).ravel()
+        electrode_indexes = self.channel_map.electrode_indexes(electrode_ids)
+        valid = np.flatnonzero(electrode_indexes >= 0)
+        channels, positions = (self.channel_map
+                               .electrode_channels(electrode_indexes[valid]))
+        return pd.Series(channels, index=electrode_ids[valid[positions]])
+
+    def electrode_at(self, x, y):
+        '''
+        .. versionadded:: X.X.X
+
+        Parameters
+        ----------
+        x, y : float
+            Point coordinates (in millimeters).
+
+        Returns
+        -------
+        str or None
+            Identifier of electrode containing point (``None`` if point is not
+            inside any electrode).
+        '''
+        return self.spatial_index.electrode_at(x, y)
+
+    def electrodes_in_rect(self, xmin, ymin, xmax, ymax, contained=False):
+        '''
+        .. versionadded:: X.X.X
+
+        See :meth:`ElectrodeSpatialIndex.electrodes_in_rect`.
+        '''
+        return self.spatial_index.electrodes_in_rect(xmin, ymin, xmax, ymax,
+                                                     contained=contained)
+
+    def nearest_electrode(self, x, y, max_distance=None):
+        '''
+        .. versionadded:: X.X.X
+
+        See :meth:`ElectrodeSpatialIndex.nearest_electrode`.
+        '''
+        return self.spatial_index.nearest_electrode(x, y,
+                                                    max_distance=max_distance)
+
+    def find_path(self, source_id, target_id):
+        '''
+        Returns
+        -------
+        list
+            A list of nodes on the shortest path from source to target.
+
+
+        .. versionchanged:: X.X.X
+            Look up path in precomputed next-hop table (see :attr:`router`).
         '''
         if source_id == target_id:
             shortest_path = [source_id]
         else:
-            shortest_path = nx.dijkstra_path(self.graph, source_id, target_id,
-                                             'cost')
+            shortest_path = self.router.path(source_id, target_id)
         return shortest_path
 
+    def find_weighted_path(self, source_id, target_id, avoid=None):
+        '''
+        .. versionadded:: X.X.X
+
+        Parameters
+        ----------
+        source_id, target_id : str
+            Source and target electrode identifiers.
+        avoid : set, optional
+            Electrode identifiers that the path must not pass through.
+
+        Returns
+        -------
+        list
+            A list of nodes on the shortest path from source to target, where
+            path length is the total distance between electrode centers.
+        '''
+        if source_id == target_id:
+            return [source_id]
+        return self.router.weighted_path(source_id, target_id, avoid=avoid)
+
+    def hop_distance(self, source_id, target_id):
+        '''
+        .. versionadded:: X.X.X
+
+        Returns
+        -------
+        int
+            Number of connections on a shortest path from source to target
+            electrode (``-1`` if no path exists).
+        '''
+        if source_id == target_id:
+            return 0
+        return self.router.hop_distance(source_id, target_id)
+
     def to_svg(self):
         '''
         Returns:
 
             unicode : SVG XML source with up-to-date electrode channel lists.
-        '''
-        xml_root = etree.parse(self.svg_filepath)
 
-        # Identify electrodes with modified channel lists.
-        df_diff_channels = self.diff_electrode_channels()
 
-        # Update `svg:path` XML elements for electrodes with modified channel
-        # lists.
-        xpath = XPathEvaluator(xml_root, namespaces=INKSCAPE_NSMAP)
-        for electrode_id, (orig_i, new_i) in df_diff_channels.iterrows():
-            elements_i = xpath.evaluate('//svg:path[@id="%s"]' % electrode_id)
-            for element_i in elements_i:
-                element_i.attrib['data-channels'] = ','.join(map(str, new_i))
-        return etree.tounicode(xml_root)
+        .. versionchanged:: X.X.X
+            Keep parsed SVG document between calls and only update
+            ``data-channels`` attributes of electrodes changed since the
+            previous call.  Electrode polygons are also updated.  Output is
+            reused until channel mappings are modified.
+        '''
+        def _render():
+            document = getattr(self, '_svg_document', None)
+            if document is None:
+                document = self._svg_document = \
+                    DeviceSvgDocument(self.svg_filepath)
+                # Freshly parsed document contains original channels.
+                self._svg_pending = set(self._modified_electrodes)
+
+            for electrode_id in self._svg_pending:
+                if electrode_id in self._modified_electrodes:
+                    document.set_channels(electrode_id,
+                                          self.get_channels(electrode_id))
+                else:
+                    document.restore_channels(electrode_id)
+            self._svg_pending = set()
+            return document.tounicode()
+        return self._channel_table('svg', _render)
 
     def diff_electrode_channels(self):
         '''
@@ -377,30 +1148,416 @@ class DmfDevice(object):
             Frame containing modified electrode channel lists.  The two columns
             contain a list for the original and new assigned channels,
             respectively, indexed by ``electrode_id``.
-        '''
-        original_channels = extract_channels(self.df_shapes)
-        original_groups = original_channels.groupby('electrode_id').groups
-
-        new_channels = self.df_electrode_channels.copy()
-        new_groups = new_channels.groupby('electrode_id').groups
 
-        rows = []
 
-        for electrode_id, new_channel_indexes in new_groups.iteritems():
-            if electrode_id not in original_groups:
-                orig_i = []
-            else:
-                orig_i = (original_channels.channel
-                          .values[original_groups[electrode_id]].tolist())
-            new_i = new_channels.channel.values[new_channel_indexes].tolist()
-            if not (orig_i == new_i):
-                rows.append((electrode_id, orig_i, new_i))
+        .. versionchanged:: X.X.X
+            Only compare channels of electrodes modified since loading, and
+            include electrodes with all channels removed.
+        '''
+        rows = [(electrode_id,
+                 list(self._original_channels.get(electrode_id, ())),
+                 list(self._electrode_channels.get(electrode_id, ())))
+                for electrode_id in sorted(self._modified_electrodes)]
         if not rows:
             rows = None
         return pd.DataFrame(rows, columns=['electrode_id', 'original',
                                            'new']).set_index('electrode_id')
 
 
+class DeviceSvgDocument(object):
+    '''
+    .. versionadded:: X.X.X
+
+    Parsed device SVG document, with electrode elements (i.e., paths and
+    polygons in ``Device`` layer) indexed by electrode identifier.
+
+    Parameters
+    ----------
+    svg_filepath : str
+        Path to SVG file.
+    '''
+    def __init__(self, svg_filepath):
+        self.tree = etree.parse(svg_filepath)
+        self.elements = {}
+        for element in self.tree.xpath(ELECTRODES_XPATH,
+                                       namespaces=INKSCAPE_NSMAP):
+            self.elements.setdefault(element.get('id'), []).append(element)
+        # Original ``data-channels`` attribute value of each element modified
+        # by :meth:`set_channels`.
+        self._original_attributes = {}
+
+    def set_channels(self, electrode_id, channels):
+        '''
+        Set ``data-channels`` attribute of electrode elements.
+
+        Parameters
+        ----------
+        electrode_id : str
+            Electrode identifier.
+        channels : list
+            List of channels mapped to electrode.
+        '''
+        elements = self.elements.get(electrode_id, [])
+        self._original_attributes.setdefault(electrode_id,
+                                             [element.get('data-channels')
+                                              for element in elements])
+        for element in elements:
+            element.set('data-channels', ','.join(map(str, channels)))
+
+    def restore_channels(self, electrode_id):
+        '''
+        Restore original ``data-channels`` attribute of electrode elements.
+        '''
+        originals = self._original_attributes.pop(electrode_id, None)
+        if originals is None:
+            return
+        for element, original in zip(self.elements.get(electrode_id, []),
+                                     originals):
+            if original is None:
+                element.attrib.pop('data-channels', None)
+            else:
+                element.set('data-channels', original)
+
+    def tounicode(self):
+        '''
+        Returns
+        -------
+        unicode
+            SVG XML source.
+        '''
+        return etree.tounicode(self.tree)
+
+
+class ElectrodeChannelMap(object):
+    '''
+    .. versionadded:: X.X.X
+
+    Compiled, integer-indexed electrode/channel mapping.
+
+    Each electrode is identified by a dense integer index, i.e., the position
+    of the electrode identifier in :attr:`electrode_ids`.  The electrode to
+    channels and channel to electrodes mappings are each stored in compressed
+    sparse row (CSR) form.
+
+    Parameters
+    ----------
+    electrode_areas : pandas.Series
+        Area of each electrode, indexed by electrode identifier.
+    df_electrode_channels : pandas.DataFrame
+        Table with one row per channel mapped to an electrode, with the columns
+        ``electrode_id`` and ``channel``.
+
+    Attributes
+    ----------
+    electrode_ids : numpy.ndarray
+        Electrode identifiers, ordered by integer electrode index.
+    electrode_areas : numpy.ndarray
+        Area of each electrode, ordered by integer electrode index.
+    channel_count : int
+        Number of channels (i.e., maximum mapped channel + 1).
+    electrode_channels_indptr, electrode_channels_indices : numpy.ndarray
+        Electrode to channels mapping in CSR form.
+    channel_electrodes_indptr, channel_electrodes_indices : numpy.ndarray
+        Channel to electrodes mapping in CSR form.
+    '''
+    def __init__(self, electrode_areas, df_electrode_channels):
+        self.electrode_ids = electrode_areas.index.values.astype(object)
+        self.electrode_areas = electrode_areas.values.astype(float)
+        self._electrode_index = dict(zip(self.electrode_ids,
+                                         xrange(self.electrode_ids.size)))
+
+        electrodes = self.electrode_indexes(df_electrode_channels
+                                            ['electrode_id'].values)
+        channels = df_electrode_channels['channel'].values.astype(int)
+        # Ignore mappings to unknown electrodes.
+        valid = (electrodes >= 0) & (channels >= 0)
+        electrodes = electrodes[valid]
+        channels = channels[valid]
+
+        self.channel_count = channels.max() + 1 if channels.size else 0
+        (self.electrode_channels_indptr,
+         self.electrode_channels_indices) = \
+            csr_from_pairs(electrodes, channels, self.electrode_ids.size)
+        (self.channel_electrodes_indptr,
+         self.channel_electrodes_indices) = \
+            csr_from_pairs(channels, electrodes, self.channel_count)
+
+    def electrode_indexes(self, electrode_ids):
+        '''
+        Parameters
+        ----------
+        electrode_ids : list or array-like
+            Electrode identifiers.
+
+        Returns
+        -------
+        numpy.ndarray
+            Integer index of each electrode (``-1`` for unknown electrodes).
+        '''
+        lookup = self._electrode_index.get
+        return np.fromiter((lookup(id_i, -1) for id_i in electrode_ids),
+                           dtype=int, count=len(electrode_ids))
+
+    def electrode_state_vector(self, electrode_states):
+        '''
+        Parameters
+        ----------
+        electrode_states : pandas.Series
+            Electrode states, indexed by electrode identifier.
+
+        Returns
+        -------
+        numpy.ndarray
+            State of each electrode, ordered by integer electrode index.
+            Electrodes without a specified state are set to zero.
+        '''
+        state_vector = np.zeros(self.electrode_ids.size)
+        electrode_indexes = self.electrode_indexes(electrode_states.index)
+        valid = electrode_indexes >= 0
+        state_vector[electrode_indexes[valid]] = \
+            electrode_states.values[valid]
+        return state_vector
+
+    def electrode_channels(self, electrode_indexes):
+        '''
+        Parameters
+        ----------
+        electrode_indexes : array-like
+            Integer electrode indexes.
+
+        Returns
+        -------
+        tuple
+            ``(channels, positions)``, where ``positions`` is the position in
+            :data:`electrode_indexes` of the electrode corresponding to each
+            channel.
+        '''
+        return csr_gather(self.electrode_channels_indptr,
+                           self.electrode_channels_indices,
+                           np.asarray(electrode_indexes, dtype=int))
+
+    def channel_electrodes(self, channels):
+        '''
+        Parameters
+        ----------
+        channels : array-like
+            Channel indexes.
+
+        Returns
+        -------
+        tuple
+            ``(electrode_indexes, positions)``, where ``positions`` is the
+            position in :data:`channels` of the channel corresponding to each
+            electrode.  Channels outside the mapped range are ignored.
+        '''
+        channels = np.asarray(channels, dtype=int)
+        valid = np.flatnonzero((channels >= 0) &
+                               (channels < self.channel_count))
+        electrode_indexes, positions = \
+            csr_gather(self.channel_electrodes_indptr,
+                        self.channel_electrodes_indices, channels[valid])
+        return electrode_indexes, valid[positions]
+
+    def channels_for(self, electrode_indexes):
+        '''
+        Returns
+        -------
+        numpy.ndarray
+            Sorted unique channels mapped to the specified electrodes.
+        '''
+        return np.unique(self.electrode_channels(electrode_indexes)[0])
+
+    def electrodes_for(self, channels):
+        '''
+        Returns
+        -------
+        numpy.ndarray
+            Sorted unique integer indexes of electrodes mapped to the
+            specified channels.
+        '''
+        return np.unique(self.channel_electrodes(channels)[0])
+
+    def area_of(self, state_vector):
+        '''
+        Parameters
+        ----------
+        state_vector : array-like
+            Actuation state of each electrode, ordered by integer electrode
+            index.  Any state greater than zero is considered actuated.
+
+        Returns
+        -------
+        float
+            Area of actuated electrodes.
+        '''
+        return np.dot(np.asarray(state_vector) > 0, self.electrode_areas)
+
+    def channel_areas(self):
+        '''
+        Returns
+        -------
+        pandas.Series
+            Total area of electrodes mapped to each channel, indexed by
+            channel (only channels mapped to at least one electrode are
+            included).
+        '''
+        counts = np.diff(self.channel_electrodes_indptr)
+        channels = np.repeat(np.arange(self.channel_count), counts)
+        areas = np.bincount(channels, weights=self.electrode_areas
+                            [self.channel_electrodes_indices],
+                            minlength=self.channel_count)
+        mapped = np.flatnonzero(counts)
+        return pd.Series(areas[mapped], index=mapped)
+
+    @property
+    def incidence(self):
+        '''
+        .. versionadded:: X.X.X
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            Boolean ``electrodes x channels`` matrix, ``True`` where a channel
+            is mapped to an electrode.
+        '''
+        if getattr(self, '_incidence', None) is None:
+            self._incidence = \
+                sp.csr_matrix((np.ones(self.electrode_channels_indices.size,
+                                       dtype=bool),
+                               self.electrode_channels_indices,
+                               self.electrode_channels_indptr),
+                              shape=(self.electrode_ids.size,
+                                     self.channel_count))
+        return self._incidence
+
+    def electrode_state_matrix(self, electrode_states):
+        '''
+        .. versionadded:: X.X.X
+
+        Parameters
+        ----------
+        electrode_states : list
+            Electrode states (:class:`pandas.Series` indexed by electrode
+            identifier) for each step.  Steps may be ``None`` (i.e., no
+            electrodes actuated).
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            Boolean ``steps x electrodes`` matrix, ``True`` where an electrode
+            is actuated (i.e., state greater than zero) in a step.  Unknown
+            electrodes are ignored.
+        '''
+        electrode_states = list(electrode_states)
+        rows = []
+        electrode_ids = []
+        for i, states_i in enumerate(electrode_states):
+            if states_i is None or not states_i.shape[0]:
+                continue
+            actuated = np.asarray(states_i.values) > 0
+            electrode_ids.extend(states_i.index.values[actuated])
+            rows.append(np.repeat(i, actuated.sum()))
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=int)
+        columns = self.electrode_indexes(electrode_ids)
+        known = columns >= 0
+        matrix = sp.csr_matrix((np.ones(known.sum(), dtype=bool),
+                                (rows[known], columns[known])),
+                               shape=(len(electrode_states),
+                                      self.electrode_ids.size))
+        # Duplicate electrode identifiers are summed; restore boolean values.
+        return matrix > 0
+
+    def channel_state_matrix(self, state_matrix):
+        '''
+        .. versionadded:: X.X.X
+
+        Parameters
+        ----------
+        state_matrix : array-like or scipy.sparse.spmatrix
+            ``steps x electrodes`` actuation states, ordered by integer
+            electrode index.  Any state greater than zero is considered
+            actuated.
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            Boolean ``steps x channels`` matrix, ``True`` where a channel is
+            mapped to at least one actuated electrode in a step.
+        '''
+        state_matrix = _boolean_matrix(state_matrix, self.electrode_ids.size)
+        return (state_matrix.astype(np.int32) *
+                self.incidence.astype(np.int32)) > 0
+
+    def electrodes_matrix_for(self, channel_matrix):
+        '''
+        .. versionadded:: X.X.X
+
+        Parameters
+        ----------
+        channel_matrix : array-like or scipy.sparse.spmatrix
+            ``steps x channels`` actuation states.  Any state greater than
+            zero is considered actuated.  Channels outside the mapped range
+            are ignored.
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            Boolean ``steps x electrodes`` matrix, ``True`` where an electrode
+            is mapped to at least one actuated channel in a step.
+        '''
+        channel_matrix = _boolean_matrix(channel_matrix, self.channel_count)
+        return (channel_matrix.astype(np.int32) *
+                self.incidence.T.astype(np.int32)) > 0
+
+    def areas_of(self, state_matrix):
+        '''
+        .. versionadded:: X.X.X
+
+        Parameters
+        ----------
+        state_matrix : array-like or scipy.sparse.spmatrix
+            ``steps x electrodes`` actuation states, ordered by integer
+            electrode index.  Any state greater than zero is considered
+            actuated.
+
+        Returns
+        -------
+        numpy.ndarray
+            Area of actuated electrodes in each step.
+        '''
+        state_matrix = _boolean_matrix(state_matrix, self.electrode_ids.size)
+        return state_matrix.astype(float).dot(self.electrode_areas)
+
+
+def _boolean_matrix(matrix, column_count):
+    '''
+    .. versionadded:: X.X.X
+
+    Parameters
+    ----------
+    matrix : array-like or scipy.sparse.spmatrix
+        Two-dimensional states (a one-dimensional array is treated as a single
+        row).
+    column_count : int
+        Number of columns of output matrix.  Extra columns are ignored and
+        missing columns are treated as zero.
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        Boolean matrix, ``True`` where state is greater than zero.
+    '''
+    if sp.issparse(matrix):
+        matrix = sp.csr_matrix(matrix)
+    else:
+        matrix = sp.csr_matrix(np.atleast_2d(np.asarray(matrix)))
+    matrix = matrix[:, :column_count] > 0
+    if matrix.shape[1] < column_count:
+        matrix = sp.csr_matrix((matrix.data, matrix.indices, matrix.indptr),
+                               shape=(matrix.shape[0], column_count))
+    return matrix
+
+
 def extract_channels(df_shapes):
     '''
     Load the channels associated with each electrode from the device layer of
@@ -424,6 +1581,11 @@ def extract_channels(df_shapes):
         Each row corresponds to a channel connected to an electrode, where the
         ``"electrode_id"`` column corresponds to the ``"id"`` attribute of the
         corresponding SVG polygon.
+
+
+    .. versionchanged:: X.X.X
+        Ignore empty entries in ``data-channels`` attribute (e.g., for
+        electrodes with no channels).
     '''
     frames = []
 
@@ -434,7 +1596,10 @@ def extract_channels(df_shapes):
                                .str.split(',').dropna())
 
         for shape_i, channels_i in shape_channel_lists.iteritems():
-            frames.extend([[shape_i, int(channel)] for channel in channels_i])
+            # Skip empty entries (e.g., `data-channels=""` for electrode with
+            # no channels).
+            frames.extend([[shape_i, int(channel)] for channel in channels_i
+                           if channel.strip()])
 
     if frames:
         df_channels = pd.DataFrame(frames, columns=['electrode_id', 'channel'])
@@ -444,6 +1609,31 @@ def extract_channels(df_shapes):
     return df_channels
 
 
+def channels_by_electrode_id(df_electrode_channels):
+    '''
+    .. versionadded:: X.X.X
+
+    Parameters
+    ----------
+    df_electrode_channels : pandas.DataFrame
+        Table with one row per channel mapped to an electrode, with the columns
+        ``electrode_id`` and ``channel``.
+
+    Returns
+    -------
+    collections.OrderedDict
+        Tuple of channels mapped to each electrode, in order of first
+        appearance in table.
+    '''
+    electrode_channels = OrderedDict()
+    for electrode_id, channel in \
+            zip(df_electrode_channels['electrode_id'].values,
+                df_electrode_channels['channel'].values):
+        electrode_channels.setdefault(electrode_id, []).append(int(channel))
+    return OrderedDict((electrode_id, tuple(channels)) for electrode_id,
+                       channels in electrode_channels.iteritems())
+
+
 def electrode_neighbours(device):
     '''
     .. versionadded:: 2.28
@@ -518,3 +1708,297 @@ def electrode_neighbours(device):
     df_electrode_neighbours['left'] = left
     df_electrode_neighbours['right'] = right
     return df_electrode_neighbours
+
+
+def svg_content_hash(svg_filepath, chunk_size=1 << 16):
+    '''
+    .. versionadded:: X.X.X
+
+    Parameters
+    ----------
+    svg_filepath : str
+        Path to SVG file.
+    chunk_size : int, optional
+        Number of bytes to read at a time.
+
+    Returns
+    -------
+    str
+        SHA-256 hex digest of SVG file contents.
+    '''
+    content_hash = hashlib.sha256()
+    with open(svg_filepath, 'rb') as input_:
+        for chunk_i in iter(lambda: input_.read(chunk_size), b''):
+            content_hash.update(chunk_i)
+    return content_hash.hexdigest()
+
+
+def device_cache_path(cache_dir, svg_filepath):
+    '''
+    .. versionadded:: X.X.X
+
+    Parameters
+    ----------
+    cache_dir : str
+        Parsed-device cache directory.
+    svg_filepath : str
+        Path to SVG file.
+
+    Returns
+    -------
+    path_helpers.path
+        Path to cache entry for the current contents of the SVG file.
+    '''
+    return path(cache_dir).joinpath('%s.pickle' %
+                                    svg_content_hash(svg_filepath))
+
+
+def read_device_cache(cache_path):
+    '''
+    .. versionadded:: X.X.X
+
+    Parameters
+    ----------
+    cache_path : str
+        Path to parsed-device cache entry.
+
+    Returns
+    -------
+    dict or None
+        Cached device attributes, indexed by attribute name.
+
+        Returns ``None`` if cache entry does not exist, cannot be read, or was
+        written by a different cache format version.
+    '''
+    cache_path = path(cache_path)
+    if not cache_path.isfile():
+        return None
+    try:
+        with cache_path.open('rb') as input_:
+            data = pickle.load(input_)
+    except Exception:
+        logger.debug('Error reading device cache `%s`.', cache_path,
+                     exc_info=True)
+        return None
+    if data.get('version') != DEVICE_CACHE_VERSION:
+        logger.debug('Ignore device cache `%s` (version %s != %s).',
+                     cache_path, data.get('version'), DEVICE_CACHE_VERSION)
+        return None
+    return data['attributes']
+
+
+def write_device_cache(cache_path, attributes):
+    '''
+    .. versionadded:: X.X.X
+
+    Write device attributes to parsed-device cache entry.
+
+    The entry is first written to a temporary file in the cache directory and
+    then moved into place, so a partially written entry is never read.
+
+    Parameters
+    ----------
+    cache_path : str
+        Path to parsed-device cache entry.
+    attributes : dict
+        Device attributes, indexed by attribute name.
+
+    Returns
+    -------
+    bool
+        ``True`` if cache entry was written successfully.
+    '''
+    cache_path = path(cache_path)
+    temp_path = None
+    try:
+        cache_path.parent.makedirs_p()
+        with tempfile.NamedTemporaryFile(dir=cache_path.parent, delete=False,
+                                         suffix='.tmp') as output:
+            temp_path = path(output.name)
+            pickle.dump({'version': DEVICE_CACHE_VERSION,
+                         'attributes': attributes}, output, -1)
+        if os.name == 'nt' and cache_path.isfile():
+            # `os.rename` does not overwrite existing files on Windows.
+            cache_path.remove()
+        os.rename(temp_path, cache_path)
+    except Exception:
+        logger.debug('Error writing device cache `%s`.', cache_path,
+                     exc_info=True)
+        if temp_path is not None:
+            temp_path.remove_p()
+        return False
+    return True
+
+
+def device_memory_usage(device):
+    '''
+    .. versionadded:: X.X.X
+
+    Parameters
+    ----------
+    device : DmfDevice
+
+    Returns
+    -------
+    int
+        Approximate number of bytes used by data frames and arrays referenced
+        by device (including cached derived attributes).
+    '''
+    seen = set()
+
+    def _size(value):
+        if id(value) in seen:
+            return 0
+        seen.add(id(value))
+        if isinstance(value, pd.DataFrame):
+            return int(value.memory_usage(index=True).sum())
+        elif isinstance(value, pd.Series):
+            return int(value.memory_usage(index=True))
+        elif isinstance(value, np.ndarray):
+            return value.nbytes
+        elif isinstance(value, sp.spmatrix):
+            return sum(_size(getattr(value, name, None))
+                       for name in ('data', 'indices', 'indptr'))
+        elif isinstance(value, dict):
+            return sum(_size(v) for v in value.itervalues())
+        elif isinstance(value, (list, tuple, set)):
+            return sum(_size(v) for v in value)
+        elif hasattr(value, '__dict__') and not isinstance(value, type):
+            return _size(vars(value))
+        return 0
+    return _size(vars(device))
+
+
+class DeviceLRUCache(object):
+    '''
+    .. versionadded:: X.X.X
+
+    In-memory cache of recently used devices, keyed by SVG file path and
+    modification time.
+
+    Devices are stored and returned as copies (see :meth:`DmfDevice.copy`),
+    so channel mappings of cached devices are never modified.  Attributes
+    derived from connections that are computed on a returned copy (e.g.,
+    :attr:`DmfDevice.graph`) are shared with the cached device.
+
+    Parameters
+    ----------
+    max_size : int, optional
+        Maximum number of cached devices (``0`` disables cache).
+    max_memory : int, optional
+        Maximum total (approximate) memory used by cached devices, in bytes
+        (see :func:`device_memory_usage`).
+    '''
+    def __init__(self, max_size=4, max_memory=256 << 20):
+        self.max_size = max_size
+        self.max_memory = max_memory
+        # Cached `(device, memory)` entries, in order of least recent use.
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(svg_filepath):
+        '''
+        Returns
+        -------
+        tuple
+            ``(real path, modification time)`` of SVG file.
+        '''
+        svg_filepath = path(svg_filepath).realpath()
+        return str(svg_filepath), svg_filepath.getmtime()
+
+    @property
+    def memory_usage(self):
+        '''
+        Returns
+        -------
+        int
+            Approximate total memory used by cached devices, in bytes.
+        '''
+        return sum(memory for device, memory in self._entries.itervalues())
+
+    def get(self, svg_filepath):
+        '''
+        Parameters
+        ----------
+        svg_filepath : str
+            Path to device SVG file.
+
+        Returns
+        -------
+        DmfDevice or None
+            Copy of cached device loaded from current version of SVG file
+            (``None`` if not cached).
+        '''
+        try:
+            key = self.key(svg_filepath)
+        except OSError:
+            return None
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Mark as most recently used.
+        self._entries[key] = entry
+        device = entry[0].copy()
+        device.name = path(svg_filepath).namebase
+        device._lru_key = key
+        return device
+
+    def put(self, device):
+        '''
+        Add device to cache.
+
+        Devices with modified channel mappings are not cached.
+
+        Parameters
+        ----------
+        device : DmfDevice
+            Device loaded from :attr:`DmfDevice.svg_filepath`.  Devices
+            previously returned by :meth:`get` (or added with :meth:`put`)
+            are cached under the SVG file modification time at that point.
+
+        Returns
+        -------
+        bool
+            ``True`` if device was added to cache.
+        '''
+        if self.max_size <= 0 or device.modified_electrodes:
+            return False
+        key = getattr(device, '_lru_key', None)
+        if key is None:
+            try:
+                key = device._lru_key = self.key(device.svg_filepath)
+            except OSError:
+                return False
+        memory = device_memory_usage(device)
+        if memory > self.max_memory:
+            logger.debug('Device `%s` is too large to cache (%d bytes).',
+                         device.svg_filepath, memory)
+            self._entries.pop(key, None)
+            return False
+        self._entries.pop(key, None)
+        self._entries[key] = device.copy(), memory
+        # Evict least recently used devices.
+        while (len(self._entries) > self.max_size or
+               self.memory_usage > self.max_memory):
+            evicted_key, _ = self._entries.popitem(last=False)
+            logger.debug('Evict device `%s` (modified %s) from cache.',
+                         *evicted_key)
+        return True
+
+    def discard(self, svg_filepath):
+        '''
+        Remove all cached versions of device SVG file.
+        '''
+        svg_filepath = str(path(svg_filepath).realpath())
+        for key in [key for key in self._entries if key[0] == svg_filepath]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
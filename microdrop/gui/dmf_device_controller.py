@@ -15,8 +15,10 @@ import path_helpers as ph
 import svg_model as sm
 
 from ..app_context import get_app
-from ..default_paths import DEVICES_DIR, update_recent, update_recent_menu
-from ..dmf_device import DmfDevice, ELECTRODES_XPATH
+from ..connection_detection import auto_detect_adjacent_shapes
+from ..default_paths import (DEVICES_DIR, DEVICE_CACHE_DIR, update_recent,
+                             update_recent_menu)
+from ..dmf_device import DeviceLRUCache, DmfDevice, ELECTRODES_XPATH
 from logging_helpers import _L  #: .. versionadded:: 2.20
 from ..plugin_manager import (IPlugin, SingletonPlugin, implements,
                               PluginGlobals, ScheduleRequest, emit_signal)
@@ -129,6 +131,9 @@ class DmfDeviceController(SingletonPlugin):
         self.name = "microdrop.gui.dmf_device_controller"
         self.previous_device_dir = None
         self._modified = False
+        #: .. versionadded:: X.X.X
+        #:     Recently used devices (see :meth:`load_device`).
+        self.device_cache = DeviceLRUCache()
 
     @property
     def modified(self):
@@ -155,6 +160,10 @@ class DmfDeviceController(SingletonPlugin):
 
         .. versionchanged:: X.X.X
             Copy stock devices to user default devices directory.
+
+        .. versionchanged:: X.X.X
+            Configure recently used devices cache from ``cache_size`` and
+            ``cache_memory_mb`` options of ``dmf_device`` config section.
         '''
         logger = _L()
         # Copy stock devices to user default devices directory.
@@ -182,6 +191,10 @@ class DmfDeviceController(SingletonPlugin):
         app = get_app()
         app.dmf_device_controller = self
 
+        self.device_cache.max_size = app.config['dmf_device']['cache_size']
+        self.device_cache.max_memory = \
+            int(app.config['dmf_device']['cache_memory_mb'] * (1 << 20))
+
         self.menu_detect_connections = \
             app.builder.get_object('menu_detect_connections')
         self.menu_import_dmf_device = \
@@ -258,6 +271,15 @@ class DmfDeviceController(SingletonPlugin):
         .. versionchanged:: 2.33
             Save path to loaded SVG device file in config file (rather than
             just the device name).
+
+        .. versionchanged:: X.X.X
+            Use parsed-device cache in :data:`DEVICE_CACHE_DIR` (unless
+            ``cache_dir`` keyword argument is specified).
+
+        .. versionchanged:: X.X.X
+            Reuse recently used device if SVG file has not been modified since
+            the device was loaded (see :attr:`device_cache`).  Add previous
+            device to recently used devices (unless it has unsaved changes).
         '''
         logger = _L()  # use logger with method context
         app = get_app()
@@ -267,9 +289,17 @@ class DmfDeviceController(SingletonPlugin):
         try:
             logger.info('load_device: %s' % file_path)
 
-            # Load device from SVG file.
-            device = DmfDevice.load(file_path, name=file_path.namebase,
-                                    **kwargs)
+            if device is not None:
+                self.device_cache.put(device)
+            device = self.device_cache.get(file_path)
+            if device is None:
+                # Load device from SVG file.
+                kwargs.setdefault('cache_dir', DEVICE_CACHE_DIR)
+                device = DmfDevice.load(file_path, name=file_path.namebase,
+                                        **kwargs)
+                self.device_cache.put(device)
+            else:
+                logger.debug('Reuse recently used device `%s`.', file_path)
             if DEVICES_DIR.relpathto(file_path).splitall()[0] == '..':
                 # Device is not in default devices directory. Store absolute
                 # filepath.
@@ -305,6 +335,10 @@ class DmfDeviceController(SingletonPlugin):
         .. versionchanged:: 2.33
             Deprecate ``rename`` keyword argument.  Use standard file chooser
             dialog to select device output path.
+
+        .. versionchanged:: X.X.X
+            Add saved device to recently used devices, so it is not parsed
+            again when reloaded from the output path.
         '''
         app = get_app()
         default_path = app.config['dmf_device'].get('filepath')
@@ -343,6 +377,7 @@ class DmfDeviceController(SingletonPlugin):
         emit_signal('on_dmf_device_saved', [app.dmf_device,
                                             str(output_path)])
 
+        self.device_cache.put(app.dmf_device.saved_as(output_path))
         self.load_device(output_path)
         return output_path
 
@@ -430,6 +465,11 @@ class DmfDeviceController(SingletonPlugin):
         .. versionchanged:: X.X.X
             Prompt for output file location instead of forcefully overwriting
             source device SVG file.
+
+        .. versionchanged:: X.X.X
+            Detect connections in parallel device tiles (see
+            :mod:`microdrop.connection_detection`) and display fraction of
+            tiles processed.
         '''
         app = get_app()
         svg_source = ph.path(app.dmf_device.svg_filepath)
@@ -482,20 +522,35 @@ class DmfDeviceController(SingletonPlugin):
                 # Load new device.
                 self.load_device(output_path)
 
+        # Fraction of device tiles processed by connection detection.
+        state = {'fraction': 0.}
+
+        def on_progress(fraction):
+            state['fraction'] = fraction
+
         with ThreadPoolExecutor() as executor:
             # Use background thread to auto-detect adjacent electrodes from SVG
-            # paths and polygons from `Device` layer.
-            future = executor.submit(sm.detect_connections
-                                     .auto_detect_adjacent_shapes, svg_source,
-                                     shapes_xpath=ELECTRODES_XPATH)
+            # paths and polygons from `Device` layer.  Device is partitioned
+            # into tiles, which are processed in a pool of worker processes.
+            future = executor.submit(auto_detect_adjacent_shapes, svg_source,
+                                     shapes_xpath=ELECTRODES_XPATH,
+                                     progress=on_progress)
 
             def update_progress():
                 while not future.done():
-                    gtk_threadsafe(progress.pulse)()
+                    if state['fraction'] > 0:
+                        gtk_threadsafe(progress.set_fraction)(state
+                                                              ['fraction'])
+                        gtk_threadsafe(progress.set_text)('%.0f%%' %
+                                                          (100 *
+                                                           state['fraction']))
+                    else:
+                        # Reading shapes from SVG source.
+                        gtk_threadsafe(progress.pulse)()
                     time.sleep(.25)
                 gtk_threadsafe(dialog.destroy)()
 
-            # Launch dialog with pulsing progress indicator.
+            # Launch dialog with progress indicator.
             threads = [threading.Thread(target=f)
                        for f in (update_progress, )]
             for t in threads:
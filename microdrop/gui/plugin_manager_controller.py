@@ -11,7 +11,8 @@ from ..app_context import get_app
 from ..gui.plugin_manager_dialog import PluginManagerDialog
 from ..plugin_helpers import get_plugin_info
 from ..plugin_manager import (IPlugin, implements, SingletonPlugin,
-                              PluginGlobals, get_service_instance,
+                              PluginGlobals, PluginProxy,
+                              get_service_instance,
                               enable as enable_service,
                               disable as disable_service)
 
@@ -69,7 +70,14 @@ class PluginController(object):
         '''
         Update reference to plugin/service instance and update enable button
         state.
+
+        .. versionchanged:: X.X.X
+            Follow plugin service once plugin proxy is imported (see
+            :class:`microdrop.plugin_manager.PluginProxy`).
         '''
+        if isinstance(self.service, PluginProxy) and \
+                self.service.service is not None:
+            self.plugin_class = self.service.service.__class__
         self.service = get_service_instance(self.plugin_class)
         if self.enabled():
             self.button_enable.set_label('Disable')
@@ -117,7 +125,12 @@ class PluginController(object):
         -------
         path_helpers.path
             Path to plugin directory.
+
+        .. versionchanged:: X.X.X
+            Support plugin proxies (i.e., plugins not imported yet).
         '''
+        if isinstance(self.service, PluginProxy):
+            return self.service.plugin_dir
         # Find path to file where plugin/service class is defined.
         class_def_file = ph.path(inspect.getfile(self.service.__class__))
 
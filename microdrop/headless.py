@@ -0,0 +1,391 @@
+'''
+.. versionadded:: X.X.X
+
+Run protocols without the GTK user interface.
+
+A :class:`HeadlessApp` stands in for the GUI application (see
+:func:`microdrop.app_context.get_app`), holding the configuration, the loaded
+DMF device, and the loaded protocol.  Only the core plugins required to
+execute steps (see :data:`HEADLESS_CORE_PLUGIN_MODULES`) and the chosen
+plugins are enabled.  Steps are executed using
+:func:`microdrop.core_plugins.protocol_controller.execute_steps` on a
+dedicated event loop, and the duration of each step is recorded.
+
+See :mod:`microdrop.bin.run_protocol` for the command-line entry point.
+
+.. note::
+    Importing this module sets the :data:`microdrop.app_context.HEADLESS_ENV`
+    environment variable, so it must be imported *before* any module
+    depending on GTK.
+'''
+from StringIO import StringIO
+from collections import namedtuple
+import importlib
+import logging
+import os
+import time
+
+# Must be set before importing `app_context` (see `app_context.HEADLESS_ENV`).
+os.environ['MICRODROP_HEADLESS'] = '1'
+
+import blinker
+import path_helpers as ph
+import trollius as asyncio
+
+from . import plugin_manager
+from .app_context import (get_app, MODE_PROGRAMMING,
+                          MODE_REAL_TIME_PROGRAMMING, MODE_RUNNING,
+                          MODE_REAL_TIME_RUNNING)
+from .config import Config
+from .dmf_device import DmfDevice
+from .interfaces import IApplicationMode
+from .plugin_manager import (IPlugin, PluginGlobals, SingletonPlugin,
+                             implements)
+from .protocol import Protocol
+
+logger = logging.getLogger(__name__)
+
+#: Modules which load (and initialize) the core singleton plugins required to
+#: execute protocol steps (in import order).
+HEADLESS_CORE_PLUGIN_MODULES = ['core_plugins.zmq_hub_plugin',
+                                'core_plugins.command_plugin',
+                                'core_plugins.electrode_controller_plugin'
+                                '.pyutilib']
+#: Module which loads the simulated electrode actuator and waveform generator
+#: plugin (see :func:`initialize_plugins`).
+SIMULATOR_PLUGIN_MODULE = 'core_plugins.simulator_plugin'
+
+#: Duration of a protocol step, and gap between the last actuation of the
+#: previous step and the first actuation of the step (``None`` if unknown).
+StepTiming = namedtuple('StepTiming', 'repeat step start duration gap')
+
+
+PluginGlobals.push_env('microdrop')
+
+
+class HeadlessApp(SingletonPlugin):
+    '''
+    Application state for running protocols without GTK.
+
+    Attributes
+    ----------
+    config : microdrop.config.Config
+        Application configuration (see :meth:`load_config`).
+    dmf_device : microdrop.dmf_device.DmfDevice
+        Loaded device (see :meth:`load_device`).
+    protocol : microdrop.protocol.Protocol
+        Loaded protocol (see :meth:`load_protocol`).
+    '''
+    implements(IPlugin)
+
+    def __init__(self):
+        self.name = 'microdrop.app'
+        self.gtk_thread = None
+        self.config = None
+        self.plugin_data = {}
+        self.dmf_device = None
+        self.protocol = None
+        self.experiment_log = None
+        self.protocol_controller = None
+        self._realtime_mode = False
+        self._running = False
+
+    @property
+    def realtime_mode(self):
+        return self._realtime_mode
+
+    @realtime_mode.setter
+    def realtime_mode(self, value):
+        if self._realtime_mode != value:
+            original_mode = self.mode
+            self._realtime_mode = value
+            plugin_manager.emit_signal('on_mode_changed', args=[original_mode,
+                                                                self.mode],
+                                       interface=IApplicationMode)
+
+    @property
+    def running(self):
+        return self._running
+
+    @running.setter
+    def running(self, value):
+        if self._running != value:
+            original_mode = self.mode
+            self._running = value
+            plugin_manager.emit_signal('on_mode_changed', args=[original_mode,
+                                                                self.mode],
+                                       interface=IApplicationMode)
+
+    @property
+    def mode(self):
+        if self.running and self.realtime_mode:
+            return MODE_REAL_TIME_RUNNING
+        elif self.running:
+            return MODE_RUNNING
+        elif self.realtime_mode:
+            return MODE_REAL_TIME_PROGRAMMING
+        else:
+            return MODE_PROGRAMMING
+
+    def get_data(self, plugin_name):
+        return self.plugin_data.get(plugin_name) or {}
+
+    def set_data(self, plugin_name, data):
+        self.plugin_data[plugin_name] = data
+
+    def load_config(self, config_path=None):
+        '''
+        Parameters
+        ----------
+        config_path : str, optional
+            Configuration file path (default: user configuration file).
+        '''
+        self.config = Config(config_path)
+        return self.config
+
+    def load_device(self, device_path, cache_dir=None):
+        '''
+        Parameters
+        ----------
+        device_path : str
+            Device SVG file path.
+        cache_dir : str, optional
+            Parsed device cache directory (see
+            :class:`microdrop.dmf_device.DmfDevice`).
+
+        Returns
+        -------
+        microdrop.dmf_device.DmfDevice
+            Loaded device.
+        '''
+        device_path = ph.path(device_path)
+        device = DmfDevice.load(device_path, name=device_path.namebase,
+                                cache_dir=cache_dir)
+        plugin_manager.emit_signal('on_dmf_device_swapped', [self.dmf_device,
+                                                             device])
+        return device
+
+    def load_protocol(self, protocol_path):
+        '''
+        Parameters
+        ----------
+        protocol_path : str
+            Protocol file path.
+
+        Returns
+        -------
+        microdrop.protocol.Protocol
+            Loaded protocol.
+        '''
+        protocol = Protocol.load(protocol_path)
+        plugin_manager.emit_signal('on_protocol_swapped', [self.protocol,
+                                                           protocol])
+        return protocol
+
+    def on_dmf_device_swapped(self, old_dmf_device, dmf_device):
+        self.dmf_device = dmf_device
+
+    def on_protocol_swapped(self, old_protocol, new_protocol):
+        self.protocol = new_protocol
+
+    def on_experiment_log_changed(self, experiment_log):
+        self.experiment_log = experiment_log
+
+
+PluginGlobals.pop_env()
+
+
+def initialize_plugins(plugins=None, plugins_dirs=None, simulate=False):
+    '''
+    Import and enable core plugins required to execute protocol steps, then
+    enable chosen plugins.
+
+    Parameters
+    ----------
+    plugins : list[str], optional
+        Package names of plugins to enable (e.g., ``dropbot_plugin``).
+    plugins_dirs : list[str], optional
+        Directories to load plugins from.
+    simulate : bool, optional
+        If ``True``, also enable simulated electrode actuator and waveform
+        generator (see :mod:`microdrop.core_plugins.simulator_plugin`).
+
+    Returns
+    -------
+    list[str]
+        Names of enabled plugins, in the order they were enabled.
+    '''
+    plugins = list(plugins or [])
+    module_names = list(HEADLESS_CORE_PLUGIN_MODULES)
+    if simulate:
+        module_names.append(SIMULATOR_PLUGIN_MODULE)
+    for module_name in module_names:
+        importlib.import_module('.' + module_name, __package__)
+    plugin_manager.emit_signal('on_plugin_enable')
+
+    for plugins_dir in map(ph.path, plugins_dirs or []):
+        if plugins_dir.isdir():
+            plugin_manager.load_plugins(plugins_dir, import_from_parent=False,
+                                        enabled=plugins)
+
+    observers = {}
+    for package_name in plugins:
+        service = (plugin_manager
+                   .get_service_instance_by_package_name(package_name))
+        observers[service.name] = service
+    schedule = plugin_manager.get_schedule(observers, 'on_plugin_enable')
+    for name in schedule:
+        plugin_manager.enable(name)
+    return schedule
+
+
+@asyncio.coroutine
+def run_protocol(protocol, repeats=None, signals=None, pipeline=False):
+    '''
+    XXX Coroutine XXX
+
+    Execute all protocol steps and record the duration of each step.
+
+    Parameters
+    ----------
+    protocol : microdrop.protocol.Protocol
+        Protocol to run.
+    repeats : int, optional
+        Number of times to run protocol (default:
+        :attr:`microdrop.protocol.Protocol.n_repeats`).
+    signals : blinker.Namespace, optional
+        Run-scoped signals namespace passed to plugins (see
+        ``on_protocol_signals()``) and to
+        :func:`microdrop.core_plugins.protocol_controller.execute_steps`.
+    pipeline : bool, optional
+        If ``True``, start each step while the previous step is executing
+        (see :func:`microdrop.core_plugins.protocol_controller
+        .execute_steps`).
+
+    Returns
+    -------
+    list[StepTiming]
+        Duration of each step and gap since the previous step (in seconds),
+        with step start time relative to the start of the protocol.
+    '''
+    from .core_plugins.protocol_controller import execute_steps
+
+    if repeats is None:
+        repeats = protocol.n_repeats
+    if signals is None:
+        signals = blinker.Namespace()
+
+    steps = protocol.to_dict()['steps']
+    timings = []
+    started = {}
+    state = {'repeat': 0, 'start': time.time()}
+
+    @asyncio.coroutine
+    def on_step_started(sender, **kwargs):
+        started[kwargs['i']] = time.time()
+
+    @asyncio.coroutine
+    def on_step_completed(sender, **kwargs):
+        start = started.pop(kwargs['i'])
+        timings.append(StepTiming(state['repeat'], kwargs['i'],
+                                  start - state['start'], time.time() - start,
+                                  kwargs.get('gap_s')))
+        logger.info('Step %d/%d completed in %.3f s', kwargs['i'] + 1,
+                    kwargs['steps_count'], timings[-1].duration)
+
+    signals.signal('step-started').connect(on_step_started, weak=False)
+    signals.signal('step-completed').connect(on_step_completed, weak=False)
+    # Let plugins subscribe to step signals once for the whole run.
+    plugin_manager.emit_signal('on_protocol_signals', args=[signals])
+
+    app = get_app()
+    app.running = True
+    plugin_manager.emit_signal('on_protocol_run')
+    try:
+        for i in xrange(repeats):
+            state['repeat'] = i
+            yield asyncio.From(execute_steps(steps, signals=signals,
+                                             pipeline=pipeline))
+        plugin_manager.emit_signal('on_protocol_finished')
+    finally:
+        app.running = False
+    raise asyncio.Return(timings)
+
+
+def run(protocol, repeats=None, pipeline=False):
+    '''
+    Run protocol on a dedicated event loop in the calling thread.
+
+    Parameters
+    ----------
+    protocol : microdrop.protocol.Protocol
+        Protocol to run.
+    repeats : int, optional
+        Number of times to run protocol.
+    pipeline : bool, optional
+        If ``True``, start each step while the previous step is executing.
+
+    Returns
+    -------
+    list[StepTiming]
+        Duration of each step (see :func:`run_protocol`).
+    '''
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    task = loop.create_task(run_protocol(protocol, repeats=repeats,
+                                         pipeline=pipeline))
+    try:
+        return loop.run_until_complete(task)
+    except KeyboardInterrupt:
+        task.cancel()
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+        raise
+    finally:
+        loop.close()
+        asyncio.set_event_loop(None)
+
+
+def format_timings(timings):
+    '''
+    Parameters
+    ----------
+    timings : list[StepTiming]
+        Step durations (see :func:`run_protocol`).
+
+    Returns
+    -------
+    str
+        Table listing the start time, duration, and gap since the previous
+        actuation of each step, followed by the total, mean, and maximum step
+        duration, the step rate, and the mean and maximum gap between steps.
+    '''
+    output = StringIO()
+    print >> output, '%6s %6s %12s %14s %10s' % ('Repeat', 'Step',
+                                                 'Start (s)', 'Duration (ms)',
+                                                 'Gap (ms)')
+    print >> output, '-' * 52
+    for repeat, step, start, duration, gap in timings:
+        print >> output, '%6d %6d %12.3f %14.1f %10s' % \
+            (repeat, step + 1, start, duration * 1e3,
+             '-' if gap is None else '%.1f' % (gap * 1e3))
+    print >> output, '-' * 52
+    if timings:
+        durations = [t.duration for t in timings]
+        total = sum(durations)
+        print >> output, '%-26s %14.1f' % ('Total (ms)', total * 1e3)
+        print >> output, '%-26s %14.1f' % ('Mean (ms)', total * 1e3 /
+                                           len(durations))
+        print >> output, '%-26s %14.1f' % ('Max (ms)', max(durations) * 1e3)
+        if total > 0:
+            print >> output, '%-26s %14.2f' % ('Steps/s', len(durations) /
+                                               total)
+        gaps = [t.gap for t in timings if t.gap is not None]
+        if gaps:
+            print >> output, '%-26s %14.1f' % ('Mean gap (ms)',
+                                               sum(gaps) * 1e3 / len(gaps))
+            print >> output, '%-26s %14.1f' % ('Max gap (ms)',
+                                               max(gaps) * 1e3)
+    return output.getvalue().rstrip()
@@ -71,6 +71,12 @@ else:
         .. versionchanged:: 2.29
             Deprecate `on_step_complete`.  Step completion is implied by each
             plugin returning from the respective :meth:`on_step_run` coroutine.
+
+        .. versionchanged:: X.X.X
+            Plugins may set a ``gtk_thread_only`` attribute to ``True`` to
+            have all signal handlers called in the thread emitting the signal,
+            even if concurrent dispatch is requested (see
+            :func:`microdrop.plugin_manager.emit_signal`).
         '''
         def get_schedule_requests(self, function_name):
             """
@@ -174,6 +180,27 @@ else:
             """
             pass
 
+        def on_protocol_signals(self, signals):
+            """
+            .. versionadded:: X.X.X
+
+            Handler called with the run-scoped signals namespace before a
+            protocol run (or a single step) is executed.
+
+            Receivers connected to :data:`signals` are also connected to the
+            signals namespace of *each step* of the run (see
+            :class:`microdrop.core_plugins.protocol_controller.execute
+            .StepNamespace`), e.g., an electrode actuator may connect to
+            ``on-actuation-request`` once per run instead of in each
+            ``on_step_run()`` call.
+
+            Parameters
+            ----------
+            signals : blinker.Namespace
+                Run-scoped signals namespace.
+            """
+            pass
+
         def on_protocol_pause(self):
             """
             Handler called when a protocol is paused.
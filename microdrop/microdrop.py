@@ -35,28 +35,56 @@ def except_handler(*args, **kwargs):
     traceback.print_tb(args[2])
 
 
+#: .. versionadded:: X.X.X
+#:     Modules which automatically load (and initialize) core singleton plugins
+#:     when imported (in import order).
+CORE_PLUGIN_MODULES = ['core_plugins.zmq_hub_plugin',
+                       'core_plugins.command_plugin',
+                       'core_plugins.device_info_plugin',
+                       'core_plugins.electrode_controller_plugin.pyutilib',
+                       'core_plugins.prompt_plugin',
+                       'gui.experiment_log_controller',
+                       'gui.config_controller',
+                       'gui.main_window_controller',
+                       'gui.dmf_device_controller',
+                       'core_plugins.protocol_controller.microdrop_plugin',
+                       'gui.protocol_grid_controller',
+                       'gui.plugin_manager_controller',
+                       'gui.app_options_controller']
+
+
 def initialize_core_plugins():
+    '''
+    .. versionchanged:: X.X.X
+        Record import of each module in :data:`CORE_PLUGIN_MODULES` as a
+        startup phase (see :mod:`microdrop.startup_profiler`).
+    '''
+    import importlib
+
+    from . import startup_profiler
+
     # These imports automatically load (and initialize) core singleton plugins.
-    from .core_plugins import zmq_hub_plugin
-    from .core_plugins import command_plugin
-    from .core_plugins import device_info_plugin
-    from .core_plugins.electrode_controller_plugin import pyutilib
-    from .core_plugins import prompt_plugin
-    from .gui import experiment_log_controller
-    from .gui import config_controller
-    from .gui import main_window_controller
-    from .gui import dmf_device_controller
-    from .core_plugins import protocol_controller
-    from .gui import protocol_grid_controller
-    from .gui import plugin_manager_controller
-    from .gui import app_options_controller
+    for module_name in CORE_PLUGIN_MODULES:
+        with startup_profiler.phase('import %s' % module_name,
+                                    category='core_plugin'):
+            importlib.import_module('.' + module_name, __package__)
 
 
 def main():
+    '''
+    .. versionchanged:: X.X.X
+        Enable startup profiler if requested (see
+        :mod:`microdrop.startup_profiler`).
+    '''
     import logging
 
     import gtk
 
+    from . import MICRODROP_PARSER
+    from . import startup_profiler
+
+    startup_profiler.enable_from_args(MICRODROP_PARSER.parse_known_args()[0])
+
     settings = gtk.settings_get_default()
     # Use a button ordering more consistent with Windows
     print 'Use a button ordering more consistent with Windows'
@@ -66,11 +94,13 @@ def main():
                         '%(message)s', datefmt=r'%Y-%m-%d %H:%M:%S',
                         level=logging.INFO)
 
-    initialize_core_plugins()
+    with startup_profiler.phase('initialize_core_plugins'):
+        initialize_core_plugins()
 
     # XXX Import from `app` module automatically instantiates instance of `App`
     # class.
-    from app import App
+    with startup_profiler.phase('import app'):
+        from app import App
     from app_context import get_app
 
     gtk.threads_init()
@@ -0,0 +1,619 @@
+'''
+.. versionadded:: X.X.X
+
+Host plugins in separate worker processes.
+
+A plugin is hosted *out-of-process* if its manifest (see
+:func:`microdrop.plugin_manager.read_plugin_manifest`) contains
+``out_of_process: true``, e.g.::
+
+    package_name: image_analysis_plugin
+    plugin_name: microdrop.image_analysis_plugin
+    version: 1.0
+    out_of_process: true
+    interfaces: [IPlugin]
+    signals: [on_protocol_swapped, on_step_run, get_schedule_requests]
+
+The plugin module is never imported in the MicroDrop process.  Instead, a
+:class:`PluginHostProxy` is registered with the declared interfaces.  When the
+plugin is enabled, a worker process (see :func:`run_plugin_host`) imports the
+plugin and connects to the ZeroMQ hub (see
+:mod:`microdrop.core_plugins.zmq_hub_plugin`) as ``<plugin_name>.host``.  Each
+signal declared in the manifest is forwarded over the hub to the worker:
+
+ - ``on_step_run()`` returns a coroutine which completes when the worker has
+   run the plugin ``on_step_run()`` coroutine.  The ``signals`` namespace is
+   local to the worker; ``signals-connected`` is forwarded to it from the
+   step namespace;
+ - queries (i.e., signals starting with ``get_``) block until the worker
+   replies (see :data:`HOST_TIMEOUT_S`);
+ - other signals are sent without waiting for the worker.
+
+Signal arguments and return values must be picklable.
+'''
+from concurrent.futures import Future
+import Queue
+import functools as ft
+import itertools as it
+import json
+import logging
+import multiprocessing as mp
+import signal
+import sys
+import threading
+import time
+import traceback
+
+from logging_helpers import _L
+from zmq_plugin.plugin import Plugin as ZmqPlugin
+from zmq_plugin.schema import decode_content_data, get_execute_reply
+import blinker
+import path_helpers as ph
+import trollius as asyncio
+import zmq
+
+from .plugin_manager import PluginProxy, _import_plugin
+
+logger = logging.getLogger(__name__)
+
+#: Maximum time to wait for worker process to connect to hub (in seconds).
+HOST_START_TIMEOUT_S = 30.
+#: Maximum time to wait for worker reply to a query signal (in seconds).
+HOST_TIMEOUT_S = 10.
+#: Signals returning a coroutine, called with a step ``signals`` namespace as
+#: the last argument.
+STEP_SIGNALS = set(['on_step_run'])
+
+
+def host_name(plugin_name):
+    '''
+    Returns
+    -------
+    str
+        ZeroMQ hub name of worker process hosting plugin.
+    '''
+    return '%s.host' % plugin_name
+
+
+class PluginHostZmqPlugin(ZmqPlugin):
+    '''
+    ZeroMQ API of worker process hosting a plugin service.
+
+    Plugin signal handlers are called on an event loop running in a
+    background thread, so the command socket keeps being served (e.g., query
+    signals are answered) while plugin coroutines such as ``on_step_run()``
+    run.  The reply to an ``emit_signal`` request is queued once the handler
+    (or its coroutine) completes, and sent from the command socket thread
+    (see :meth:`send_replies`).
+
+    Step signals (see :data:`STEP_SIGNALS`) receive a worker-local
+    ``signals`` namespace.  ``signals-connected`` is sent on it once the
+    ``signals_connected`` command for the step is received (i.e., once it
+    was sent on the step namespace in the MicroDrop process).
+
+    Parameters
+    ----------
+    service : object
+        Plugin service.
+    *args, **kwargs
+        Passed to :class:`zmq_plugin.plugin.Plugin`.
+
+    Attributes
+    ----------
+    wake_socket : zmq.Socket
+        Readable when replies are queued (see :meth:`send_replies`).
+    '''
+    def __init__(self, service, *args, **kwargs):
+        self.service = service
+        # Step tasks and `signals-connected` events, indexed by step ID (only
+        # accessed in event loop thread).
+        self.tasks = {}
+        self.released = {}
+        self.replies = Queue.Queue()
+        self._wake_uri = 'inproc://plugin-host-%s' % id(self)
+        self.wake_socket = zmq.Context.instance().socket(zmq.PAIR)
+        self.wake_socket.bind(self._wake_uri)
+        self._notify_socket = None
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop,
+                                       name='PluginHostLoop')
+        self.thread.daemon = True
+        self.thread.start()
+        super(PluginHostZmqPlugin, self).__init__(*args, **kwargs)
+
+    def _run_loop(self):
+        # Plugin coroutines use the default event loop of this thread.
+        asyncio.set_event_loop(self.loop)
+        self._notify_socket = zmq.Context.instance().socket(zmq.PAIR)
+        self._notify_socket.connect(self._wake_uri)
+        self.loop.run_forever()
+
+    def _process__execute_request(self, request):
+        if request['content']['command'] == 'emit_signal':
+            # Reply once signal handler completes (see `send_replies()`).
+            self.loop.call_soon_threadsafe(self._emit_signal, request)
+        else:
+            super(PluginHostZmqPlugin, self)._process__execute_request(request)
+
+    def _reply(self, request, data=None, error=None):
+        self.replies.put((request, data, error))
+        self._notify_socket.send('')
+
+    def send_replies(self):
+        '''
+        Send queued ``emit_signal`` replies (command socket thread only).
+        '''
+        while self.wake_socket.poll(0):
+            self.wake_socket.recv()
+        while True:
+            try:
+                request, data, error = self.replies.get_nowait()
+            except Queue.Empty:
+                break
+            try:
+                reply = get_execute_reply(request,
+                                          self.execute_reply_id.next(),
+                                          data=data, error=error)
+            except Exception:
+                reply = get_execute_reply(request,
+                                          self.execute_reply_id.next(),
+                                          error=traceback.format_exc())
+            self.command_socket.send_multipart([self.hub_name, '',
+                                                json.dumps(reply)])
+
+    def _emit_signal(self, request):
+        '''
+        Call plugin signal handler (event loop thread).
+        '''
+        try:
+            data = decode_content_data(request)
+            function = data['function']
+            args = list(data.get('args') or [])
+            step_id = data.get('step_id')
+            if function in STEP_SIGNALS:
+                signals = blinker.Namespace()
+                args.append(signals)
+            result = getattr(self.service, function)(*args)
+            if asyncio.iscoroutine(result) or \
+                    isinstance(result, asyncio.Future):
+                if function in STEP_SIGNALS:
+                    result = self._run_step(step_id, result, signals)
+                task = asyncio.ensure_future(result)
+                self.tasks[step_id] = task
+                task.add_done_callback(ft.partial(self._on_done, request,
+                                                  step_id))
+                return
+        except Exception:
+            self._reply(request, error=traceback.format_exc())
+        else:
+            self._reply(request, data=result)
+
+    @asyncio.coroutine
+    def _run_step(self, step_id, coroutine, signals):
+        released = asyncio.Event()
+        self.released[step_id] = released
+        task = asyncio.ensure_future(coroutine)
+        waiter = asyncio.ensure_future(released.wait())
+        try:
+            # Let plugin connect step signals (i.e., run up to first yield).
+            yield asyncio.From(asyncio.sleep(0))
+            yield asyncio.From(asyncio.wait([task, waiter],
+                                            return_when=asyncio
+                                            .FIRST_COMPLETED))
+            if released.is_set():
+                signals.signal('signals-connected').send(None)
+            result = yield asyncio.From(task)
+        finally:
+            del self.released[step_id]
+            waiter.cancel()
+            task.cancel()
+        raise asyncio.Return(result)
+
+    def _on_done(self, request, step_id, task):
+        if self.tasks.get(step_id) is task:
+            del self.tasks[step_id]
+        if task.cancelled():
+            self._reply(request, error='Cancelled.')
+        elif task.exception() is not None:
+            exception = task.exception()
+            self._reply(request, error='%s: %s' % (type(exception).__name__,
+                                                   exception))
+        else:
+            self._reply(request, data=task.result())
+
+    def _release_step(self, step_id):
+        released = self.released.get(step_id)
+        if released is not None:
+            released.set()
+
+    def _cancel_step(self, step_id):
+        task = self.tasks.get(step_id)
+        if task is not None:
+            task.cancel()
+
+    def on_execute__signals_connected(self, request):
+        '''
+        Send ``signals-connected`` on worker-local namespace of step.
+        '''
+        data = decode_content_data(request)
+        self.loop.call_soon_threadsafe(self._release_step, data['step_id'])
+
+    def on_execute__cancel_step(self, request):
+        data = decode_content_data(request)
+        self.loop.call_soon_threadsafe(self._cancel_step, data['step_id'])
+
+
+def run_plugin_host(plugin_dir, plugin_module, hub_uri, ready=None,
+                    log_level=logging.INFO):
+    '''
+    Import plugin and serve forwarded signals (worker process entry point).
+
+    Parameters
+    ----------
+    plugin_dir : str
+        Plugin directory.
+    plugin_module : str
+        Name of plugin Python module, relative to parent of
+        :data:`plugin_dir`.
+    hub_uri : str
+        URI of ZeroMQ hub query socket.
+    ready : multiprocessing.Event, optional
+        Set once connected to hub.
+    log_level : int, optional
+        Worker process log level.
+    '''
+    # Terminated by parent process (see `PluginHostProxy.cleanup()`).
+    signal.signal(signal.SIGINT, lambda *args: None)
+    logging.basicConfig(level=log_level)
+
+    plugins_root = ph.path(plugin_dir).parent
+    if plugins_root not in sys.path:
+        sys.path.insert(0, plugins_root)
+    service = _import_plugin(plugin_module)()
+    if hasattr(service, 'on_plugin_enable'):
+        service.on_plugin_enable()
+
+    host = PluginHostZmqPlugin(service, host_name(service.name), hub_uri)
+    host.reset()
+    _L().info('Hosting plugin `%s` (pid=%s)', service.name,
+              mp.current_process().pid)
+    if ready is not None:
+        ready.set()
+    poller = zmq.Poller()
+    poller.register(host.command_socket, zmq.POLLIN)
+    poller.register(host.wake_socket, zmq.POLLIN)
+    while True:
+        events = dict(poller.poll())
+        if host.command_socket in events:
+            host.on_command_recv(host.command_socket.recv_multipart())
+        host.send_replies()
+
+
+def _log_host_error(plugin_name, function):
+    '''
+    Returns
+    -------
+    function
+        Future done callback logging worker error for forwarded signal.
+    '''
+    def _log_error(future):
+        exception = future.exception()
+        if exception is not None:
+            _L().error('Error in `%s` plugin host handling `%s`: %s',
+                       plugin_name, function, exception)
+    return _log_error
+
+
+class PluginHostClient(object):
+    '''
+    Send requests to a plugin host process over the ZeroMQ hub.
+
+    ZeroMQ sockets are not thread-safe, so all socket operations run in a
+    background thread.
+
+    Parameters
+    ----------
+    name : str
+        ZeroMQ hub name of client.
+    target : str
+        ZeroMQ hub name of plugin host.
+    hub_uri : str
+        URI of ZeroMQ hub query socket.
+    '''
+    def __init__(self, name, target, hub_uri):
+        self.name = name
+        self.target = target
+        self.hub_uri = hub_uri
+        self.requests = Queue.Queue()
+        self.stopped = threading.Event()
+        # Futures waiting for a reply.
+        self.pending = set()
+        self._lock = threading.Lock()
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(ready, ))
+        self.thread.daemon = True
+        self.thread.start()
+        ready.wait()
+
+    def _run(self, ready):
+        plugin = ZmqPlugin(self.name, self.hub_uri)
+        try:
+            plugin.reset()
+        finally:
+            ready.set()
+        try:
+            while not self.stopped.is_set():
+                while True:
+                    try:
+                        command, kwargs, callback = self.requests.get_nowait()
+                    except Queue.Empty:
+                        break
+                    plugin.execute_async(self.target, command,
+                                         callback=callback,
+                                         extra_kwargs=kwargs)
+                if plugin.command_socket.poll(10):
+                    plugin.on_command_recv(plugin.command_socket
+                                           .recv_multipart())
+        finally:
+            plugin.close()
+
+    def execute(self, command, **kwargs):
+        '''
+        Parameters
+        ----------
+        command : str
+            Name of command to execute on target.
+        **kwargs
+            Command keyword arguments.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Decoded reply data.  Fails with :class:`RuntimeError` if client
+            is stopped before a reply is received (see :meth:`stop`).
+        '''
+        future = Future()
+
+        def _callback(reply):
+            with self._lock:
+                self.pending.discard(future)
+            if future.cancelled():
+                return
+            try:
+                future.set_result(decode_content_data(reply))
+            except Exception as exception:
+                future.set_exception(exception)
+
+        with self._lock:
+            if self.stopped.is_set():
+                future.set_exception(RuntimeError('Client `%s` is stopped.' %
+                                                  self.name))
+                return future
+            self.pending.add(future)
+        self.requests.put((command, kwargs, _callback))
+        return future
+
+    def stop(self, reason=None):
+        '''
+        Stop client thread and fail futures still waiting for a reply.
+
+        Parameters
+        ----------
+        reason : str, optional
+            Error message of failed futures.
+        '''
+        with self._lock:
+            self.stopped.set()
+            pending = list(self.pending)
+            self.pending.clear()
+        if self.thread is not threading.current_thread():
+            self.thread.join()
+        for future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError(reason or
+                                                  'Client `%s` stopped '
+                                                  'before reply.' %
+                                                  self.name))
+
+
+class PluginHostProxy(PluginProxy):
+    '''
+    Plugin proxy forwarding declared signals to a worker process hosting the
+    plugin (see :func:`microdrop.plugin_manager.create_plugin_proxy`).
+
+    The worker process is started when the plugin is enabled and terminated
+    when the plugin is disabled (or the application exits).
+
+    Attributes
+    ----------
+    process : multiprocessing.Process
+        Worker process hosting plugin, or ``None`` if plugin is not enabled.
+    client : PluginHostClient
+        Hub client used to send signals to worker process.
+    '''
+    def __init__(self, *args, **kwargs):
+        super(PluginHostProxy, self).__init__(*args, **kwargs)
+        self.process = None
+        self.client = None
+        self._step_ids = it.count()
+
+    def __getattr__(self, attr):
+        signals = self.__dict__.get('signals')
+        if signals is None or attr not in signals:
+            raise AttributeError(attr)
+
+        def _forward(*args):
+            return self.forward_signal(attr, *args)
+        _forward.__name__ = attr
+        return _forward
+
+    def load(self):
+        '''
+        Plugin is never imported in the MicroDrop process.
+
+        Returns
+        -------
+        PluginHostProxy
+            Proxy.
+        '''
+        return self
+
+    def forward_signal(self, function, *args):
+        '''
+        Forward signal to worker process.
+
+        Parameters
+        ----------
+        function : str
+            Signal name.
+        *args
+            Signal arguments.
+
+        Returns
+        -------
+        object
+            Coroutine for step signals, worker reply for query signals, and
+            ``None`` for other signals.
+
+        Raises
+        ------
+        RuntimeError
+            If worker process is not running.
+        '''
+        if self.client is None or not self.process.is_alive():
+            raise RuntimeError('Plugin host for `%s` is not running.' %
+                               self.name)
+        if function in STEP_SIGNALS:
+            return self._forward_step(function, *args)
+        future = self.client.execute('emit_signal', function=function,
+                                     args=args)
+        if function.startswith('get_'):
+            return future.result(HOST_TIMEOUT_S)
+        future.add_done_callback(_log_host_error(self.name, function))
+        return None
+
+    def _forward_step(self, function, *args):
+        '''
+        Forward step signal to worker process.
+
+        The step ``signals`` namespace (last argument) cannot be shared with
+        the worker.  Instead, ``signals-connected`` is forwarded to the
+        worker-local namespace of the step, and cancelling the returned
+        future cancels the step coroutine in the worker.
+
+        Returns
+        -------
+        asyncio.Future
+            Step coroutine result.  Fails with :class:`RuntimeError` if the
+            worker process exits before the step completes.
+        '''
+        client = self.client
+        step_id = '%s-%d' % (self.name, next(self._step_ids))
+        signals = args[-1]
+
+        def _on_signals_connected(sender, **kwargs):
+            future = client.execute('signals_connected', step_id=step_id)
+            future.add_done_callback(_log_host_error(self.name,
+                                                     'signals-connected'))
+
+        signals.signal('signals-connected').connect(_on_signals_connected,
+                                                    weak=False)
+        step = asyncio.wrap_future(client.execute('emit_signal',
+                                                  function=function,
+                                                  args=args[:-1],
+                                                  step_id=step_id))
+
+        def _on_step_done(step):
+            if step.cancelled():
+                client.execute('cancel_step', step_id=step_id)
+
+        step.add_done_callback(_on_step_done)
+        return step
+
+    def on_plugin_enable(self):
+        '''
+        Start worker process hosting plugin and connect to hub.
+
+        Plugin is disabled again if the worker process fails to start.
+        '''
+        from .app_context import get_hub_uri
+
+        try:
+            self.start(get_hub_uri())
+        except Exception:
+            self.disable()
+            raise
+
+    def start(self, hub_uri):
+        '''
+        Start worker process hosting plugin and connect to hub.
+
+        Parameters
+        ----------
+        hub_uri : str
+            URI of ZeroMQ hub query socket.
+
+        Raises
+        ------
+        RuntimeError
+            If worker process exits or does not connect to hub within
+            :data:`HOST_START_TIMEOUT_S`.  Worker process is terminated.
+        '''
+        self.cleanup()
+        ready = mp.Event()
+        process = mp.Process(target=run_plugin_host,
+                             args=(str(self.plugin_dir), self.plugin_module,
+                                   hub_uri, ready,
+                                   logging.getLogger().level))
+        # Terminate worker when main process terminates.
+        process.daemon = True
+        process.start()
+        start = time.time()
+        while not ready.wait(.1):
+            if not process.is_alive():
+                raise RuntimeError('`%s` plugin host exited before starting '
+                                   '(exitcode=%s).' % (self.name,
+                                                       process.exitcode))
+            elif time.time() - start > HOST_START_TIMEOUT_S:
+                process.terminate()
+                raise RuntimeError('Timed out waiting for `%s` plugin host '
+                                   'to start.' % self.name)
+        _L().info('Started `%s` plugin host process (pid=%s)', self.name,
+                  process.pid)
+        self.process = process
+        self.client = PluginHostClient('%s.client' % self.name,
+                                       host_name(self.name), hub_uri)
+        monitor = threading.Thread(target=self._monitor,
+                                   args=(process, self.client))
+        monitor.daemon = True
+        monitor.start()
+
+    def _monitor(self, process, client):
+        '''
+        Wait for worker process to exit and fail requests still waiting for a
+        reply (e.g., running steps).
+        '''
+        process.join()
+        if not client.stopped.is_set():
+            _L().error('`%s` plugin host exited unexpectedly (exitcode=%s).',
+                       self.name, process.exitcode)
+        client.stop('`%s` plugin host exited (exitcode=%s).' %
+                    (self.name, process.exitcode))
+
+    def on_plugin_disable(self):
+        self.cleanup()
+
+    def on_app_exit(self):
+        self.cleanup()
+
+    def cleanup(self):
+        '''
+        Stop hub client and terminate worker process.
+        '''
+        if self.client is not None:
+            self.client.stop()
+            self.client = None
+        if self.process is not None:
+            self.process.terminate()
+            self.process = None
+
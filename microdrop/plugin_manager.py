@@ -1,19 +1,24 @@
 from StringIO import StringIO
-from collections import namedtuple
+from collections import OrderedDict, namedtuple
 from contextlib import closing
 import logging
 import pprint
 import sys
+import threading
 import traceback
 
+from concurrent.futures import Future, ThreadPoolExecutor
 from pyutilib.component.core import ExtensionPoint, PluginGlobals
 # TODO Update plugins to import from `pyutilib.component.core` directly
 # instead of importing from here.
 from pyutilib.component.core import Plugin, SingletonPlugin, implements
 import path_helpers as ph
 import task_scheduler
+import trollius as asyncio
+import yaml
 
 from .interfaces import IPlugin, IWaveformGenerator, ILoggingPlugin
+from . import startup_profiler
 from logging_helpers import _L, caller_name  #: .. versionadded:: 2.20
 
 
@@ -22,8 +27,135 @@ logger = logging.getLogger(__name__)
 
 ScheduleRequest = namedtuple('ScheduleRequest', 'before after')
 
+#: .. versionadded:: X.X.X
+#:     Cached dispatch tables as ``(services, table)`` tuples, keyed by
+#:     ``(function, interface)``, where ``services`` are the active services
+#:     of the interface when the table was built (see
+#:     :func:`get_dispatch_table`).
+_dispatch_tables = {}
+#: .. versionadded:: X.X.X
+#:     Number of times dispatch tables have been invalidated.  Tables built
+#:     while tables are invalidated (e.g., by another thread) are not cached.
+_dispatch_generation = 0
+_dispatch_lock = threading.Lock()
+#: .. versionadded:: X.X.X
+#:     Cached concurrent dispatch levels as ``(services, levels)`` tuples,
+#:     keyed by ``(function, interface)`` (see :func:`get_dispatch_levels`).
+_dispatch_levels = {}
+#: .. versionadded:: X.X.X
+#:     Maximum number of threads used to call observers concurrently (see
+#:     :func:`emit_signal`).
+DISPATCH_MAX_WORKERS = 8
+#: .. versionadded:: X.X.X
+#:     Names of signals which are always dispatched sequentially in the thread
+#:     emitting the signal (e.g., the GTK thread), even if concurrent dispatch
+#:     is requested.
+GTK_THREAD_SIGNALS = set()
+_dispatch_executor = None
+# Marks threads of dispatch thread pool.
+_dispatch_thread = threading.local()
+#: .. versionadded:: X.X.X
+#:     Name of plugin manifest file (see :func:`read_plugin_manifest`).
+PLUGIN_MANIFEST = 'properties.yml'
+#: .. versionadded:: X.X.X
+#:     Coalescing rules as ``(key, merge)`` tuples, keyed by signal name (see
+#:     :func:`coalesce_signal`).
+_coalesce_rules = {}
+#: .. versionadded:: X.X.X
+#:     Pending coalesced signal arguments, keyed by ``(function, interface,
+#:     key)``, in order of first emission.
+_pending_signals = OrderedDict()
+_coalesce_scheduler = None
+_coalesce_flush_scheduled = False
+_coalesce_lock = threading.Lock()
+#: .. versionadded:: X.X.X
+#:     If ``True``, record signal and observer currently dispatched by each
+#:     thread (see :func:`get_active_dispatch`).
+_track_dispatch = False
+#: .. versionadded:: X.X.X
+#:     ``(function, observer name)`` currently dispatched, keyed by thread
+#:     identifier.
+_active_dispatch = {}
+
+
+def read_plugin_manifest(plugin_dir):
+    '''
+    Read plugin manifest (i.e., ``properties.yml``) from plugin directory.
+
+    In addition to the ``package_name``, ``plugin_name``, and ``version``
+    keys, a manifest may list the names of the interfaces the plugin
+    implements (e.g., ``interfaces: [IPlugin, IWaveformGenerator]``) and the
+    signals the plugin handles (e.g., ``signals: [on_step_run,
+    get_schedule_requests]``).  Plugins declaring their interfaces are not
+    imported until needed (see :class:`PluginProxy`).
+
+    Parameters
+    ----------
+    plugin_dir : str
+        Plugin directory.
+
+    Returns
+    -------
+    dict or None
+        Plugin manifest, or ``None`` if plugin directory does not contain a
+        valid manifest.
 
-def load_plugins(plugins_dir='plugins', import_from_parent=True):
+
+    .. versionadded:: X.X.X
+    '''
+    manifest_path = ph.path(plugin_dir).joinpath(PLUGIN_MANIFEST)
+    if not manifest_path.isfile():
+        return None
+    try:
+        manifest = yaml.safe_load(manifest_path.bytes())
+    except yaml.YAMLError:
+        _L().warning('Error reading plugin manifest: `%s`', manifest_path,
+                     exc_info=True)
+        return None
+    return manifest if isinstance(manifest, dict) else None
+
+
+def _plugin_module_name(plugin_dir, import_from_parent):
+    '''
+    Returns
+    -------
+    str
+        Name of Python module to import for plugin directory.
+
+        Import from `pyutilib` submodule in plugin, if it exists.
+    '''
+    plugin_module = plugin_dir.name
+    if plugin_dir.joinpath('pyutilib.py').isfile():
+        plugin_module = '.'.join([plugin_module, 'pyutilib'])
+    if import_from_parent:
+        plugin_module = '.'.join([plugin_dir.parent.name, plugin_module])
+    return plugin_module
+
+
+def _import_plugin(plugin_module, env='microdrop.managed'):
+    '''
+    Import plugin module.
+
+    Import is recorded as startup phase (see
+    :mod:`microdrop.startup_profiler`).
+
+    Returns
+    -------
+    class
+        Plugin class registered by importing the module.
+    '''
+    e = PluginGlobals.env(env)
+    registered_plugins = set(e.plugin_registry.values())
+    import_statement = 'import {}'.format(plugin_module)
+    _L().debug(import_statement)
+    with startup_profiler.phase('import %s' % plugin_module,
+                                category='plugin'):
+        exec(import_statement)
+    return list(set(e.plugin_registry.values()) - registered_plugins)[0]
+
+
+def load_plugins(plugins_dir='plugins', import_from_parent=True,
+                 enabled=None):
     '''
     Import each Python plugin module in the specified directory and create an
     instance of each contained plugin class for which an instance has not yet
@@ -40,6 +172,16 @@ def load_plugins(plugins_dir='plugins', import_from_parent=True):
         ..notes::
             **Not recommended**, but kept as default to maintain legacy
             protocol compatibility.
+    enabled : list, optional
+        Package names of enabled plugins.
+
+        If specified, the import of any other plugin which declares the
+        interfaces it implements in its manifest (see
+        :func:`read_plugin_manifest`) is deferred, and a :class:`PluginProxy`
+        is created for the plugin instead.
+
+        By default, all plugins are imported (except plugins hosted in a
+        worker process, see :mod:`microdrop.plugin_host`).
 
     Returns
     -------
@@ -53,6 +195,13 @@ def load_plugins(plugins_dir='plugins', import_from_parent=True):
 
     .. versionchanged:: 2.30
         Import from `pyutilib` submodule in plugin instead, if it exists.
+
+    .. versionchanged:: X.X.X
+        Add :data:`enabled` parameter to defer import of disabled plugins.
+
+    .. versionchanged:: X.X.X
+        Do not import plugins marked ``out_of_process`` in their manifest (see
+        :mod:`microdrop.plugin_host`).
     '''
     logger = _L()  # use logger with function context
     logger.info('plugins_dir=`%s`', plugins_dir)
@@ -66,6 +215,7 @@ def load_plugins(plugins_dir='plugins', import_from_parent=True):
     e = PluginGlobals.env('microdrop.managed')
     initial_plugins = set(e.plugin_registry.values())
     imported_plugins = set()
+    proxies = []
 
     for package_i in plugins_dir.dirs():
         if package_i.isjunction() and not package_i.readlink().isdir():
@@ -86,17 +236,18 @@ def load_plugins(plugins_dir='plugins', import_from_parent=True):
             continue
 
         try:
-            plugin_module = package_i.name
-            if package_i.joinpath('pyutilib.py').isfile():
-                plugin_module = '.'.join([plugin_module, 'pyutilib'])
-            if import_from_parent:
-                plugin_module = '.'.join([plugins_dir.name, plugin_module])
-            import_statement = 'import {}'.format(plugin_module)
-            logger.debug(import_statement)
-            exec(import_statement)
-            all_plugins = set(e.plugin_registry.values())
-            current_plugin = list(all_plugins - initial_plugins -
-                                  imported_plugins)[0]
+            plugin_module = _plugin_module_name(package_i, import_from_parent)
+            manifest = read_plugin_manifest(package_i)
+            if (manifest and manifest.get('out_of_process')) or \
+                    (enabled is not None and package_i.name not in enabled):
+                proxy = create_plugin_proxy(package_i, plugin_module,
+                                            manifest=manifest)
+                if proxy is not None:
+                    logger.info('\t Deferred import: %s (%s)', proxy.name,
+                                package_i)
+                    proxies.append(proxy)
+                    continue
+            current_plugin = _import_plugin(plugin_module)
             logger.info('\t Imported: %s (%s)', current_plugin.__name__,
                         package_i)
             imported_plugins.add(current_plugin)
@@ -114,7 +265,151 @@ def load_plugins(plugins_dir='plugins', import_from_parent=True):
         new_plugins.append(service)
     logger.debug('\t Created new plugin services: %s',
                  ','.join([p.__class__.__name__ for p in new_plugins]))
-    return new_plugins
+    return new_plugins + proxies
+
+
+PluginGlobals.push_env('microdrop.proxy')
+
+
+class PluginProxy(Plugin):
+    '''
+    Lightweight stand-in for a plugin which has not been imported yet.
+
+    A proxy is registered with the interfaces declared in the plugin manifest
+    (see :func:`read_plugin_manifest`).  The plugin module is imported, and
+    the proxy is replaced by the actual plugin service, when the plugin is
+    enabled (see :func:`enable`) or on first access to any attribute of the
+    plugin (e.g., a signal handler listed in the manifest).
+
+    Use :func:`create_plugin_proxy` to create a proxy.
+
+    Attributes
+    ----------
+    name : str
+        Plugin name (i.e., ``plugin_name`` in plugin manifest).
+    plugin_dir : path_helpers.path
+        Plugin directory.
+    plugin_module : str
+        Name of plugin Python module.
+    signals : frozenset
+        Names of signals handled by plugin.
+    service : object
+        Plugin service, or ``None`` if plugin has not been imported.
+
+
+    .. versionadded:: X.X.X
+    '''
+    def __init__(self, plugin_dir, plugin_module, manifest):
+        self.name = manifest['plugin_name']
+        self.plugin_dir = plugin_dir
+        self.plugin_module = plugin_module
+        self.signals = frozenset(manifest.get('signals') or [])
+        self.service = None
+        self._load_lock = threading.RLock()
+
+    def __getattr__(self, attr):
+        # Only called for attributes which are not set on the proxy.  Do not
+        # import plugin to check for signal handlers not listed in manifest.
+        signals = self.__dict__.get('signals')
+        if (signals is None or attr.startswith('_') or
+                (attr not in signals and (attr.startswith('on_') or
+                                          attr == 'get_schedule_requests'))):
+            raise AttributeError(attr)
+        return getattr(self.load(), attr)
+
+    def load(self):
+        '''
+        Import plugin and replace proxy with plugin service.
+
+        Plugin service is enabled if proxy is enabled.
+
+        Returns
+        -------
+        object
+            Plugin service.
+        '''
+        with self._load_lock:
+            if self.service is None:
+                class_ = _import_plugin(self.plugin_module)
+                service = class_()
+                if not self.enabled():
+                    service.disable()
+                self.deactivate()
+                PluginGlobals.env(self.__plugin_namespace__).plugin_registry\
+                    .pop(self.__class__.__name__, None)
+                self.service = service
+                _L().info('Imported: %s (%s)', class_.__name__,
+                          self.plugin_dir)
+        return self.service
+
+
+PluginGlobals.pop_env()
+
+
+def create_plugin_proxy(plugin_dir, plugin_module, env='microdrop.managed',
+                        manifest=None):
+    '''
+    Create proxy for plugin declaring its interfaces in plugin manifest.
+
+    Plugins marked ``out_of_process`` in their manifest are proxied by a
+    :class:`microdrop.plugin_host.PluginHostProxy`.
+
+    Parameters
+    ----------
+    plugin_dir : str
+        Plugin directory.
+    plugin_module : str
+        Name of plugin Python module.
+    env : str, optional
+        Name of ``pyutilib.component.core`` plugin environment (e.g.,
+        ``'microdrop.managed``').
+    manifest : dict, optional
+        Plugin manifest (read from plugin directory by default).
+
+    Returns
+    -------
+    PluginProxy or None
+        Disabled plugin proxy, or ``None`` if plugin manifest does not declare
+        plugin interfaces (or declares an unknown interface).
+
+
+    .. versionadded:: X.X.X
+    '''
+    plugin_dir = ph.path(plugin_dir)
+    if manifest is None:
+        manifest = read_plugin_manifest(plugin_dir)
+    if not manifest or not manifest.get('interfaces') or \
+            'plugin_name' not in manifest:
+        return None
+    interfaces = []
+    for name_i in manifest['interfaces']:
+        if name_i not in PluginGlobals.interface_registry:
+            _L().warning('Unknown interface `%s` in `%s` manifest.', name_i,
+                         plugin_dir.name)
+            return None
+        interfaces.append(PluginGlobals.interface_registry[name_i])
+
+    if manifest.get('out_of_process'):
+        from .plugin_host import PluginHostProxy as proxy_class
+    else:
+        proxy_class = PluginProxy
+
+    # Create plugin class registered with interfaces declared in manifest.
+    PluginGlobals.push_env(env)
+    try:
+        class_ = type(Plugin)('%s_%s' % (proxy_class.__name__,
+                                         plugin_dir.name),
+                              (proxy_class, ),
+                              {'__module__': plugin_module,
+                               'version': manifest.get('version'),
+                               '_implements':
+                               dict((i, [i.__interface_namespace__])
+                                    for i in interfaces)})
+    finally:
+        PluginGlobals.pop_env()
+    proxy = class_(plugin_dir, plugin_module, manifest)
+    proxy.disable()
+    return proxy
 
 
 def log_summary():
@@ -371,7 +666,353 @@ def get_observers(function, interface=IPlugin):
     return observers
 
 
-def emit_signal(function, args=None, interface=IPlugin):
+def _active_services(interface):
+    '''
+    Returns
+    -------
+    list
+        Enabled services implementing interface.  Changes whenever a plugin
+        implementing the interface is created, enabled, disabled, or
+        deactivated.
+    '''
+    return (PluginGlobals.env(interface.__interface_namespace__)
+            .active_services(interface))
+
+
+def get_dispatch_table(function, interface=IPlugin):
+    '''
+    Get scheduled observers implementing the specified function.
+
+    Tables are cached until the enabled services implementing the interface
+    change (e.g., a plugin is created, enabled, disabled, or deactivated), or
+    until :func:`invalidate_dispatch_tables` is called, so observers and
+    schedule requests are only queried once per signal.
+
+    Parameters
+    ----------
+    function : str
+        Name of function to generate schedule for.
+    interface : class, optional
+        Plugin interface class.
+
+    Returns
+    -------
+    list
+        List of ``(name, observer, callback)`` tuples in scheduled order, where
+        ``callback`` is the bound observer function.
+
+
+    .. versionadded:: X.X.X
+    '''
+    key = (function, interface)
+    # Services are looked up *before* building the table, so a table built
+    # while services change is rebuilt on the next call.
+    services = _active_services(interface)
+    cached = _dispatch_tables.get(key)
+    if cached is not None and cached[0] == services:
+        return cached[1]
+    generation = _dispatch_generation
+    observers = get_observers(function, interface)
+    table = [(name, observers[name], getattr(observers[name], function))
+             for name in get_schedule(observers, function)]
+    with _dispatch_lock:
+        if generation == _dispatch_generation:
+            _dispatch_tables[key] = (services, table)
+    return table
+
+
+def get_dispatch_levels(function, interface=IPlugin):
+    '''
+    Group scheduled observers implementing the specified function into levels
+    of the schedule request graph.
+
+    Each schedule request ``(before, after)`` is an edge of a directed acyclic
+    graph between observers.  Observers in the same level do not depend on
+    each other, so they may be called concurrently.  Every observer of a level
+    is called before any observer of the next level.
+
+    Levels are cached along with dispatch tables (see
+    :func:`get_dispatch_table`).
+
+    Parameters
+    ----------
+    function : str
+        Name of function to generate schedule for.
+    interface : class, optional
+        Plugin interface class.
+
+    Returns
+    -------
+    list
+        List of levels, each a list of ``(name, observer, callback)`` tuples in
+        scheduled order.
+
+
+    .. versionadded:: X.X.X
+    '''
+    key = (function, interface)
+    services = _active_services(interface)
+    cached = _dispatch_levels.get(key)
+    if cached is None or cached[0] != services:
+        generation = _dispatch_generation
+        table = get_dispatch_table(function, interface)
+        positions = dict((name, i) for i, (name, observer, callback)
+                         in enumerate(table))
+        predecessors = dict((name, set()) for name in positions)
+        for name, observer, callback in table:
+            if not hasattr(observer, 'get_schedule_requests'):
+                continue
+            for before, after in observer.get_schedule_requests(function):
+                # Only requests between observers were added to schedule.
+                if (before in positions and after in positions and
+                        positions[before] < positions[after]):
+                    predecessors[after].add(before)
+
+        # Observers are in scheduled (i.e., topological) order, so the level
+        # of all predecessors of each observer is already known.
+        depths = {}
+        levels = []
+        for name, observer, callback in table:
+            depths[name] = max([depths[name_i] + 1
+                                for name_i in predecessors[name]] or [0])
+            if depths[name] == len(levels):
+                levels.append([])
+            levels[depths[name]].append((name, observer, callback))
+        with _dispatch_lock:
+            if generation == _dispatch_generation:
+                _dispatch_levels[key] = (services, levels)
+        return levels
+    return cached[1]
+
+
+def gtk_thread_only(function):
+    '''
+    Decorator to mark a plugin signal handler to always be called in the
+    thread emitting the signal (e.g., the GTK thread), even if concurrent
+    dispatch is requested (see :func:`emit_signal`).
+
+    To mark all signal handlers of a plugin, set the ``gtk_thread_only``
+    attribute of the plugin class to ``True`` instead.
+
+
+    .. versionadded:: X.X.X
+    '''
+    function.gtk_thread_only = True
+    return function
+
+
+def _runs_inline(observer, callback):
+    '''
+    Returns
+    -------
+    bool
+        ``True`` if observer callback must be called in the thread emitting
+        the signal, i.e., if the observer or callback is marked as
+        :func:`gtk_thread_only`, or if the callback is a coroutine function
+        (calling a coroutine function only creates the coroutine).
+    '''
+    return (getattr(observer, 'gtk_thread_only', False) or
+            getattr(callback, 'gtk_thread_only', False) or
+            asyncio.iscoroutinefunction(callback))
+
+
+def _get_dispatch_executor():
+    global _dispatch_executor
+
+    with _dispatch_lock:
+        if _dispatch_executor is None:
+            _dispatch_executor = \
+                ThreadPoolExecutor(max_workers=DISPATCH_MAX_WORKERS)
+    return _dispatch_executor
+
+
+def _call_observer(callback, args):
+    '''
+    Returns
+    -------
+    tuple
+        ``(True, return_value)`` if callback succeeded, otherwise ``(False,
+        (exception, formatted_traceback))``.
+    '''
+    try:
+        return True, callback(*args)
+    except Exception, why:
+        return False, (why, traceback.format_exc())
+
+
+def _call_observer_in_worker(callback, args):
+    # Signals emitted by observers in a dispatch thread are dispatched
+    # sequentially to avoid waiting on the (exhausted) thread pool.
+    _dispatch_thread.worker = True
+    return _call_observer(callback, args)
+
+
+def invalidate_dispatch_tables():
+    '''
+    Discard cached dispatch tables (see :func:`get_dispatch_table` and
+    :func:`get_dispatch_levels`).
+
+    Cached tables are rebuilt automatically when the enabled plugins change.
+    Must be called if the schedule requests of an enabled plugin change.
+
+
+    .. versionadded:: X.X.X
+    '''
+    global _dispatch_generation
+
+    with _dispatch_lock:
+        _dispatch_generation += 1
+        _dispatch_tables.clear()
+        _dispatch_levels.clear()
+
+
+def coalesce_signal(function, key=None, merge=None):
+    '''
+    Coalesce emissions of signal until the next flush (see
+    :func:`set_coalesce_scheduler`).
+
+    Emissions with the same key are merged into a single pending call.  When
+    pending signals are flushed, each pending call is emitted once, in order
+    of first emission.
+
+    Parameters
+    ----------
+    function : str
+        Signal name.
+    key : function, optional
+        Function returning a hashable key for a list of signal arguments.
+
+        By default, all emissions of the signal share the same key (i.e., the
+        signal is debounced).
+    merge : function, optional
+        Function returning merged arguments from the pending and new signal
+        arguments, i.e., ``merge(pending_args, args)``.
+
+        By default, the new arguments replace the pending arguments.
+
+    Example
+    -------
+
+    Emit ``on_step_options_changed`` once for each distinct ``(plugin,
+    step_number)`` and ``on_protocol_changed`` once per flush:
+
+    >>> coalesce_signal('on_step_options_changed', key=tuple)
+    >>> coalesce_signal('on_protocol_changed')
+
+
+    .. versionadded:: X.X.X
+    '''
+    _coalesce_rules[function] = (key, merge)
+
+
+def set_coalesce_scheduler(scheduler):
+    '''
+    Set function used to schedule flush of coalesced signals.
+
+    Parameters
+    ----------
+    scheduler : function
+        Function which schedules a callback, e.g., :func:`gobject.idle_add`
+        to flush pending signals once per GTK main loop idle cycle.  The
+        callback returns ``False``.
+
+        If ``None``, coalesced signals are emitted immediately.
+
+
+    .. versionadded:: X.X.X
+    '''
+    global _coalesce_scheduler
+
+    _coalesce_scheduler = scheduler
+    if scheduler is None:
+        flush_coalesced_signals()
+
+
+def _defer_signal(function, args, interface):
+    '''
+    Add signal to pending coalesced signals and schedule flush.
+    '''
+    global _coalesce_flush_scheduled
+
+    key, merge = _coalesce_rules[function]
+    pending_key = (function, interface, None if key is None else key(args))
+    with _coalesce_lock:
+        if merge is not None and pending_key in _pending_signals:
+            args = merge(_pending_signals[pending_key], args)
+        _pending_signals[pending_key] = args
+        if _coalesce_flush_scheduled:
+            return
+        _coalesce_flush_scheduled = True
+    _coalesce_scheduler(flush_coalesced_signals)
+
+
+def flush_coalesced_signals():
+    '''
+    Emit pending coalesced signals.
+
+    Coalesced signals emitted while flushing (e.g., ``on_protocol_changed``
+    emitted by an ``on_step_options_changed`` observer) are merged into the
+    current flush.
+
+    Returns
+    -------
+    bool
+        ``False`` (i.e., do not repeat idle callback).
+
+
+    .. versionadded:: X.X.X
+    '''
+    global _coalesce_flush_scheduled
+
+    while True:
+        with _coalesce_lock:
+            if not _pending_signals:
+                _coalesce_flush_scheduled = False
+                return False
+            (function, interface, key), args = \
+                _pending_signals.popitem(last=False)
+        emit_signal(function, args, interface=interface, coalesce=False)
+
+
+def track_dispatch(enabled=True):
+    '''
+    Enable or disable recording of the signal and observer currently
+    dispatched by each thread (see :func:`get_active_dispatch`).
+
+    .. versionadded:: X.X.X
+    '''
+    global _track_dispatch
+
+    _track_dispatch = enabled
+    if not enabled:
+        _active_dispatch.clear()
+
+
+def get_active_dispatch(thread_ident):
+    '''
+    Parameters
+    ----------
+    thread_ident : int
+        Thread identifier (e.g., :attr:`threading.Thread.ident`).
+
+    Returns
+    -------
+    tuple or None
+        ``(function, observer_name)`` currently dispatched by
+        :func:`emit_signal` in specified thread (innermost signal if signals
+        are nested), or ``None`` if no signal is being dispatched or dispatch
+        tracking is disabled (see :func:`track_dispatch`).
+
+        Only sequential dispatch is recorded (i.e., not ``concurrent``).
+
+
+    .. versionadded:: X.X.X
+    '''
+    return _active_dispatch.get(thread_ident)
+
+
+def emit_signal(function, args=None, interface=IPlugin, concurrent=False,
+                coalesce=True):
     '''
     Call specified function on each enabled plugin implementing the function
     and collect results.
@@ -382,6 +1023,17 @@ def emit_signal(function, args=None, interface=IPlugin):
         Name of function to generate schedule for.
     interface : class, optional
         Plugin interface class.
+    concurrent : bool, optional
+        If ``True``, call observers in the same level of the schedule request
+        graph concurrently in a thread pool (see :func:`get_dispatch_levels`).
+
+        Observers marked as :func:`gtk_thread_only`, coroutine functions, and
+        signals listed in :data:`GTK_THREAD_SIGNALS` are called in the thread
+        emitting the signal.
+    coalesce : bool, optional
+        If ``True`` (default) and signal is coalesced (see
+        :func:`coalesce_signal`), defer signal until pending signals are
+        flushed and return an empty dictionary.
 
     Returns
     -------
@@ -391,18 +1043,43 @@ def emit_signal(function, args=None, interface=IPlugin):
 
     .. versionchanged:: 2.20
         Log caller at info level, and log args and observers at debug level.
+
+    .. versionchanged:: X.X.X
+        Call observers from cached dispatch table (see
+        :func:`get_dispatch_table`).  Only inspect stack to look up caller if
+        debug logging is enabled.
+
+    .. versionchanged:: X.X.X
+        Add :data:`concurrent` parameter.
+
+    .. versionchanged:: X.X.X
+        Add :data:`coalesce` parameter.
+
+    .. versionchanged:: X.X.X
+        Record active signal and observer if dispatch tracking is enabled (see
+        :func:`track_dispatch`).
     '''
-    logger = _L()  # use logger with function context
-    i = 0
-    caller = caller_name(skip=i)
+    if coalesce and function in _coalesce_rules and \
+            _coalesce_scheduler is not None:
+        if args is None:
+            args = []
+        elif not isinstance(args, list):
+            args = [args]
+        _defer_signal(function, args, interface)
+        return {}
 
-    while not caller or caller == 'microdrop.plugin_manager.emit_signal':
-        i += 1
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger_ = _L()  # use logger with function context
+        i = 0
         caller = caller_name(skip=i)
 
+        while not caller or caller == 'microdrop.plugin_manager.emit_signal':
+            i += 1
+            caller = caller_name(skip=i)
+
     try:
-        observers = get_observers(function, interface)
-        schedule = get_schedule(observers, function)
+        table = get_dispatch_table(function, interface)
 
         return_codes = {}
 
@@ -411,36 +1088,88 @@ def emit_signal(function, args=None, interface=IPlugin):
         elif not isinstance(args, list):
             args = [args]
 
-        if not any((name in caller) for name in ('logger', 'emit_signal')):
-            logger.debug('caller: %s -> %s', caller, function)
-            if logger.getEffectiveLevel() <= logging.DEBUG:
-                logger.debug('args: (%s)', ', '.join(map(repr, args)))
-        for observer_name in schedule:
-            observer = observers[observer_name]
-            try:
-                f = getattr(observer, function)
-                logger.debug('  call: %s.%s(...)', observer.name, function)
-                return_codes[observer.name] = f(*args)
-            except Exception, why:
-                with closing(StringIO()) as message:
-                    if hasattr(observer, "name"):
-                        if interface == ILoggingPlugin:
-                            # If this is a logging plugin, do not try to log
-                            # since that will result in infinite recursion.
-                            # Instead, just continue onto the next plugin.
-                            continue
-                        print >> message, \
-                            '%s plugin crashed processing %s signal.' % \
-                            (observer.name, function)
-                    print >> message, 'Reason:', str(why)
-                    logger.error(message.getvalue().strip())
-                map(logger.info, traceback.format_exc().splitlines())
+        if debug and not any((name in caller)
+                             for name in ('logger', 'emit_signal')):
+            logger_.debug('caller: %s -> %s', caller, function)
+            logger_.debug('args: (%s)', ', '.join(map(repr, args)))
+
+        if (concurrent and function not in GTK_THREAD_SIGNALS and
+                not getattr(_dispatch_thread, 'worker', False)):
+            for level in get_dispatch_levels(function, interface):
+                calls = []
+                for observer_name, observer, f in level:
+                    if debug:
+                        logger_.debug('  call: %s.%s(...)', observer_name,
+                                      function)
+                    if len(level) > 1 and not _runs_inline(observer, f):
+                        result = (_get_dispatch_executor()
+                                  .submit(_call_observer_in_worker, f, args))
+                    else:
+                        result = _call_observer(f, args)
+                    calls.append((observer_name, observer, result))
+
+                for observer_name, observer, result in calls:
+                    if isinstance(result, Future):
+                        result = result.result()
+                    success, value = result
+                    if success:
+                        return_codes[observer_name] = value
+                    else:
+                        _log_observer_error(_L(), observer, function,
+                                            interface, *value)
+            return return_codes
+
+        # Record active observer for watchdog (see `track_dispatch()`).
+        tracked = _track_dispatch
+        if tracked:
+            ident = threading.current_thread().ident
+            previous = _active_dispatch.get(ident)
+        try:
+            for observer_name, observer, f in table:
+                if tracked:
+                    _active_dispatch[ident] = (function, observer_name)
+                try:
+                    if debug:
+                        logger_.debug('  call: %s.%s(...)', observer_name,
+                                      function)
+                    return_codes[observer_name] = f(*args)
+                except Exception, why:
+                    _log_observer_error(_L(), observer, function, interface,
+                                        why, traceback.format_exc())
+        finally:
+            if tracked:
+                if previous is None:
+                    _active_dispatch.pop(ident, None)
+                else:
+                    _active_dispatch[ident] = previous
         return return_codes
     except Exception, why:
-        logger.error(why, exc_info=True)
+        _L().error(why, exc_info=True)
         return {}
 
 
+def _log_observer_error(logger, observer, function, interface, why,
+                        traceback_):
+    '''
+    Log error raised by observer while processing signal.
+
+    .. versionadded:: X.X.X
+    '''
+    with closing(StringIO()) as message:
+        if hasattr(observer, "name"):
+            if interface == ILoggingPlugin:
+                # If this is a logging plugin, do not try to log since that
+                # will result in infinite recursion.  Instead, just continue
+                # onto the next plugin.
+                return
+            print >> message, \
+                '%s plugin crashed processing %s signal.' % \
+                (observer.name, function)
+        print >> message, 'Reason:', str(why)
+        logger.error(message.getvalue().strip())
+    map(logger.info, traceback_.splitlines())
+
+
 def enable(name, env='microdrop.managed'):
     '''
     Enable specified plugin.
@@ -454,14 +1183,26 @@ def enable(name, env='microdrop.managed'):
     env : str, optional
         Name of ``pyutilib.component.core`` plugin environment (e.g.,
         ``'microdrop.managed``').
+
+
+    .. versionchanged:: X.X.X
+        Import plugin if it has not been imported yet (see
+        :class:`PluginProxy`).
+
+    .. versionchanged:: X.X.X
+        Record enabling plugin as startup phase (see
+        :mod:`microdrop.startup_profiler`).
     '''
-    service = get_service_instance_by_name(name, env)
-    if not service.enabled():
-        service.enable()
-        _L().info('[PluginManager] Enabled plugin: %s', name)
-    if hasattr(service, "on_plugin_enable"):
-        service.on_plugin_enable()
-    emit_signal('on_plugin_enabled', [env, service])
+    with startup_profiler.phase('enable %s' % name, category='plugin'):
+        service = get_service_instance_by_name(name, env)
+        if isinstance(service, PluginProxy):
+            service = service.load()
+        if not service.enabled():
+            service.enable()
+            _L().info('[PluginManager] Enabled plugin: %s', name)
+        if hasattr(service, "on_plugin_enable"):
+            service.on_plugin_enable()
+        emit_signal('on_plugin_enabled', [env, service])
 
 
 def disable(name, env='microdrop.managed'):
@@ -0,0 +1,342 @@
+'''
+.. versionadded:: X.X.X
+
+Collision-free route planning for multiple droplets.
+
+Droplet routes are planned simultaneously in a *time-expanded* electrode
+graph, i.e., each droplet may either stay on its current electrode or move to
+a neighbouring electrode at each time step.  At every time step, droplets are
+kept at least :data:`spacing` + 1 connections apart, both from the positions
+of all other droplets at the same time step and at the adjacent time steps, to
+prevent droplets from merging.
+
+Routes are planned one droplet at a time (i.e., *prioritized planning*) using
+A* search over ``(electrode, time step)`` states, with the hop distance to
+the target electrode as heuristic (see
+:meth:`microdrop.device_graph.ElectrodeRouter.distances`).  Electrodes
+occupied by already planned droplets are recorded in a reservation table.  If
+a droplet cannot be routed, planning is restarted with that droplet routed
+first.
+
+.. note:: Prioritized planning is not complete, i.e., for densely packed
+    droplets, routes may not be found even though a solution exists.
+
+Example
+-------
+
+    >>> planner = RoutePlanner(device)
+    >>> paths = planner.plan([('electrode000', 'electrode020'),
+    ...                       ('electrode020', 'electrode000')])
+    >>> steps = protocol_steps(paths, template=protocol.steps[step_number])
+    >>> protocol.insert_steps(step_number, values=steps)
+'''
+from collections import Counter
+import heapq
+
+import numpy as np
+import pandas as pd
+
+
+#: Name of plugin storing electrode states for each protocol step.
+ELECTRODE_CONTROLLER_PLUGIN = 'microdrop.electrode_controller_plugin'
+
+
+class RoutePlanningError(Exception):
+    pass
+
+
+class RoutePlanner(object):
+    '''
+    Plan simultaneous collision-free routes for multiple droplets on a device.
+
+    Parameters
+    ----------
+    device : microdrop.dmf_device.DmfDevice
+        Device with electrode connections.
+    spacing : int, optional
+        Minimum number of connections between droplets, *excluding* the
+        connection to the electrode of each droplet.  For example, with the
+        default spacing of 1, droplets may never occupy neighbouring
+        electrodes.
+    '''
+    def __init__(self, device, spacing=1):
+        self.router = device.router
+        self.spacing = spacing
+        self._neighbours = [self.router.indices[start:end].tolist()
+                            for start, end in zip(self.router.indptr[:-1],
+                                                  self.router.indptr[1:])]
+        self._zones = {}
+
+    def _zone(self, node):
+        '''
+        Returns
+        -------
+        list
+            Integer indexes of electrodes within :attr:`spacing` connections
+            of electrode ``node`` (including ``node``).
+        '''
+        if node not in self._zones:
+            hop_distances = self.router.distances(node)
+            self._zones[node] = \
+                np.flatnonzero((hop_distances >= 0) &
+                               (hop_distances <= self.spacing)).tolist()
+        return self._zones[node]
+
+    def plan(self, routes, max_restarts=None):
+        '''
+        Plan simultaneous routes for multiple droplets.
+
+        Parameters
+        ----------
+        routes : list
+            List of ``(source_id, target_id)`` electrode identifier pairs, one
+            per droplet.
+        max_restarts : int, optional
+            Maximum number of times planning is restarted with a different
+            droplet order (default: number of droplets).
+
+        Returns
+        -------
+        list
+            List of electrode identifier paths, one per droplet in the order of
+            :data:`routes`.  All paths have the same length, i.e., the number
+            of time steps; droplets that arrive early stay on their target
+            electrode.
+
+        Raises
+        ------
+        RoutePlanningError
+            If droplet positions violate the spacing constraint, or if no
+            collision-free routes were found.
+        '''
+        index = self.router._index
+        routes = [(index(source_id), index(target_id))
+                  for source_id, target_id in routes]
+        for position in (0, 1):
+            nodes = [route_i[position] for route_i in routes]
+            for i, node_i in enumerate(nodes):
+                zone_i = set(self._zone(node_i))
+                if any(node_j in zone_i for node_j in nodes[i + 1:]):
+                    raise RoutePlanningError('%s electrodes of droplets are '
+                                             'too close together.' %
+                                             ('Source', 'Target')[position])
+
+        if max_restarts is None:
+            max_restarts = len(routes)
+        # Route droplets with the longest routes first.
+        priority = sorted(range(len(routes)),
+                          key=lambda i: -self.router.distances(routes[i][1])
+                          [routes[i][0]])
+        for attempt in xrange(max_restarts + 1):
+            paths, failed = self._plan_ordered(routes,
+                                               self._order(routes, priority))
+            if failed is None:
+                break
+            # Give the droplet that could not be routed the highest priority.
+            priority.remove(failed)
+            priority.insert(0, failed)
+        else:
+            raise RoutePlanningError('No collision-free routes found after %d '
+                                     'attempts.' % (max_restarts + 1))
+
+        step_count = max(len(path_i) for path_i in paths)
+        return [self.router.electrode_ids[path_i + [path_i[-1]] *
+                                          (step_count - len(path_i))].tolist()
+                for path_i in paths]
+
+    def _order(self, routes, priority):
+        '''
+        Order droplets for routing.
+
+        A droplet with a target electrode near the source electrode of another
+        droplet is routed after the other droplet (unless the dependencies are
+        cyclic, e.g., for droplets swapping positions).
+
+        Parameters
+        ----------
+        routes : list
+            List of integer ``(source, target)`` electrode pairs.
+        priority : list
+            Droplet indexes, in order of decreasing priority.
+
+        Returns
+        -------
+        list
+            Droplet indexes in routing order, i.e., the highest priority
+            droplet whose dependencies have already been routed is routed
+            next.
+        '''
+        zones = [set(self._zone(source)) for source, target in routes]
+        dependencies = [set(j for j, zone_j in enumerate(zones)
+                            if j != i and target in zone_j)
+                        for i, (source, target) in enumerate(routes)]
+        order = []
+        remaining = list(priority)
+        while remaining:
+            for i in remaining:
+                if not dependencies[i].difference(order):
+                    break
+            else:
+                # Cyclic dependencies.
+                i = remaining[0]
+            order.append(i)
+            remaining.remove(i)
+        return order
+
+    def _plan_ordered(self, routes, order):
+        '''
+        Plan routes for droplets one at a time in the specified order.
+
+        Returns
+        -------
+        tuple
+            ``(paths, failed)``, where ``paths`` is a list of integer electrode
+            paths (``None`` for droplets not routed) and ``failed`` is the
+            index of the droplet that could not be routed (``None`` if all
+            droplets were routed).
+        '''
+        # Electrodes blocked at each time step.
+        reservations = {}
+        # Time step from which each electrode is blocked indefinitely (i.e.,
+        # by a droplet that has reached its target).
+        permanent = {}
+        # Last time step at which each electrode is blocked.
+        last_reserved = {}
+        # Electrodes around the source of droplets that have not been routed
+        # yet.  These electrodes are blocked for the first two time steps, so
+        # the droplets are free to move away.
+        waiting = Counter()
+        for source, target in routes:
+            waiting.update(self._zone(source))
+
+        paths = [None] * len(routes)
+        for i in order:
+            source, target = routes[i]
+            waiting.subtract(self._zone(source))
+            path_i = self._plan_single(source, target, reservations,
+                                       permanent, last_reserved, waiting)
+            if path_i is None:
+                return paths, i
+            paths[i] = path_i
+
+            # Reserve electrodes around droplet for each time step along
+            # route, including adjacent time steps.
+            for t, node in enumerate(path_i):
+                zone = self._zone(node)
+                for t_i in xrange(max(t - 1, 0), t + 2):
+                    reservations.setdefault(t_i, set()).update(zone)
+                for node_j in zone:
+                    last_reserved[node_j] = max(last_reserved.get(node_j, -1),
+                                                t + 1)
+            arrival = len(path_i) - 1
+            for node_j in self._zone(target):
+                permanent[node_j] = min(permanent.get(node_j, arrival),
+                                        arrival)
+        return paths, None
+
+    def _plan_single(self, source, target, reservations, permanent,
+                     last_reserved, waiting):
+        '''
+        Find shortest route for a single droplet through free electrodes of
+        time-expanded graph using A* search.
+
+        Returns
+        -------
+        list or None
+            Integer electrode path, one electrode per time step (``None`` if no
+            route was found).
+        '''
+        def _free(node, t):
+            return not (node in reservations.get(t, ()) or
+                        permanent.get(node, t + 1) <= t or
+                        (t < 2 and waiting[node] > 0))
+
+        hop_distances = self.router.distances(target).tolist()
+        if hop_distances[source] < 0 or not _free(source, 0):
+            return None
+
+        # Blocked electrodes do not change after the last reserved time step,
+        # so all later time steps are equivalent search states.
+        t_static = max(max(last_reserved.values() or [0]), 2)
+        parents = {(source, 0): None}
+        queue = [(hop_distances[source], 0, source)]
+        while queue:
+            _, t, node = heapq.heappop(queue)
+            state = (node, min(t, t_static))
+            if node == target and t >= last_reserved.get(target, -1):
+                # Droplet may stay at target indefinitely.
+                path_i = []
+                while state is not None:
+                    path_i.append(state[0])
+                    state = parents[state]
+                return path_i[::-1]
+            t_i = t + 1
+            for node_i in [node] + self._neighbours[node]:
+                state_i = (node_i, min(t_i, t_static))
+                if state_i in parents or not _free(node_i, t_i):
+                    continue
+                parents[state_i] = state
+                heapq.heappush(queue, (t_i + hop_distances[node_i], t_i,
+                                       node_i))
+        return None
+
+
+def plan_routes(device, routes, spacing=1):
+    '''
+    Plan simultaneous collision-free routes for multiple droplets.
+
+    See :meth:`RoutePlanner.plan`.
+    '''
+    return RoutePlanner(device, spacing=spacing).plan(routes)
+
+
+def electrode_state_steps(paths):
+    '''
+    Parameters
+    ----------
+    paths : list
+        List of equal length electrode identifier paths, one per droplet (see
+        :meth:`RoutePlanner.plan`).
+
+    Returns
+    -------
+    list
+        Electrode states (i.e., :class:`pandas.Series` of actuated electrodes
+        indexed by electrode identifier) for each time step.
+    '''
+    return [pd.Series(1, index=pd.Index(electrode_ids).drop_duplicates())
+            for electrode_ids in zip(*paths)]
+
+
+def protocol_steps(paths, template=None):
+    '''
+    Create protocol steps actuating the electrodes along droplet routes.
+
+    The resulting steps may be inserted into a protocol in bulk, e.g.::
+
+        protocol.insert_steps(step_number, values=protocol_steps(paths))
+
+    Parameters
+    ----------
+    paths : list
+        List of equal length electrode identifier paths, one per droplet (see
+        :meth:`RoutePlanner.plan`).
+    template : microdrop.protocol.Step, optional
+        Step to copy plugin data (e.g., duration, voltage) from.
+
+    Returns
+    -------
+    list
+        List of :class:`microdrop.protocol.Step` instances, one per time step.
+    '''
+    from protocol import Step
+
+    plugin_data = template.plugin_data if template is not None else {}
+    steps = []
+    for electrode_states in electrode_state_steps(paths):
+        step = Step(plugin_data=plugin_data)
+        data = step.get_data(ELECTRODE_CONTROLLER_PLUGIN) or {}
+        data['electrode_states'] = electrode_states
+        step.set_data(ELECTRODE_CONTROLLER_PLUGIN, data)
+        steps.append(step)
+    return steps
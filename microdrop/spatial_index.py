@@ -0,0 +1,378 @@
+'''
+.. versionadded:: X.X.X
+
+Spatial index for electrode hit-testing and geometry queries.
+'''
+import math
+
+import numpy as np
+
+from device_graph import csr_from_pairs, csr_gather
+
+
+class ElectrodeSpatialIndex(object):
+    '''
+    Uniform grid index over electrode bounding boxes.
+
+    Each grid cell lists the electrodes whose bounding box overlaps the cell.
+    Queries first look up candidate electrodes in the relevant grid cells,
+    filter candidates by bounding box, and then apply exact polygon tests.
+
+    Multiple points may be tested at once using vectorised polygon tests (see
+    :meth:`electrode_indexes_at`).
+
+    Parameters
+    ----------
+    df_shapes : pandas.DataFrame
+        Table of electrode polygon vertices, with one row per vertex and the
+        columns ``vertex_i``, ``x``, and ``y``.
+    shape_i_column : str, optional
+        Column identifying the electrode of each vertex.
+    cell_size : float, optional
+        Width and height of each grid cell (default: median electrode bounding
+        box size).
+
+    Attributes
+    ----------
+    electrode_ids : numpy.ndarray
+        Electrode identifiers, ordered by integer electrode index (i.e., sorted
+        by identifier).
+    bounding_boxes : numpy.ndarray
+        ``N x 4`` array of electrode bounding boxes, with the columns ``xmin``,
+        ``ymin``, ``xmax``, and ``ymax``.
+    '''
+    def __init__(self, df_shapes, shape_i_column='id', cell_size=None):
+        df_vertices = df_shapes.sort_values([shape_i_column, 'vertex_i'])
+        self.electrode_ids, electrodes = \
+            np.unique(df_vertices[shape_i_column].values.astype(object),
+                      return_inverse=True)
+        self.electrode_ids = self.electrode_ids.astype(object)
+        electrode_count = self.electrode_ids.size
+
+        # Each vertex starts an edge ending at the next vertex of the same
+        # electrode (wrapping around to the first vertex).
+        x = df_vertices['x'].values.astype(float)
+        y = df_vertices['y'].values.astype(float)
+        self.edges_indptr = np.zeros(electrode_count + 1, dtype=int)
+        np.cumsum(np.bincount(electrodes, minlength=electrode_count),
+                  out=self.edges_indptr[1:])
+        next_vertex = np.arange(1, x.size + 1)
+        next_vertex[self.edges_indptr[1:] - 1] = self.edges_indptr[:-1]
+        self._edges = np.column_stack([x, y, x[next_vertex], y[next_vertex]])
+        self._edge_ids = np.arange(x.size)
+
+        starts = self.edges_indptr[:-1]
+        self.bounding_boxes = np.column_stack([np.minimum.reduceat(x, starts),
+                                               np.minimum.reduceat(y, starts),
+                                               np.maximum.reduceat(x, starts),
+                                               np.maximum.reduceat(y, starts)])
+
+        # Uniform grid over all electrode bounding boxes.
+        sizes = self.bounding_boxes[:, 2:] - self.bounding_boxes[:, :2]
+        if cell_size is None:
+            cell_size = np.median(sizes.max(axis=1))
+        self.cell_size = float(cell_size) if cell_size > 0 else 1.
+        self.origin = self.bounding_boxes[:, :2].min(axis=0)
+        extent = self.bounding_boxes[:, 2:].max(axis=0) - self.origin
+        self.shape = tuple(np.floor(extent[::-1] / self.cell_size)
+                           .astype(int) + 1)
+
+        # Map each cell to electrodes with bounding boxes overlapping the cell.
+        cell_min = self._cells(self.bounding_boxes[:, :2])
+        cell_max = self._cells(self.bounding_boxes[:, 2:])
+        widths = cell_max[:, 0] - cell_min[:, 0] + 1
+        counts = widths * (cell_max[:, 1] - cell_min[:, 1] + 1)
+        cell_electrodes = np.repeat(np.arange(electrode_count), counts)
+        # Offset of each cell within the (row-major) cell range of the
+        # corresponding electrode.
+        offsets = (np.arange(counts.sum()) -
+                   np.repeat(np.cumsum(counts) - counts, counts))
+        widths = widths[cell_electrodes]
+        cells = ((cell_min[cell_electrodes, 1] + offsets // widths) *
+                 self.shape[1] + cell_min[cell_electrodes, 0] +
+                 offsets % widths)
+        self.cell_indptr, self.cell_indices = \
+            csr_from_pairs(cells, cell_electrodes,
+                           self.shape[0] * self.shape[1])
+
+        # Plain Python copies for single point queries, which are faster
+        # than array operations for a handful of candidates.
+        self._cell_lists = [self.cell_indices[start:end].tolist()
+                            for start, end in zip(self.cell_indptr[:-1],
+                                                  self.cell_indptr[1:])]
+        self._origin = self.origin.tolist()
+        self._boxes = self.bounding_boxes.tolist()
+        vertices = zip(x.tolist(), y.tolist())
+        self._polygons = [vertices[start:end] for start, end in
+                          zip(self.edges_indptr[:-1], self.edges_indptr[1:])]
+
+    def _cells(self, xy):
+        '''
+        Returns
+        -------
+        numpy.ndarray
+            ``N x 2`` array of grid ``(column, row)`` cell coordinates of each
+            point (clipped to grid).
+        '''
+        cells = np.floor((np.asarray(xy, dtype=float) - self.origin) /
+                         self.cell_size).astype(int)
+        return np.clip(cells, 0, np.array(self.shape[::-1]) - 1)
+
+    def _cell(self, x, y):
+        '''
+        Returns
+        -------
+        tuple or None
+            Grid ``(column, row)`` cell coordinates of point (``None`` if
+            point is outside grid).
+        '''
+        col = int((x - self._origin[0]) // self.cell_size)
+        row = int((y - self._origin[1]) // self.cell_size)
+        if 0 <= row < self.shape[0] and 0 <= col < self.shape[1]:
+            return col, row
+        return None
+
+    def _cell_candidates(self, x, y):
+        '''
+        Returns
+        -------
+        tuple
+            ``(electrode_indexes, positions)``, where ``positions`` is the
+            index of the point corresponding to each candidate electrode.
+            Candidates are electrodes with bounding boxes containing the point.
+        '''
+        cells = self._cells(np.column_stack([x, y]))
+        electrode_indexes, positions = \
+            csr_gather(self.cell_indptr, self.cell_indices,
+                       cells[:, 1] * self.shape[1] + cells[:, 0])
+        boxes = self.bounding_boxes[electrode_indexes]
+        x_i = x[positions]
+        y_i = y[positions]
+        inside = ((boxes[:, 0] <= x_i) & (x_i <= boxes[:, 2]) &
+                  (boxes[:, 1] <= y_i) & (y_i <= boxes[:, 3]))
+        return electrode_indexes[inside], positions[inside]
+
+    def _contains(self, electrode_indexes, x, y):
+        '''
+        Returns
+        -------
+        numpy.ndarray
+            ``True`` for each electrode polygon containing the corresponding
+            point (using crossing number test).
+        '''
+        edge_ids, pairs = csr_gather(self.edges_indptr, self._edge_ids,
+                                     electrode_indexes)
+        x0, y0, x1, y1 = self._edges[edge_ids].T
+        x_i = x[pairs]
+        y_i = y[pairs]
+        straddles = (y0 > y_i) != (y1 > y_i)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_cross = x0 + (y_i - y0) * (x1 - x0) / (y1 - y0)
+        crossings = np.bincount(pairs, weights=straddles & (x_i < x_cross),
+                                minlength=electrode_indexes.size)
+        return crossings % 2 == 1
+
+    def electrode_indexes_at(self, x, y):
+        '''
+        Parameters
+        ----------
+        x, y : array-like
+            Point coordinates.
+
+        Returns
+        -------
+        numpy.ndarray
+            Integer index of electrode containing each point (``-1`` if point
+            is not inside any electrode).
+        '''
+        x = np.atleast_1d(np.asarray(x, dtype=float))
+        y = np.atleast_1d(np.asarray(y, dtype=float))
+        electrode_indexes, positions = self._cell_candidates(x, y)
+        inside = self._contains(electrode_indexes, x[positions],
+                                y[positions])
+        result = np.full(x.size, -1, dtype=int)
+        # Assign in reverse order so first matching electrode is kept.
+        result[positions[inside][::-1]] = electrode_indexes[inside][::-1]
+        return result
+
+    def electrode_at(self, x, y):
+        '''
+        Returns
+        -------
+        str or None
+            Identifier of electrode containing point ``(x, y)`` (``None`` if
+            point is not inside any electrode).
+        '''
+        cell = self._cell(x, y)
+        if cell is None:
+            return None
+        col, row = cell
+        for i in self._cell_lists[row * self.shape[1] + col]:
+            xmin, ymin, xmax, ymax = self._boxes[i]
+            if (xmin <= x <= xmax and ymin <= y <= ymax and
+                    point_in_polygon(x, y, self._polygons[i])):
+                return self.electrode_ids[i]
+        return None
+
+    def electrode_indexes_in_rect(self, xmin, ymin, xmax, ymax,
+                                  contained=False):
+        '''
+        Parameters
+        ----------
+        xmin, ymin, xmax, ymax : float
+            Rectangle bounds.
+        contained : bool, optional
+            If ``True``, only return electrodes that lie *completely* inside
+            the rectangle.  Otherwise, return electrodes with bounding boxes
+            overlapping the rectangle.
+
+        Returns
+        -------
+        numpy.ndarray
+            Sorted integer indexes of electrodes in rectangle.
+        '''
+        (col0, row0), (col1, row1) = self._cells([[xmin, ymin],
+                                                  [xmax, ymax]])
+        cells = (np.arange(row0, row1 + 1)[:, None] * self.shape[1] +
+                 np.arange(col0, col1 + 1)).ravel()
+        candidates = np.unique(csr_gather(self.cell_indptr, self.cell_indices,
+                                          cells)[0])
+        boxes = self.bounding_boxes[candidates]
+        if contained:
+            selected = ((boxes[:, 0] >= xmin) & (boxes[:, 2] <= xmax) &
+                        (boxes[:, 1] >= ymin) & (boxes[:, 3] <= ymax))
+        else:
+            selected = ((boxes[:, 0] <= xmax) & (boxes[:, 2] >= xmin) &
+                        (boxes[:, 1] <= ymax) & (boxes[:, 3] >= ymin))
+        return candidates[selected]
+
+    def electrodes_in_rect(self, xmin, ymin, xmax, ymax, contained=False):
+        '''
+        Parameters
+        ----------
+        xmin, ymin, xmax, ymax : float
+            Rectangle bounds.
+        contained : bool, optional
+            If ``True``, only return electrodes that lie *completely* inside
+            the rectangle.  Otherwise, return electrodes with bounding boxes
+            overlapping the rectangle.
+
+        Returns
+        -------
+        list
+            Identifiers of electrodes in rectangle.
+        '''
+        return self.electrode_ids[self.electrode_indexes_in_rect
+                                  (xmin, ymin, xmax, ymax,
+                                   contained=contained)].tolist()
+
+    def nearest_electrode(self, x, y, max_distance=None):
+        '''
+        Parameters
+        ----------
+        x, y : float
+            Point coordinates.
+        max_distance : float, optional
+            Maximum distance from point to electrode.
+
+        Returns
+        -------
+        tuple
+            ``(electrode_id, distance)`` of the electrode with the closest
+            outline to point ``(x, y)``, where the distance is zero if the
+            point is inside the electrode.  Returns ``(None, None)`` if no
+            electrode is within :data:`max_distance`.
+        '''
+        electrode_id = self.electrode_at(x, y)
+        if electrode_id is not None:
+            return electrode_id, 0.
+
+        # Search rings of cells around cell closest to point, until no cell
+        # in the next ring can be closer than the closest electrode found.
+        rows, columns = self.shape
+        col = min(max(int((x - self._origin[0]) // self.cell_size), 0),
+                  columns - 1)
+        row = min(max(int((y - self._origin[1]) // self.cell_size), 0),
+                  rows - 1)
+        # Distance from point to cell (non-zero if point is outside grid).
+        x_cell = self._origin[0] + col * self.cell_size
+        y_cell = self._origin[1] + row * self.cell_size
+        outside = math.hypot(max(x_cell - x, x - x_cell - self.cell_size, 0),
+                             max(y_cell - y, y - y_cell - self.cell_size, 0))
+        limit = float('inf') if max_distance is None else max_distance
+        seen = set()
+        best_index, best_distance = None, float('inf')
+        for radius in xrange(max(rows, columns)):
+            if min(best_distance, limit) <= max(outside, (radius - 1) *
+                                                self.cell_size):
+                break
+            for row_i in xrange(max(row - radius, 0),
+                                min(row + radius, rows - 1) + 1):
+                if abs(row_i - row) == radius:
+                    cols_i = xrange(max(col - radius, 0),
+                                    min(col + radius, columns - 1) + 1)
+                else:
+                    cols_i = [col_i for col_i in (col - radius, col + radius)
+                              if 0 <= col_i < columns]
+                for col_i in cols_i:
+                    for i in self._cell_lists[row_i * columns + col_i]:
+                        if i in seen:
+                            continue
+                        seen.add(i)
+                        distance = point_outline_distance(x, y,
+                                                          self._polygons[i])
+                        if distance < best_distance:
+                            best_index, best_distance = i, distance
+        if best_index is None or best_distance > limit:
+            return None, None
+        return self.electrode_ids[best_index], best_distance
+
+
+def point_in_polygon(x, y, vertices):
+    '''
+    Parameters
+    ----------
+    x, y : float
+        Point coordinates.
+    vertices : list
+        Polygon ``(x, y)`` vertex coordinates.
+
+    Returns
+    -------
+    bool
+        ``True`` if point is inside polygon (using crossing number test).
+    '''
+    inside = False
+    x0, y0 = vertices[-1]
+    for x1, y1 in vertices:
+        if (y0 > y) != (y1 > y) and x < x0 + (y - y0) * (x1 - x0) / (y1 - y0):
+            inside = not inside
+        x0, y0 = x1, y1
+    return inside
+
+
+def point_outline_distance(x, y, vertices):
+    '''
+    Parameters
+    ----------
+    x, y : float
+        Point coordinates.
+    vertices : list
+        Polygon ``(x, y)`` vertex coordinates.
+
+    Returns
+    -------
+    float
+        Distance from point to closest polygon edge.
+    '''
+    distance = float('inf')
+    x0, y0 = vertices[-1]
+    for x1, y1 in vertices:
+        dx = x1 - x0
+        dy = y1 - y0
+        length = dx * dx + dy * dy
+        t = (min(max(((x - x0) * dx + (y - y0) * dy) / length, 0), 1)
+             if length > 0 else 0)
+        distance = min(distance, math.hypot(x0 + t * dx - x, y0 + t * dy - y))
+        x0, y0 = x1, y1
+    return distance
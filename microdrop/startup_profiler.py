@@ -0,0 +1,249 @@
+'''
+.. versionadded:: X.X.X
+
+Startup timeline profiler.
+
+Records the wall-clock and CPU time of each startup phase (e.g., core plugin
+imports, configuration validation, plugin imports, enabling each plugin,
+loading the device and protocol).  When startup is complete, the timeline is
+written as a `Chrome trace`_ JSON file (open in ``chrome://tracing`` or
+https://ui.perfetto.dev) and a summary table is written to the log.
+
+The profiler is enabled by the ``--profile-startup`` command-line flag or by
+setting the ``MICRODROP_PROFILE_STARTUP`` environment variable, either to the
+path of the trace file to write or to ``1`` (write trace to the temporary
+directory).
+
+Phases are recorded using the :func:`phase` context manager, which does
+nothing while the profiler is disabled::
+
+    >>> with startup_profiler.phase('load_device', path=device_path):
+    ...     load_device(device_path)
+
+.. _`Chrome trace`: https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+'''
+from StringIO import StringIO
+from contextlib import contextmanager
+import datetime as dt
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import path_helpers as ph
+
+
+logger = logging.getLogger(__name__)
+
+#: Environment variable enabling the startup profiler.
+STARTUP_PROFILE_ENV = 'MICRODROP_PROFILE_STARTUP'
+
+
+def _cpu_time():
+    '''
+    Returns
+    -------
+    float
+        User and system CPU time of process (in seconds).
+    '''
+    times = os.times()
+    return times[0] + times[1]
+
+
+class StartupProfiler(object):
+    '''
+    Timeline of (possibly nested) startup phases.
+
+    Attributes
+    ----------
+    events : list
+        Completed phases as ``(name, category, start, wall, cpu, depth, tid,
+        args)`` tuples, with times in seconds (``start`` relative to profiler
+        creation).
+    '''
+    def __init__(self):
+        self.events = []
+        self.origin = time.time()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name, category='startup', **kwargs):
+        '''
+        Record duration of ``with`` block as phase.
+
+        Parameters
+        ----------
+        name : str
+            Phase name.
+        category : str, optional
+            Phase category (e.g., ``'plugin'``).
+        **kwargs
+            Extra phase arguments (included in trace).
+        '''
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
+        start = time.time()
+        cpu_start = _cpu_time()
+        try:
+            yield
+        finally:
+            wall = time.time() - start
+            cpu = _cpu_time() - cpu_start
+            self._local.depth = depth
+            with self._lock:
+                self.events.append((name, category, start - self.origin, wall,
+                                    cpu, depth, threading.current_thread()
+                                    .ident, kwargs))
+
+    def trace(self):
+        '''
+        Returns
+        -------
+        dict
+            Timeline in Chrome trace event format (one complete event per
+            phase, times in microseconds).
+        '''
+        pid = os.getpid()
+        events = []
+        for name, category, start, wall, cpu, depth, tid, args in \
+                sorted(self.events, key=lambda e: (e[2], e[5])):
+            args = dict((k, str(v)) for k, v in args.iteritems())
+            args['cpu_ms'] = round(cpu * 1e3, 3)
+            events.append({'name': name, 'cat': category, 'ph': 'X',
+                           'ts': int(start * 1e6), 'dur': int(wall * 1e6),
+                           'pid': pid, 'tid': tid, 'args': args})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms',
+                'otherData': {'start': dt.datetime.fromtimestamp(self.origin)
+                              .isoformat()}}
+
+    def write_trace(self, trace_path):
+        '''
+        Parameters
+        ----------
+        trace_path : str
+            Output path of Chrome trace JSON file.
+        '''
+        with open(trace_path, 'wb') as output:
+            json.dump(self.trace(), output)
+
+    def summary(self):
+        '''
+        Returns
+        -------
+        str
+            Table listing the wall and CPU time of each phase in start order
+            (nested phases are indented), followed by the total time.
+        '''
+        output = StringIO()
+        print >> output, '%-56s %10s %10s' % ('Phase', 'Wall (ms)',
+                                              'CPU (ms)')
+        print >> output, '-' * 78
+        for name, category, start, wall, cpu, depth, tid, args in \
+                sorted(self.events, key=lambda e: (e[2], e[5])):
+            label = ('  ' * depth + name)[:56]
+            print >> output, '%-56s %10.1f %10.1f' % (label, wall * 1e3,
+                                                      cpu * 1e3)
+        print >> output, '-' * 78
+        print >> output, '%-56s %10.1f' % ('Total', (time.time() -
+                                                     self.origin) * 1e3)
+        return output.getvalue().rstrip()
+
+
+#: Active profiler (``None`` while profiling is disabled).
+_profiler = None
+
+
+def enable(trace_path=None):
+    '''
+    Start recording startup phases.
+
+    Parameters
+    ----------
+    trace_path : str, optional
+        Output path of Chrome trace JSON file.
+
+        By default, write to ``microdrop-startup-<timestamp>.json`` in the
+        temporary directory.
+
+    Returns
+    -------
+    StartupProfiler
+        Active profiler.
+    '''
+    global _profiler
+
+    if _profiler is None:
+        _profiler = StartupProfiler()
+        if not trace_path:
+            trace_path = ph.path(tempfile.gettempdir())\
+                .joinpath('microdrop-startup-%s.json' %
+                          dt.datetime.now().strftime('%Y%m%dT%H%M%S'))
+        _profiler.trace_path = ph.path(trace_path)
+    return _profiler
+
+
+def enable_from_args(args):
+    '''
+    Enable profiler if requested by ``--profile-startup`` flag or
+    :data:`STARTUP_PROFILE_ENV` environment variable.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Parsed arguments of :data:`microdrop.MICRODROP_PARSER`.
+
+    Returns
+    -------
+    StartupProfiler or None
+        Active profiler, or ``None`` if profiling is not requested.
+    '''
+    value = os.environ.get(STARTUP_PROFILE_ENV, '').strip()
+    if getattr(args, 'profile_startup', False) or value:
+        return enable(None if value.lower() in ('', '1', 'true', 'yes')
+                      else value)
+
+
+def phase(name, category='startup', **kwargs):
+    '''
+    Record duration of ``with`` block as startup phase (see
+    :meth:`StartupProfiler.phase`).
+
+    Does nothing if profiler is not enabled.
+    '''
+    if _profiler is None:
+        return _no_phase()
+    return _profiler.phase(name, category=category, **kwargs)
+
+
+@contextmanager
+def _no_phase():
+    yield
+
+
+def finish():
+    '''
+    Stop profiling, write trace file, and write summary table to the log.
+
+    Does nothing if profiler is not enabled.
+
+    Returns
+    -------
+    StartupProfiler or None
+        Finished profiler, or ``None`` if profiler was not enabled.
+    '''
+    global _profiler
+
+    profiler, _profiler = _profiler, None
+    if profiler is None:
+        return None
+    logger.info('Startup profile:\n%s', profiler.summary())
+    try:
+        profiler.write_trace(profiler.trace_path)
+        logger.info('Wrote startup trace to `%s`.', profiler.trace_path)
+    except IOError:
+        logger.error('Error writing startup trace to `%s`.',
+                     profiler.trace_path, exc_info=True)
+    return profiler
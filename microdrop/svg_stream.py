@@ -0,0 +1,262 @@
+'''
+.. versionadded:: X.X.X
+
+Streaming parser for electrode shapes and connection lines of device SVG files.
+
+The SVG document is parsed incrementally (see :func:`lxml.etree.iterparse`)
+and each element is released as soon as it has been processed.  Only shapes in
+the ``Device`` layer and lines in the ``Connections`` layer are decoded, so
+peak memory (and most of the load time) depends on the electrode data rather
+than on the size of the document (e.g., large background or annotation
+layers).
+
+Electrode vertices are decoded straight into preallocated vertex arrays (see
+:class:`VertexBuffer`) instead of one Python row per vertex.
+
+Example
+-------
+
+    >>> df_shapes, df_shape_connections = read_device_svg('device.svg')
+'''
+from collections import OrderedDict
+import re
+
+from lxml import etree
+from svg_model import INKSCAPE_NSMAP
+import numpy as np
+import pandas as pd
+
+from spatial_index import ElectrodeSpatialIndex
+
+
+SVG_G = '{%s}g' % INKSCAPE_NSMAP['svg']
+SVG_LINE = '{%s}line' % INKSCAPE_NSMAP['svg']
+SVG_PATH = '{%s}path' % INKSCAPE_NSMAP['svg']
+SVG_POLYGON = '{%s}polygon' % INKSCAPE_NSMAP['svg']
+INKSCAPE_LABEL = '{%s}label' % INKSCAPE_NSMAP['inkscape']
+
+FLOAT_PATTERN = r'[+-]?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?'
+#: Path vertex commands (same vertices as :data:`svg_model.cre_path_command`).
+CRE_PATH_VERTEX = re.compile(r'[MLZ]\s+(%s),\s*(%s)\s*' % (FLOAT_PATTERN,
+                                                           FLOAT_PATTERN))
+#: Connection path end points (same as
+#: :func:`svg_model.connections.extract_connections`).
+CRE_PATH_ENDS = re.compile(r'^\s*M\s*(?P<start_x>\d+(\.\d+)?),\s*'
+                           r'(?P<start_y>\d+(\.\d+)?).*L\s*'
+                           r'(?P<end_x>\d+(\.\d+)?),\s*'
+                           r'(?P<end_y>\d+(\.\d+)?)\D*$')
+
+
+class VertexBuffer(object):
+    '''
+    Growable ``N x 2`` array of vertex coordinates.
+
+    Storage is preallocated and doubled in size whenever it is full, so
+    appending vertices takes amortised constant time.
+
+    Parameters
+    ----------
+    capacity : int, optional
+        Initial number of vertices allocated.
+    '''
+    def __init__(self, capacity=4096):
+        self._xy = np.empty((max(capacity, 1), 2), dtype=float)
+        self.size = 0
+
+    def extend(self, vertices):
+        '''
+        Parameters
+        ----------
+        vertices : list
+            List of ``(x, y)`` vertex coordinates (numbers or strings).
+
+        Returns
+        -------
+        int
+            Number of vertices added.
+        '''
+        count = len(vertices)
+        if not count:
+            return 0
+        end = self.size + count
+        if end > self._xy.shape[0]:
+            xy = np.empty((max(end, 2 * self._xy.shape[0]), 2), dtype=float)
+            xy[:self.size] = self._xy[:self.size]
+            self._xy = xy
+        self._xy[self.size:end] = vertices
+        self.size = end
+        return count
+
+    @property
+    def xy(self):
+        '''
+        ``N x 2`` array of vertex coordinates added to buffer.
+        '''
+        return self._xy[:self.size]
+
+
+def _in_layer(element, label):
+    return any(group.get(INKSCAPE_LABEL) == label
+               for group in element.iterancestors(SVG_G))
+
+
+def read_device_svg(svg_source, shape_i_column='id', device_layer='Device',
+                    connections_layer='Connections'):
+    '''
+    Read electrode shapes and connections from device SVG file in a single
+    streaming pass.
+
+    Parameters
+    ----------
+    svg_source : str or file-like
+        A file path or file-like object.
+    shape_i_column : str, optional
+        Shape attribute identifying each electrode.
+    device_layer : str, optional
+        Label of layer containing electrode shapes, i.e., ``svg:path`` and
+        ``svg:polygon`` elements anywhere in the layer (see
+        :data:`microdrop.dmf_device.ELECTRODES_XPATH`).
+    connections_layer : str, optional
+        Label of layer containing connection lines, i.e., ``svg:line`` and
+        ``svg:path`` *children* of the layer.
+
+    Returns
+    -------
+    tuple
+        ``(df_shapes, df_shape_connections)``, equivalent to the frames
+        returned by :func:`svg_model.svg_shapes_to_df` and
+        :func:`svg_model.connections.extract_connections`, respectively.
+
+        Connection end points are looked up in an
+        :class:`microdrop.spatial_index.ElectrodeSpatialIndex` (rather than a
+        :class:`svg_model.shapes_canvas.ShapesCanvas`).
+    '''
+    if isinstance(svg_source, basestring):
+        with open(svg_source, 'rb') as input_:
+            return read_device_svg(input_, shape_i_column=shape_i_column,
+                                   device_layer=device_layer,
+                                   connections_layer=connections_layer)
+
+    vertices = VertexBuffer()
+    shape_attributes = []
+    vertex_counts = []
+    # Connection end points of `svg:line` and `svg:path` elements,
+    # respectively.
+    lines = []
+    paths = []
+
+    # Layer membership of the parent of the previous element (siblings are
+    # usually processed consecutively).
+    last_parent = None
+    in_device = in_connections = False
+
+    for event, element in etree.iterparse(svg_source, events=('end', ),
+                                          tag=(SVG_G, SVG_PATH, SVG_POLYGON,
+                                               SVG_LINE)):
+        tag = element.tag
+        parent = element.getparent()
+        if tag != SVG_G:
+            if parent is not last_parent:
+                last_parent = parent
+                in_device = (parent is not None and
+                             (parent.tag == SVG_G and
+                              parent.get(INKSCAPE_LABEL) == device_layer or
+                              _in_layer(parent, device_layer)))
+                in_connections = (parent is not None and
+                                  parent.tag == SVG_G and
+                                  parent.get(INKSCAPE_LABEL) ==
+                                  connections_layer)
+
+            if in_device and tag != SVG_LINE:
+                attributes = dict(element.attrib)
+                if tag == SVG_PATH:
+                    count = vertices.extend(CRE_PATH_VERTEX
+                                            .findall(attributes.pop('d')))
+                else:
+                    count = vertices.extend([vertex_i.split(',')
+                                             for vertex_i in
+                                             attributes.pop('points').strip()
+                                             .split(' ')])
+                attributes.pop('d', None)
+                attributes.pop('points', None)
+                shape_attributes.append(attributes)
+                vertex_counts.append(count)
+
+            if in_connections and tag == SVG_LINE:
+                lines.append([element.get('id')] +
+                             [float(element.attrib[k])
+                              for k in ('x1', 'y1', 'x2', 'y2')])
+            elif in_connections and tag == SVG_PATH:
+                match = CRE_PATH_ENDS.match(element.attrib['d'])
+                if match:
+                    paths.append([element.attrib['id']] +
+                                 map(float, match.group('start_x', 'start_y',
+                                                        'end_x', 'end_y')))
+
+        # Release element and previous siblings (all processed).
+        element.clear()
+        if parent is not None:
+            while element.getprevious() is not None:
+                del parent[0]
+
+    df_shapes = _shapes_frame(shape_attributes, vertex_counts, vertices.xy)
+    # Paths are listed after lines (as in `extract_connections`).
+    return df_shapes, _shape_connections(df_shapes, lines + paths,
+                                         shape_i_column)
+
+
+def _shapes_frame(shape_attributes, vertex_counts, xy):
+    '''
+    Returns
+    -------
+    pandas.DataFrame
+        Frame with one row per vertex, with one column per shape attribute
+        (``id`` first, other attributes sorted by name) followed by the
+        ``vertex_i``, ``x``, and ``y`` columns.
+    '''
+    names = set()
+    for attributes in shape_attributes:
+        names.update(attributes)
+    names.discard('id')
+    columns = ['id'] + sorted(names)
+    if not xy.shape[0]:
+        return pd.DataFrame(None, columns=columns + ['vertex_i', 'x', 'y'])
+
+    counts = np.array(vertex_counts, dtype=int)
+    data = OrderedDict()
+    for name in columns:
+        values = np.empty(len(shape_attributes), dtype=object)
+        values[:] = [attributes.get(name) for attributes in shape_attributes]
+        data[name] = np.repeat(values, counts)
+    data['vertex_i'] = (np.arange(xy.shape[0]) -
+                        np.repeat(np.cumsum(counts) - counts, counts))
+    data['x'] = xy[:, 0]
+    data['y'] = xy[:, 1]
+    return pd.DataFrame(data, columns=data.keys())
+
+
+def _shape_connections(df_shapes, lines, shape_i_column):
+    '''
+    Returns
+    -------
+    pandas.DataFrame
+        Shapes overlapping the end points of each connection line, with the
+        columns ``source``, ``target``, and ``line_id``.  Lines with an end
+        point outside all shapes are dropped.
+    '''
+    if not lines:
+        return pd.DataFrame(None, columns=['source', 'target'])
+
+    df_lines = pd.DataFrame(lines, columns=['id', 'x1', 'y1', 'x2', 'y2'])
+    shape_ids = np.full((len(lines), 2), None, dtype=object)
+    if df_shapes.shape[0]:
+        index = ElectrodeSpatialIndex(df_shapes, shape_i_column)
+        for i, (x, y) in enumerate([('x1', 'y1'), ('x2', 'y2')]):
+            electrode_indexes = index.electrode_indexes_at(df_lines[x].values,
+                                                           df_lines[y].values)
+            found = electrode_indexes >= 0
+            shape_ids[found, i] = index.electrode_ids[electrode_indexes[found]]
+    df_shape_connections = pd.DataFrame(shape_ids,
+                                        columns=['source', 'target'])
+    df_shape_connections['line_id'] = df_lines['id']
+    return df_shape_connections.dropna()
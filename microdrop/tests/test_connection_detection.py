@@ -0,0 +1,56 @@
+from nose.tools import eq_
+import numpy as np
+import pandas as pd
+from svg_model import compute_shape_centers
+from svg_model.connections import extract_adjacent_shapes
+
+from connection_detection import detect_adjacent_shapes
+
+
+def _shapes():
+    '''
+    Returns
+    -------
+    pandas.DataFrame
+        Vertices of a 9x7 grid of squares (one row per vertex), with a few
+        irregular rectangles and shapes listed in random order.
+    '''
+    frames = []
+    for row in xrange(9):
+        for column in xrange(7):
+            x, y = 3 * column, 3 * row
+            width = 2 + (row * 7 + column) % 3 * .5
+            frames.extend([['electrode%03d' % (row * 7 + column), i, x_i, y_i]
+                           for i, (x_i, y_i) in
+                           enumerate([(x, y), (x + width, y),
+                                      (x + width, y + 2), (x, y + 2)])])
+    df_shapes = pd.DataFrame(frames, columns=['id', 'vertex_i', 'x', 'y'])
+    shape_ids = df_shapes.id.unique()
+    np.random.seed(0)
+    return (df_shapes.set_index('id').loc[np.random.permutation(shape_ids)]
+            .reset_index())
+
+
+def test_detect_adjacent_shapes():
+    """
+    test tiled connection detection matches `svg_model`
+    """
+    df_shapes = _shapes()
+    for extend in (.5, 1.5, 4):
+        df_expected = (extract_adjacent_shapes(compute_shape_centers
+                                               (df_shapes, 'id'), 'id',
+                                               extend=extend)
+                       .reset_index(drop=True))
+        for processes in (1, 2):
+            fractions = []
+            df_connections = \
+                detect_adjacent_shapes(df_shapes, 'id', extend=extend,
+                                       shapes_per_tile=8,
+                                       processes=processes,
+                                       progress=fractions.append)
+            eq_(df_connections.values.tolist(),
+                df_expected.values.tolist())
+            # Progress is reported after each tile.
+            assert len(fractions) > 1
+            eq_(fractions, sorted(fractions))
+            eq_(fractions[-1], 1.)
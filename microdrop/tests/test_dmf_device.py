@@ -1,9 +1,17 @@
+import os
+import tempfile
 import time
 
 from path_helpers import path
 from nose.tools import raises, eq_
+import networkx as nx
+import numpy as np
+import pandas as pd
 
-from dmf_device import DmfDevice
+from device_graph import ElectrodeRouter
+from dmf_device import DeviceLRUCache, DmfDevice, extract_channels
+from droplet_planning.connections import get_adjacency_matrix
+from lxml import etree
 from microdrop_utility import Version
 from svg_model.svgload.svg_parser import SvgParser, parse_warning
 from svg_model.path_group import PathGroup
@@ -71,3 +79,323 @@ def test_import_device(root=None):
         root = path(root)
     for i in range(6):
         yield _import_device, i, root
+
+
+def _stock_device_path():
+    return path(__file__).parent.parent.joinpath('devices',
+                                                 'SCI-BOTS 90-pin array.svg')
+
+
+def test_device_cache():
+    """
+    test loading DMF device from parsed-device cache
+    """
+    cache_dir = path(tempfile.mkdtemp(prefix='microdrop-device-cache-'))
+    try:
+        device = DmfDevice.load(_stock_device_path(), cache_dir=cache_dir)
+        eq_(len(cache_dir.files('*.pickle')), 1)
+        cached_device = DmfDevice.load(_stock_device_path(),
+                                       cache_dir=cache_dir)
+        assert cached_device.df_shapes.equals(device.df_shapes)
+        assert cached_device.electrode_areas.equals(device.electrode_areas)
+        assert (cached_device.df_electrode_channels
+                .equals(device.df_electrode_channels))
+    finally:
+        cache_dir.rmtree()
+
+
+def test_channel_map():
+    """
+    test integer-indexed electrode/channel lookup tables
+    """
+    device = DmfDevice.load(_stock_device_path())
+    channel_map = device.channel_map
+    electrode_ids = device.electrodes[:5]
+    electrode_indexes = channel_map.electrode_indexes(electrode_ids)
+    eq_(channel_map.electrode_ids[electrode_indexes].tolist(),
+        electrode_ids.tolist())
+    eq_(device.channels_for(electrode_indexes).tolist(),
+        sorted(device.channels_by_electrode[electrode_ids].unique()))
+
+    state_vector = np.zeros(channel_map.electrode_ids.size)
+    state_vector[electrode_indexes] = 1
+    assert np.isclose(device.area_of(state_vector),
+                      device.electrode_areas[electrode_ids].sum())
+
+    channel_states = np.zeros(device.max_channel() + 1)
+    channel_states[device.channels_for(electrode_indexes)] = 1
+    assert np.isclose(device.actuated_area(channel_states),
+                      device.area_of(state_vector))
+
+
+def test_router():
+    """
+    test precomputed shortest path routing tables
+    """
+    device = DmfDevice.load(_stock_device_path())
+    # Connect first 6 electrodes in a ring.
+    electrode_ids = device.electrodes[:6].tolist()
+    device.set_shape_connections(pd.DataFrame(zip(electrode_ids,
+                                                  electrode_ids[1:] +
+                                                  electrode_ids[:1]),
+                                              columns=['source', 'target']))
+    for source_i in electrode_ids:
+        for target_i in electrode_ids:
+            path_i = device.find_path(source_i, target_i)
+            eq_(len(path_i) - 1, nx.shortest_path_length(device.graph,
+                                                         source_i, target_i))
+            eq_(device.hop_distance(source_i, target_i), len(path_i) - 1)
+            weighted_path_i = device.find_weighted_path(source_i, target_i)
+            eq_(weighted_path_i[::len(weighted_path_i) - 1 or 1],
+                path_i[::len(path_i) - 1 or 1])
+            assert all(device.graph.has_edge(a, b)
+                       for a, b in zip(weighted_path_i, weighted_path_i[1:]))
+    eq_(device.find_weighted_path(electrode_ids[0], electrode_ids[2],
+                                  avoid=set([electrode_ids[1]])),
+        [electrode_ids[0]] + electrode_ids[:1:-1])
+
+    # Routing tables are discarded when connections are updated.
+    device.set_shape_connections(device.df_shape_connections.iloc[:-1])
+    eq_(device.hop_distance(electrode_ids[0], electrode_ids[-1]), 5)
+
+
+def test_lazy_connection_attributes():
+    """
+    test attributes derived from connections are computed on first access
+    """
+    device = DmfDevice.load(_stock_device_path())
+    eq_(getattr(device, '_connection_cache', {}), {})
+
+    electrode_ids = device.electrodes[:3].tolist()
+    device.set_shape_connections(pd.DataFrame([electrode_ids[:2],
+                                               electrode_ids[1:]],
+                                              columns=['source', 'target']))
+    graph = device.graph
+    assert device.graph is graph
+    eq_(sorted(device._connection_cache), ['graph'])
+    eq_(device.adjacency_matrix.sum(), 4)
+    eq_(device.shape_indexes[electrode_ids].tolist(), range(3))
+    eq_(device.df_shape_connections_indexed.source.tolist(), ['0', '1'])
+
+    # Derived attributes are discarded when connections are updated.
+    device.set_shape_connections(device.df_shape_connections.iloc[:1])
+    eq_(getattr(device, '_connection_cache'), {})
+    eq_(device.graph.number_of_edges(), 1)
+    eq_(device.adjacency_matrix.shape, (2, 2))
+
+
+def test_adjacency():
+    """
+    test sparse electrode adjacency helpers
+    """
+    device = DmfDevice.load(_stock_device_path())
+    electrode_ids = device.electrodes[:6].tolist()
+    # Path of 4 electrodes, and a separate pair of electrodes.
+    connections = zip(electrode_ids[:3], electrode_ids[1:4]) + \
+        [tuple(electrode_ids[4:])] * 2
+    device.set_shape_connections(pd.DataFrame(connections,
+                                              columns=['source', 'target']))
+    adjacency = device.adjacency
+    eq_(adjacency.neighbours(electrode_ids[1]), [electrode_ids[0],
+                                                 electrode_ids[2]])
+    eq_(adjacency.degree(electrode_ids[0]), 1)
+    eq_(adjacency.degree(device.electrodes[10]), 0)
+    eq_(adjacency.neighbours(device.electrodes[10]), [])
+    eq_(adjacency.bfs(electrode_ids[0]).to_dict(),
+        dict(zip(electrode_ids[:4], range(4))))
+    eq_(adjacency.bfs(electrode_ids[0], max_depth=1).index.tolist(),
+        electrode_ids[:2])
+    eq_(adjacency.connected_components(), [electrode_ids[:4],
+                                           electrode_ids[4:]])
+
+    # Dense representations are derived from sparse adjacency.
+    adjacency_matrix, indexed_shapes, shape_indexes = \
+        get_adjacency_matrix(device.df_shape_connections)
+    eq_(device.adjacency_matrix.tolist(), adjacency_matrix.tolist())
+    assert device.indexed_shapes.equals(indexed_shapes)
+    assert device.shape_indexes.equals(shape_indexes)
+
+    # Routing without all-pairs tables.
+    router = ElectrodeRouter.from_adjacency(adjacency,
+                                            device.df_shape_centers)
+    router.max_table_size = 0
+    assert not router.use_tables
+    eq_(router.path(electrode_ids[3], electrode_ids[0]),
+        electrode_ids[3::-1])
+    eq_(router.hop_distance(electrode_ids[0], electrode_ids[4]), -1)
+    assert router._hop_distances is None
+
+
+def test_router_high_density():
+    """
+    test routing on a high-density array does not compute all-pairs tables
+    """
+    shape = 40, 40
+    electrode_ids = np.array(['electrode%04d' % i
+                              for i in xrange(shape[0] * shape[1])],
+                             dtype=object).reshape(shape)
+    connections = ([(electrode_ids[i, j], electrode_ids[i, j + 1])
+                    for i in xrange(shape[0]) for j in xrange(shape[1] - 1)] +
+                   [(electrode_ids[i, j], electrode_ids[i + 1, j])
+                    for i in xrange(shape[0] - 1) for j in xrange(shape[1])])
+    df_shape_connections = pd.DataFrame(connections,
+                                        columns=['source', 'target'])
+    y, x = np.mgrid[:shape[0], :shape[1]]
+    df_shape_centers = pd.DataFrame({'x_center': x.ravel(),
+                                     'y_center': y.ravel()},
+                                    index=electrode_ids.ravel())
+
+    router = ElectrodeRouter.from_connections(df_shape_connections,
+                                              df_shape_centers)
+    assert not router.use_tables
+    route = router.path(electrode_ids[0, 0], electrode_ids[-1, -1])
+    eq_(len(route), sum(shape) - 1)
+    eq_(router.hop_distance(electrode_ids[0, 0], electrode_ids[-1, -1]),
+        sum(shape) - 2)
+    assert router._hop_distances is None
+
+
+def test_set_electrode_channels_many():
+    """
+    test incremental electrode channel mapping updates
+    """
+    device = DmfDevice.load(_stock_device_path())
+    electrode_ids = device.electrodes[:3].tolist()
+    original = [device.get_channels(electrode_id)
+                for electrode_id in electrode_ids]
+    eq_(device.diff_electrode_channels().shape[0], 0)
+
+    changed = device.set_electrode_channels_many({electrode_ids[0]: [200],
+                                                  electrode_ids[1]: [],
+                                                  electrode_ids[2]:
+                                                  original[2]})
+    eq_(changed, set(electrode_ids[:2]))
+    eq_(device.modified_electrodes, set(electrode_ids[:2]))
+    assert device.dirty
+    eq_(device.get_channels(electrode_ids[0]), [200])
+    eq_(device.channels_by_electrode[electrode_ids[0]], 200)
+    assert (electrode_ids[1] not in
+            device.df_electrode_channels.electrode_id.values)
+    eq_(device.channel_map.channels_for(device.channel_map.electrode_indexes
+                                        (electrode_ids[:2])).tolist(), [200])
+
+    df_diff = device.diff_electrode_channels()
+    eq_(df_diff.loc[electrode_ids[0]].tolist(), [original[0], [200]])
+    eq_(df_diff.loc[electrode_ids[1]].tolist(), [original[1], []])
+
+    # Restore original channels.
+    device.set_electrode_channels_many(zip(electrode_ids[:2], original[:2]))
+    eq_(device.modified_electrodes, set())
+    eq_(device.diff_electrode_channels().shape[0], 0)
+
+
+def test_to_svg():
+    """
+    test incremental SVG export of electrode channel mappings
+    """
+    device = DmfDevice.load(_stock_device_path())
+    electrode_id = device.electrodes[0]
+    original_channels = device.get_channels(electrode_id)
+    original_svg = device.to_svg()
+    # Output is reused until channel mappings are modified.
+    assert device.to_svg() is original_svg
+
+    def _svg_channels(svg_source):
+        root = etree.fromstring(svg_source.encode('utf8'))
+        return root.xpath('//*[@id="%s"]' % electrode_id)[0].get('data-'
+                                                                 'channels')
+
+    device.set_electrode_channels(electrode_id, [200, 201])
+    eq_(_svg_channels(device.to_svg()), '200,201')
+    device.set_electrode_channels(electrode_id, [])
+    eq_(_svg_channels(device.to_svg()), '')
+    eq_(extract_channels(pd.DataFrame({'id': [electrode_id],
+                                       'data-channels': ['']})).shape[0], 0)
+
+    # Reverting channels restores original SVG source.
+    device.set_electrode_channels(electrode_id, original_channels)
+    eq_(device.to_svg(), original_svg)
+
+
+def test_batch_actuated_areas():
+    """
+    test actuated areas, channel counts, and collisions for multiple steps
+    """
+    device = DmfDevice.load(_stock_device_path())
+    electrode_ids = device.channel_map.electrode_ids[:4].tolist()
+    # Map first two electrodes to a shared channel.
+    device.set_electrode_channels_many({electrode_ids[0]: [200],
+                                        electrode_ids[1]: [200]})
+    steps = [pd.Series(1, index=electrode_ids[:1]), None,
+             pd.Series([1, 0, 1], index=electrode_ids[1:]),
+             pd.Series(1, index=electrode_ids[:2] + ['unknown'])]
+    state_matrix = device.electrode_state_matrix(steps)
+    eq_(state_matrix.shape, (4, device.channel_map.electrode_ids.size))
+
+    areas = device.areas_of(state_matrix)
+    for area_i, states_i in zip(areas, steps):
+        assert np.isclose(area_i, 0 if states_i is None else
+                          device.get_actuated_electrodes_area(states_i))
+
+    channel_matrix = device.channel_map.channel_state_matrix(state_matrix)
+    dense_channels = channel_matrix.toarray()
+    assert np.allclose(device.actuated_areas(dense_channels),
+                       [device.actuated_area(channels_i)
+                        for channels_i in dense_channels])
+    eq_(device.channel_counts(state_matrix).tolist(),
+        dense_channels.sum(axis=1).tolist())
+
+    df_collisions = device.channel_collisions(state_matrix)
+    eq_(df_collisions[['step', 'channel']].values.tolist(),
+        [[0, 200], [2, 200], [3, 200]])
+    eq_(df_collisions.unrequested.tolist(),
+        [[electrode_ids[1]], [electrode_ids[0]], []])
+
+
+def test_device_lru_cache():
+    """
+    test in-memory cache of recently used devices
+    """
+    temp_dir = path(tempfile.mkdtemp(prefix='microdrop-device-lru-'))
+    try:
+        svg_path = temp_dir.joinpath('device.svg')
+        path(_stock_device_path()).copy(svg_path)
+        cache = DeviceLRUCache(max_size=1)
+        device = DmfDevice.load(svg_path)
+        assert cache.put(device)
+
+        cached_device = cache.get(svg_path)
+        assert cached_device is not device
+        assert cached_device.df_shapes is device.df_shapes
+        # Channel mappings of cached device are independent.
+        electrode_id = device.electrodes[0]
+        cached_device.set_electrode_channels(electrode_id, [200])
+        eq_(cache.get(svg_path).get_channels(electrode_id),
+            device.get_channels(electrode_id))
+        eq_(device._svg_pending, set())
+        # Devices with unsaved channel mappings are not cached.
+        assert not cache.put(cached_device)
+
+        # Saved device is equivalent to device loaded from saved file.
+        saved_path = temp_dir.joinpath('saved.svg')
+        with saved_path.open('wb') as output:
+            output.write(cached_device.to_svg().encode('utf8'))
+        assert cache.put(cached_device.saved_as(saved_path))
+        saved_device = cache.get(saved_path)
+        eq_(saved_device.modified_electrodes, set())
+        eq_(saved_device.to_svg(), DmfDevice.load(saved_path).to_svg())
+        eq_(saved_device.get_electrode_channels()
+            .sort_values(['electrode_id', 'channel']).values.tolist(),
+            DmfDevice.load(saved_path).df_electrode_channels
+            .sort_values(['electrode_id', 'channel']).values.tolist())
+
+        # Least recently used device was evicted.
+        eq_(len(cache), 1)
+        assert cache.get(svg_path) is None
+
+        # Modified SVG file is not loaded from cache.
+        mtime = saved_path.getmtime()
+        os.utime(saved_path, (mtime + 10, mtime + 10))
+        assert cache.get(saved_path) is None
+    finally:
+        temp_dir.rmtree()
@@ -0,0 +1,120 @@
+from nose.tools import eq_, ok_
+from pyutilib.component.core import Plugin, PluginGlobals, implements
+import pandas as pd
+import trollius as asyncio
+
+import microdrop.headless as headless
+from microdrop.app_context import get_app, is_headless
+from microdrop.core_plugins.electrode_controller_plugin.execute import \
+    NAME, execute
+from microdrop.core_plugins.simulator_plugin import SimulatorPlugin
+from microdrop.interfaces import IPlugin
+import microdrop.plugin_manager as pm
+
+
+PluginGlobals.push_env('microdrop.managed')
+
+
+class StepPlugin(Plugin):
+    implements(IPlugin)
+
+    def __init__(self, name, calls):
+        self.name = name
+        self.calls = calls
+
+    @asyncio.coroutine
+    def on_step_run(self, plugin_kwargs, signals):
+        self.calls.append((plugin_kwargs['step'], get_app().running))
+        yield asyncio.From(asyncio.sleep(.01))
+
+
+class ActuationPlugin(Plugin):
+    implements(IPlugin)
+
+    def __init__(self, events):
+        self.name = NAME
+        self.events = events
+
+    @asyncio.coroutine
+    def on_step_run(self, plugin_kwargs, signals):
+        i = plugin_kwargs['step']
+        self.events.append(('run', i))
+
+        @asyncio.coroutine
+        def on_actuation_completed(sender, **kwargs):
+            self.events.append(('completed', i))
+
+        signals.signal('actuation-completed')\
+            .connect(on_actuation_completed, weak=False)
+        plugin_kwargs[NAME]['dynamic'] = False
+        result = yield asyncio.From(execute(plugin_kwargs, signals))
+        raise asyncio.Return(result)
+
+
+PluginGlobals.pop_env()
+
+
+class DummyProtocol(object):
+    n_repeats = 1
+
+    def __init__(self, steps):
+        self.steps = steps
+
+    def to_dict(self):
+        return {'steps': self.steps}
+
+
+def test_run_protocol():
+    """
+    test headless protocol run executes each step and records step timings
+    """
+    ok_(is_headless())
+    ok_(isinstance(get_app(), headless.HeadlessApp))
+
+    calls = []
+    plugin = StepPlugin('microdrop.test_step_plugin', calls)
+    try:
+        protocol = DummyProtocol([{'step': i} for i in xrange(3)])
+        timings = headless.run(protocol, repeats=2)
+        eq_(calls, [(i, True) for i in xrange(3)] * 2)
+        eq_([(t.repeat, t.step) for t in timings],
+            [(repeat, step) for repeat in xrange(2) for step in xrange(3)])
+        ok_(all(t.duration >= .01 for t in timings))
+        ok_(all(a.start < b.start for a, b in zip(timings, timings[1:])))
+        ok_(not get_app().running)
+
+        table = headless.format_timings(timings)
+        eq_(len(table.splitlines()), 13)
+        ok_('Steps/s' in table)
+    finally:
+        plugin.deactivate()
+
+
+def test_run_protocol_pipeline():
+    """
+    test pipelined protocol run starts each step during the previous step and
+    reports gap between actuations of consecutive steps
+    """
+    simulator = pm.get_service_instance(SimulatorPlugin, env='microdrop')
+    simulator.set_app_values(dict(simulator.get_default_app_options(),
+                                  latency_s=0.))
+    simulator.reset()
+
+    events = []
+    plugin = ActuationPlugin(events)
+    try:
+        steps = [{'step': i,
+                  NAME: {'Voltage (V)': 100, 'Frequency (Hz)': 10e3,
+                         'Duration (s)': .02,
+                         'electrode_states':
+                         pd.Series([1], index=['electrode%03d' % i])}}
+                 for i in xrange(3)]
+        timings = headless.run(DummyProtocol(steps), pipeline=True)
+        eq_(simulator.actuations, [['electrode%03d' % i] for i in xrange(3)])
+        # Each step is started before the previous step completes.
+        ok_(all(events.index(('run', i + 1)) < events.index(('completed', i))
+                for i in xrange(2)))
+        eq_(timings[0].gap, None)
+        ok_(all(t.gap is not None and t.gap >= 0 for t in timings[1:]))
+    finally:
+        plugin.deactivate()
@@ -0,0 +1,459 @@
+import shutil
+import sys
+import tempfile
+import threading
+
+from nose.tools import eq_, ok_
+from pyutilib.component.core import Plugin, PluginGlobals, implements
+import path_helpers as ph
+
+from microdrop.interfaces import IPlugin
+import microdrop.plugin_manager as pm
+
+
+PluginGlobals.push_env('microdrop.managed')
+
+
+class SignalPlugin(Plugin):
+    implements(IPlugin)
+
+    def __init__(self, name, calls):
+        self.name = name
+        self.calls = calls
+
+    def get_schedule_requests(self, function_name):
+        if self.name == 'microdrop.test_signal_a':
+            # Call plugin `b` first.
+            return [pm.ScheduleRequest('microdrop.test_signal_b', self.name)]
+        return []
+
+    def on_test_signal(self, value):
+        self.calls.append(self.name)
+        return value
+
+    def on_test_step_changed(self, plugin, step_number):
+        self.calls.append(('step', plugin, step_number))
+        # Cascade (like `ProtocolController.on_step_options_changed()`).
+        pm.emit_signal('on_test_protocol_changed')
+
+    def on_test_protocol_changed(self):
+        self.calls.append('protocol')
+
+    def on_test_concurrent_signal(self, started):
+        started[self.name].set()
+        self.calls.append((self.name, threading.current_thread()))
+        if self.name == 'microdrop.test_signal_a':
+            # Plugin `b` is scheduled first.
+            return started['microdrop.test_signal_b'].is_set()
+        elif self.name == 'microdrop.test_signal_b':
+            # Only `True` if plugin `c` is called concurrently.
+            return started['microdrop.test_signal_c'].wait(5)
+
+
+PluginGlobals.pop_env()
+
+
+def test_dispatch_tables():
+    """
+    test cached signal dispatch tables follow enabled plugins
+    """
+    calls = []
+    plugins = [SignalPlugin('microdrop.test_signal_%s' % name, calls)
+               for name in 'ab']
+    try:
+        table = pm.get_dispatch_table('on_test_signal')
+        ok_(pm.get_dispatch_table('on_test_signal') is table)
+        eq_([name for name, observer, callback in table],
+            ['microdrop.test_signal_b', 'microdrop.test_signal_a'])
+
+        eq_(pm.emit_signal('on_test_signal', 1),
+            {'microdrop.test_signal_a': 1, 'microdrop.test_signal_b': 1})
+        eq_(calls, ['microdrop.test_signal_b', 'microdrop.test_signal_a'])
+
+        # Disabling a plugin invalidates cached tables.
+        pm.disable('microdrop.test_signal_b')
+        ok_(pm.get_dispatch_table('on_test_signal') is not table)
+        eq_(pm.emit_signal('on_test_signal', [2]),
+            {'microdrop.test_signal_a': 2})
+
+        pm.enable('microdrop.test_signal_b')
+        eq_(sorted(pm.emit_signal('on_test_signal', [3])),
+            ['microdrop.test_signal_a', 'microdrop.test_signal_b'])
+    finally:
+        for plugin_i in plugins:
+            plugin_i.deactivate()
+
+
+def test_dispatch_tables_registration():
+    """
+    test cached signal dispatch tables follow created and deactivated plugins
+    """
+    calls = []
+    plugins = [SignalPlugin('microdrop.test_signal_a', calls)]
+    try:
+        eq_(pm.emit_signal('on_test_signal', 1),
+            {'microdrop.test_signal_a': 1})
+
+        # Plugin created after table was cached.
+        plugins.append(SignalPlugin('microdrop.test_signal_b', calls))
+        eq_(pm.emit_signal('on_test_signal', 2),
+            {'microdrop.test_signal_a': 2, 'microdrop.test_signal_b': 2})
+        eq_([name for name, observer, callback in
+             pm.get_dispatch_table('on_test_signal')],
+            ['microdrop.test_signal_b', 'microdrop.test_signal_a'])
+        eq_([[name for name, observer, callback in level] for level in
+             pm.get_dispatch_levels('on_test_signal')],
+            [['microdrop.test_signal_b'], ['microdrop.test_signal_a']])
+
+        # Deactivated plugin is no longer called.
+        plugins.pop().deactivate()
+        del calls[:]
+        eq_(pm.emit_signal('on_test_signal', 3),
+            {'microdrop.test_signal_a': 3})
+        eq_(calls, ['microdrop.test_signal_a'])
+        eq_([[name for name, observer, callback in level] for level in
+             pm.get_dispatch_levels('on_test_signal')],
+            [['microdrop.test_signal_a']])
+    finally:
+        for plugin_i in plugins:
+            plugin_i.deactivate()
+
+
+def test_concurrent_dispatch():
+    """
+    test concurrent signal dispatch follows schedule request levels
+    """
+    calls = []
+    plugins = [SignalPlugin('microdrop.test_signal_%s' % name, calls)
+               for name in 'abc']
+    # Plugin `c` must be called in thread emitting the signal.
+    plugins[-1].gtk_thread_only = True
+    try:
+        levels = pm.get_dispatch_levels('on_test_concurrent_signal')
+        eq_([sorted(name for name, observer, callback in level)
+             for level in levels],
+            [['microdrop.test_signal_b', 'microdrop.test_signal_c'],
+             ['microdrop.test_signal_a']])
+
+        started = dict((plugin_i.name, threading.Event())
+                       for plugin_i in plugins)
+        eq_(pm.emit_signal('on_test_concurrent_signal', [started],
+                           concurrent=True),
+            {'microdrop.test_signal_a': True, 'microdrop.test_signal_b': True,
+             'microdrop.test_signal_c': None})
+        threads = dict(calls)
+        ok_(threads['microdrop.test_signal_b'] is not
+            threading.current_thread())
+        ok_(threads['microdrop.test_signal_c'] is threading.current_thread())
+    finally:
+        for plugin_i in plugins:
+            plugin_i.deactivate()
+
+
+LAZY_PLUGIN_TEMPLATE = '''
+from pyutilib.component.core import Plugin, PluginGlobals, implements
+
+from microdrop.interfaces import IPlugin
+
+
+PluginGlobals.push_env('microdrop.managed')
+
+
+class %(class_name)s(Plugin):
+    implements(IPlugin)
+    version = '1.0'
+
+    def __init__(self):
+        self.name = 'microdrop.%(package_name)s'
+
+    def on_test_lazy_signal(self):
+        return self.name
+
+
+PluginGlobals.pop_env()
+'''
+
+
+def _write_plugin(plugins_dir, package_name, class_name, manifest=True,
+                  out_of_process=False):
+    plugin_dir = plugins_dir.joinpath(package_name)
+    plugin_dir.makedirs_p()
+    plugin_dir.joinpath('__init__.py').write_bytes(LAZY_PLUGIN_TEMPLATE %
+                                                   locals())
+    if manifest:
+        plugin_dir.joinpath('properties.yml').write_bytes(
+            'package_name: %s\nplugin_name: microdrop.%s\nversion: 1.0\n'
+            'interfaces: [IPlugin]\nsignals: [on_test_lazy_signal]\n'
+            'out_of_process: %s\n' % (package_name, package_name,
+                                       'true' if out_of_process else 'false'))
+
+
+def test_lazy_plugin_import():
+    """
+    test plugins declaring interfaces in manifest are imported when enabled
+    """
+    plugins_dir = ph.path(tempfile.mkdtemp(prefix='microdrop-plugins-'))
+    _write_plugin(plugins_dir, 'lazy_plugin_a', 'LazyPluginA')
+    _write_plugin(plugins_dir, 'lazy_plugin_b', 'LazyPluginB')
+    _write_plugin(plugins_dir, 'legacy_plugin_c', 'LegacyPluginC',
+                  manifest=False)
+    plugins = []
+    try:
+        plugins = pm.load_plugins(plugins_dir, import_from_parent=False,
+                                  enabled=['lazy_plugin_b'])
+        eq_(sorted(p.name for p in plugins),
+            ['microdrop.lazy_plugin_a', 'microdrop.lazy_plugin_b',
+             'microdrop.legacy_plugin_c'])
+        # Only enabled plugin and plugin without manifest are imported.
+        ok_('lazy_plugin_a' not in sys.modules)
+        ok_('lazy_plugin_b' in sys.modules)
+        ok_('legacy_plugin_c' in sys.modules)
+
+        proxy = pm.get_service_instance_by_name('microdrop.lazy_plugin_a')
+        ok_(isinstance(proxy, pm.PluginProxy))
+        eq_(proxy.version, 1.0)
+        ok_(not hasattr(proxy, 'on_other_signal'))
+        ok_('lazy_plugin_a' not in sys.modules)
+
+        pm.enable('microdrop.lazy_plugin_b')
+        eq_(pm.emit_signal('on_test_lazy_signal'),
+            {'microdrop.lazy_plugin_b': 'microdrop.lazy_plugin_b'})
+
+        # Enabling plugin imports plugin and replaces proxy.
+        pm.enable('microdrop.lazy_plugin_a')
+        ok_('lazy_plugin_a' in sys.modules)
+        service = pm.get_service_instance_by_name('microdrop.lazy_plugin_a')
+        ok_(service is proxy.service)
+        ok_(not proxy.enabled() and service.enabled())
+        eq_(sorted(pm.emit_signal('on_test_lazy_signal')),
+            ['microdrop.lazy_plugin_a', 'microdrop.lazy_plugin_b'])
+        plugins.append(service)
+    finally:
+        for plugin_i in plugins:
+            plugin_i.deactivate()
+        sys.path.remove(plugins_dir)
+        shutil.rmtree(plugins_dir)
+
+
+def test_out_of_process_plugin():
+    """
+    test plugins marked `out_of_process` are proxied and never imported
+    """
+    from microdrop.plugin_host import PluginHostProxy
+
+    plugins_dir = ph.path(tempfile.mkdtemp(prefix='microdrop-plugins-'))
+    _write_plugin(plugins_dir, 'hosted_plugin_a', 'HostedPluginA',
+                  out_of_process=True)
+    plugins = []
+    try:
+        # Hosted plugins are not imported, even if enabled.
+        plugins = pm.load_plugins(plugins_dir, import_from_parent=False,
+                                  enabled=['hosted_plugin_a'])
+        eq_(len(plugins), 1)
+        proxy = plugins[0]
+        ok_(isinstance(proxy, PluginHostProxy))
+        ok_(proxy.load() is proxy)
+        ok_(hasattr(proxy, 'on_test_lazy_signal'))
+        ok_(not hasattr(proxy, 'on_other_signal'))
+        ok_('hosted_plugin_a' not in sys.modules)
+
+        # Declared signals are dispatched to proxy, but fail until host
+        # process is started by `on_plugin_enable()`.
+        proxy.enable()
+        eq_([name for name, observer, callback in
+             pm.get_dispatch_table('on_test_lazy_signal')],
+            ['microdrop.hosted_plugin_a'])
+        ok_(not pm.emit_signal('on_test_lazy_signal'))
+    finally:
+        for plugin_i in plugins:
+            plugin_i.deactivate()
+        sys.path.remove(plugins_dir)
+        shutil.rmtree(plugins_dir)
+
+
+HOSTED_STEP_PLUGIN = '''
+import time
+
+from pyutilib.component.core import Plugin, PluginGlobals, implements
+import trollius as asyncio
+
+from microdrop.interfaces import IPlugin
+
+
+PluginGlobals.push_env('microdrop.managed')
+
+
+class HostedStepPlugin(Plugin):
+    implements(IPlugin)
+    version = '1.0'
+
+    def __init__(self):
+        self.name = 'microdrop.hosted_step_plugin'
+        self.connected = False
+
+    @asyncio.coroutine
+    def on_step_run(self, plugin_kwargs, signals):
+        # Wait for `signals-connected`, as required by `IPlugin`.
+        event = asyncio.Event()
+        signals.signal('signals-connected').connect(lambda *args:
+                                                    event.set(), weak=False)
+        yield asyncio.From(event.wait())
+        self.connected = True
+        raise asyncio.Return(plugin_kwargs['value'] * 2)
+
+    def get_connected(self):
+        return self.connected
+
+
+PluginGlobals.pop_env()
+'''
+
+
+def test_hosted_step():
+    """
+    test hosted plugin step waits for `signals-connected` while host serves
+    queries
+    """
+    from multiprocessing import Process
+    import socket
+
+    from zmq_plugin.bin.hub import run_hub
+    from zmq_plugin.hub import Hub
+    import blinker
+    import trollius as asyncio
+
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    hub_uri = 'tcp://127.0.0.1:%d' % port
+    hub_process = Process(target=run_hub, args=(Hub(hub_uri, 'test_hub'), ))
+    hub_process.daemon = True
+    hub_process.start()
+
+    plugins_dir = ph.path(tempfile.mkdtemp(prefix='microdrop-plugins-'))
+    plugin_dir = plugins_dir.joinpath('hosted_step_plugin')
+    plugin_dir.makedirs_p()
+    plugin_dir.joinpath('__init__.py').write_bytes(HOSTED_STEP_PLUGIN)
+    plugin_dir.joinpath('properties.yml').write_bytes(
+        'package_name: hosted_step_plugin\n'
+        'plugin_name: microdrop.hosted_step_plugin\nversion: 1.0\n'
+        'interfaces: [IPlugin]\nsignals: [on_step_run, get_connected]\n'
+        'out_of_process: true\n')
+    plugins = []
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        plugins = pm.load_plugins(plugins_dir, import_from_parent=False,
+                                  enabled=['hosted_step_plugin'])
+        proxy = plugins[0]
+        proxy.start(hub_uri)
+
+        @asyncio.coroutine
+        def _step():
+            signals = blinker.Namespace()
+            step = proxy.on_step_run({'value': 21}, signals)
+            yield asyncio.From(asyncio.sleep(.1))
+            # Host serves queries while step waits for `signals-connected`.
+            ok_(not proxy.get_connected())
+            ok_(not step.done())
+            signals.signal('signals-connected').send(None)
+            result = yield asyncio.From(asyncio.wait_for(step, 10))
+            raise asyncio.Return(result)
+
+        eq_(loop.run_until_complete(_step()), 42)
+        ok_(proxy.get_connected())
+
+        # Pending step fails if worker process exits.
+        step = proxy.on_step_run({'value': 1}, blinker.Namespace())
+        proxy.process.terminate()
+        try:
+            loop.run_until_complete(asyncio.wait_for(step, 10))
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError('Step did not fail.')
+        try:
+            proxy.on_step_run({'value': 1}, blinker.Namespace())
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError('Signal forwarded to exited worker.')
+    finally:
+        loop.close()
+        asyncio.set_event_loop(None)
+        for plugin_i in plugins:
+            plugin_i.cleanup()
+            plugin_i.deactivate()
+        sys.path.remove(plugins_dir)
+        shutil.rmtree(plugins_dir)
+        hub_process.terminate()
+
+
+def test_hosted_start_error():
+    """
+    test hosted plugin is not enabled if worker process fails to start
+    """
+    plugins_dir = ph.path(tempfile.mkdtemp(prefix='microdrop-plugins-'))
+    plugin_dir = plugins_dir.joinpath('hosted_error_plugin')
+    plugin_dir.makedirs_p()
+    plugin_dir.joinpath('__init__.py').write_bytes('raise ImportError()\n')
+    plugin_dir.joinpath('properties.yml').write_bytes(
+        'package_name: hosted_error_plugin\n'
+        'plugin_name: microdrop.hosted_error_plugin\nversion: 1.0\n'
+        'interfaces: [IPlugin]\nsignals: [on_step_run]\n'
+        'out_of_process: true\n')
+    plugins = []
+    try:
+        plugins = pm.load_plugins(plugins_dir, import_from_parent=False)
+        proxy = plugins[0]
+        try:
+            proxy.start('tcp://127.0.0.1:1')
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError('Worker process did not fail to start.')
+        ok_(proxy.process is None)
+        ok_(proxy.client is None)
+    finally:
+        for plugin_i in plugins:
+            plugin_i.cleanup()
+            plugin_i.deactivate()
+        sys.path.remove(plugins_dir)
+        shutil.rmtree(plugins_dir)
+
+
+def test_coalesce_signals():
+    """
+    test coalesced signals are delivered once per key and flush
+    """
+    calls = []
+    plugin = SignalPlugin('microdrop.test_signal_c', calls)
+    scheduled = []
+    try:
+        pm.coalesce_signal('on_test_step_changed', key=tuple)
+        pm.coalesce_signal('on_test_protocol_changed')
+        pm.set_coalesce_scheduler(scheduled.append)
+
+        for step_number in (0, 1, 0, 1, 2, 0):
+            eq_(pm.emit_signal('on_test_step_changed', ['plugin_a',
+                                                        step_number]), {})
+        pm.emit_signal('on_test_protocol_changed')
+        eq_(calls, [])
+        # Flush is only scheduled once until flushed.
+        eq_(scheduled, [pm.flush_coalesced_signals])
+
+        # Cascaded signals are merged into the same flush.
+        ok_(scheduled.pop()() is False)
+        eq_(calls, [('step', 'plugin_a', 0), ('step', 'plugin_a', 1),
+                    ('step', 'plugin_a', 2), 'protocol'])
+
+        # Signals may still be delivered immediately.
+        eq_(pm.emit_signal('on_test_protocol_changed', coalesce=False),
+            {'microdrop.test_signal_c': None})
+        eq_(scheduled, [])
+    finally:
+        pm.set_coalesce_scheduler(None)
+        pm._coalesce_rules.pop('on_test_step_changed', None)
+        pm._coalesce_rules.pop('on_test_protocol_changed', None)
+        plugin.deactivate()
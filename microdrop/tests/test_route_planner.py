@@ -0,0 +1,75 @@
+import itertools as it
+
+from path_helpers import path
+from nose.tools import raises, eq_
+import pandas as pd
+
+from dmf_device import DmfDevice
+from route_planner import (RoutePlanner, RoutePlanningError,
+                           electrode_state_steps)
+
+
+def _grid_device(rows=9, columns=10):
+    '''
+    Returns
+    -------
+    tuple
+        ``(device, grid)``, where ``device`` is the stock device with
+        electrodes connected in a ``rows x columns`` grid, and ``grid`` is
+        a list of electrode identifiers for each grid row.
+    '''
+    device = DmfDevice.load(path(__file__).parent.parent
+                            .joinpath('devices', 'SCI-BOTS 90-pin array.svg'))
+    electrode_ids = device.electrodes[:rows * columns].tolist()
+    grid = [electrode_ids[i * columns:(i + 1) * columns]
+            for i in xrange(rows)]
+    connections = ([(row[j], row[j + 1]) for row in grid
+                    for j in xrange(columns - 1)] +
+                   [(grid[i][j], grid[i + 1][j]) for i in xrange(rows - 1)
+                    for j in xrange(columns)])
+    device.set_shape_connections(pd.DataFrame(connections,
+                                              columns=['source', 'target']))
+    return device, grid
+
+
+def _check_paths(planner, routes, paths):
+    router = planner.router
+    eq_(len(set(map(len, paths))), 1)
+    for (source_i, target_i), path_i in zip(routes, paths):
+        eq_((path_i[0], path_i[-1]), (source_i, target_i))
+        for a, b in zip(path_i, path_i[1:]):
+            assert router.hop_distance(a, b) in (0, 1)
+    # Droplets must be kept apart, both at the same time step and at
+    # adjacent time steps.
+    for path_i, path_j in it.combinations(paths, 2):
+        for t in xrange(len(path_i)):
+            for a, b in ((path_i[t], path_j[t]),
+                         (path_i[t], path_j[max(t - 1, 0)]),
+                         (path_i[max(t - 1, 0)], path_j[t])):
+                assert router.hop_distance(a, b) > planner.spacing
+
+
+def test_plan_swap():
+    """
+    test planning routes for droplets swapping positions
+    """
+    device, grid = _grid_device()
+    planner = RoutePlanner(device)
+    routes = [(grid[4][0], grid[4][9]), (grid[4][9], grid[4][0]),
+              (grid[0][0], grid[8][9]), (grid[8][0], grid[0][9])]
+    paths = planner.plan(routes)
+    _check_paths(planner, routes, paths)
+
+    steps = electrode_state_steps(paths)
+    eq_(len(steps), len(paths[0]))
+    eq_(sorted(steps[-1].index), sorted(target for source, target in routes))
+
+
+@raises(RoutePlanningError)
+def test_plan_too_close():
+    """
+    test planning routes for droplets with neighbouring targets
+    """
+    device, grid = _grid_device()
+    RoutePlanner(device).plan([(grid[0][0], grid[4][4]),
+                               (grid[8][9], grid[4][5])])
@@ -0,0 +1,66 @@
+import time
+
+from nose.tools import eq_, ok_, raises
+import blinker
+import pandas as pd
+import trollius as asyncio
+
+import microdrop.headless
+from microdrop.core_plugins.electrode_controller_plugin.execute import \
+    execute_actuation
+from microdrop.core_plugins.simulator_plugin import (SimulatedFailure,
+                                                     SimulatorPlugin)
+import microdrop.plugin_manager as pm
+
+
+def _simulator(**kwargs):
+    simulator = pm.get_service_instance(SimulatorPlugin, env='microdrop')
+    app_values = simulator.get_default_app_options()
+    app_values.update(kwargs)
+    simulator.set_app_values(app_values)
+    simulator.reset()
+    return simulator
+
+
+def _run(coroutine):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+        asyncio.set_event_loop(None)
+
+
+def test_simulated_actuation():
+    """
+    test simulator answers waveform and actuation requests of a step
+    """
+    simulator = _simulator(latency_s=.01, jitter_s=.005, seed=0)
+    signals = blinker.Namespace()
+
+    @asyncio.coroutine
+    def _execute():
+        simulator.on_protocol_signals(signals)
+        states = pd.Series([1, 0, 1], index=['electrode000', 'electrode001',
+                                             'electrode002'])
+        result = yield asyncio.From(execute_actuation(signals, states,
+                                                      pd.Series(), 100, 10e3,
+                                                      .05))
+        raise asyncio.Return(result)
+
+    start = time.time()
+    result = _run(_execute())
+    ok_(time.time() - start >= .05)
+    eq_(result['actuated_electrodes'], ['electrode000', 'electrode002'])
+    eq_(simulator.actuations, [['electrode000', 'electrode002']])
+    eq_((simulator.voltage, simulator.frequency), (100, 10e3))
+
+
+@raises(SimulatedFailure)
+def test_simulated_failure():
+    """
+    test simulator injects request failures
+    """
+    simulator = _simulator(latency_s=0, failure_rate=1.)
+    _run(simulator.set_voltage(100))
@@ -0,0 +1,67 @@
+from nose.tools import eq_
+import numpy as np
+import pandas as pd
+
+from spatial_index import ElectrodeSpatialIndex
+
+
+def _grid_shapes(rows=3, columns=4, size=2., gap=.5):
+    '''
+    Returns
+    -------
+    pandas.DataFrame
+        Vertices of ``rows x columns`` square electrodes, identified as
+        ``electrode<row><column>``.
+    '''
+    vertices = []
+    for row in xrange(rows):
+        for column in xrange(columns):
+            x = column * (size + gap)
+            y = row * (size + gap)
+            for i, (x_i, y_i) in enumerate([(x, y), (x + size, y),
+                                            (x + size, y + size),
+                                            (x, y + size)]):
+                vertices.append(('electrode%d%d' % (row, column), i, x_i,
+                                 y_i))
+    return pd.DataFrame(vertices, columns=['id', 'vertex_i', 'x', 'y'])
+
+
+def test_electrode_at():
+    """
+    test spatial index point queries
+    """
+    index = ElectrodeSpatialIndex(_grid_shapes())
+    eq_(index.electrode_at(1, 1), 'electrode00')
+    eq_(index.electrode_at(6, 3.5), 'electrode12')
+    # Gap between electrodes.
+    eq_(index.electrode_at(2.2, 1), None)
+    # Outside device.
+    eq_(index.electrode_at(-1, 1), None)
+    eq_(index.electrode_indexes_at([1, 2.2, 6], [1, 1, 3.5]).tolist(),
+        [0, -1, 6])
+
+
+def test_electrodes_in_rect():
+    """
+    test spatial index rectangle queries
+    """
+    index = ElectrodeSpatialIndex(_grid_shapes())
+    eq_(index.electrodes_in_rect(1, 1, 3, 3),
+        ['electrode00', 'electrode01', 'electrode10', 'electrode11'])
+    eq_(index.electrodes_in_rect(-1, -1, 4.6, 2.1, contained=True),
+        ['electrode00', 'electrode01'])
+
+
+def test_nearest_electrode():
+    """
+    test spatial index nearest electrode queries
+    """
+    index = ElectrodeSpatialIndex(_grid_shapes())
+    eq_(index.nearest_electrode(1, 1), ('electrode00', 0))
+    electrode_id, distance = index.nearest_electrode(2.1, 1)
+    eq_(electrode_id, 'electrode00')
+    assert np.isclose(distance, .1)
+    electrode_id, distance = index.nearest_electrode(20, 6)
+    eq_(electrode_id, 'electrode23')
+    assert np.isclose(distance, 20 - 9.5)
+    eq_(index.nearest_electrode(20, 6, max_distance=1), (None, None))
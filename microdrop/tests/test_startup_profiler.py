@@ -0,0 +1,55 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from nose.tools import eq_, ok_
+import path_helpers as ph
+
+import startup_profiler
+
+
+def test_startup_profiler():
+    """
+    test startup phases are written to Chrome trace and summary table
+    """
+    output_dir = ph.path(tempfile.mkdtemp(prefix='microdrop-profile-'))
+    trace_path = output_dir.joinpath('trace.json')
+    os.environ.pop(startup_profiler.STARTUP_PROFILE_ENV, None)
+    try:
+        # Profiler disabled by default.
+        args = argparse.Namespace(profile_startup=False)
+        ok_(startup_profiler.enable_from_args(args) is None)
+        with startup_profiler.phase('ignored'):
+            pass
+        ok_(startup_profiler.finish() is None)
+
+        os.environ[startup_profiler.STARTUP_PROFILE_ENV] = trace_path
+        profiler = startup_profiler.enable_from_args(args)
+        eq_(profiler.trace_path, trace_path)
+        with startup_profiler.phase('load_plugins', path='plugins'):
+            with startup_profiler.phase('import foo_plugin',
+                                        category='plugin'):
+                time.sleep(.01)
+        ok_(startup_profiler.finish() is profiler)
+
+        trace = json.loads(trace_path.bytes())
+        events = trace['traceEvents']
+        eq_([(e['name'], e['cat'], e['ph']) for e in events],
+            [('load_plugins', 'startup', 'X'),
+             ('import foo_plugin', 'plugin', 'X')])
+        eq_(events[0]['args']['path'], 'plugins')
+        ok_(events[1]['dur'] >= 10000)
+        ok_(events[0]['dur'] >= events[1]['dur'])
+        ok_('cpu_ms' in events[1]['args'])
+
+        summary = profiler.summary().splitlines()
+        ok_(summary[2].startswith('load_plugins '))
+        ok_(summary[3].startswith('  import foo_plugin '))
+        ok_(summary[-1].startswith('Total'))
+    finally:
+        os.environ.pop(startup_profiler.STARTUP_PROFILE_ENV, None)
+        startup_profiler.finish()
+        shutil.rmtree(output_dir)
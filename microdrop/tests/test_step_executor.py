@@ -0,0 +1,68 @@
+import threading
+
+from nose.tools import assert_raises, eq_, ok_
+import blinker
+import trollius as asyncio
+
+# Step execution does not depend on GTK.
+import microdrop.headless
+from microdrop.core_plugins.protocol_controller import (StepExecutor,
+                                                        StepNamespace)
+
+
+@asyncio.coroutine
+def _thread_ident(delay_s=0):
+    yield asyncio.From(asyncio.sleep(delay_s))
+    raise asyncio.Return(threading.current_thread().ident)
+
+
+def test_step_executor():
+    """
+    test coroutines run on the same long-lived event loop thread
+    """
+    executor = StepExecutor().start()
+    try:
+        idents = [executor.submit(_thread_ident).result(timeout=5)
+                  for i in xrange(3)]
+        eq_(len(set(idents)), 1)
+        ok_(idents[0] != threading.current_thread().ident)
+        eq_(idents[0], executor.thread.ident)
+    finally:
+        executor.stop()
+    ok_(executor.thread is None)
+
+
+def test_step_executor_cancel():
+    """
+    test cancelling a running coroutine
+    """
+    executor = StepExecutor().start()
+    try:
+        future = executor.submit(_thread_ident, 10)
+        executor.cancel(future)
+        assert_raises(asyncio.CancelledError, future.result, 5)
+        # Executor still runs other coroutines.
+        ok_(executor.submit(_thread_ident).result(timeout=5))
+    finally:
+        executor.stop()
+
+
+def test_step_namespace():
+    """
+    test step signals are sent to receivers subscribed to run namespace
+    """
+    signals = blinker.Namespace()
+    calls = []
+    signals.signal('on-actuation-request')\
+        .connect(lambda sender, **kwargs: calls.append(('run', sender)),
+                 weak=False)
+
+    for i in xrange(2):
+        step_signals = StepNamespace(signals)
+        step_signals.signal('on-actuation-request')\
+            .connect(lambda sender, **kwargs: calls.append(('step', sender)),
+                     weak=False)
+        step_signals.signal('on-actuation-request').send(i)
+    eq_(sorted(calls), [('run', 0), ('run', 1), ('step', 0), ('step', 1)])
+    # Step receivers are not added to run namespace.
+    eq_(len(signals.signal('on-actuation-request').receivers), 1)
@@ -0,0 +1,93 @@
+from StringIO import StringIO
+
+from nose.tools import eq_
+import pandas as pd
+from svg_model import svg_shapes_to_df
+from svg_model.connections import extract_connections
+from svg_model.shapes_canvas import ShapesCanvas
+
+from dmf_device import ELECTRODES_XPATH
+from svg_stream import VertexBuffer, read_device_svg
+
+
+SVG_TEMPLATE = '''<?xml version="1.0" encoding="UTF-8"?>
+<svg xmlns="http://www.w3.org/2000/svg"
+     xmlns:inkscape="http://www.inkscape.org/namespaces/inkscape">
+  <g inkscape:label="Background" inkscape:groupmode="layer">
+    <path id="background0" d="M 0,0 L 500,0 L 500,500 Z" />
+    <text>Label</text>
+  </g>
+  <g inkscape:label="Device" inkscape:groupmode="layer">
+    %s
+  </g>
+  <g inkscape:label="Connections" inkscape:groupmode="layer">
+    %s
+    <g><line id="nested" x1="5" y1="5" x2="25" y2="5" /></g>
+  </g>
+</svg>'''
+
+
+def _svg():
+    '''
+    Returns
+    -------
+    str
+        SVG document with a row of 6 electrodes (paths and polygons, some
+        nested in groups), connection lines, and a background layer.
+    '''
+    electrodes = []
+    for i in xrange(6):
+        x = 20 * i
+        if i % 2:
+            shape = ('<polygon id="electrode%d" data-channels="%d" '
+                     'points="%d,0 %d,0 %d,10 %d,10" />' %
+                     (i, i, x, x + 10, x + 10, x))
+        else:
+            shape = ('<path id="electrode%d" style="fill:#000000" '
+                     'd="M %d,0 L %d,0 L %d,10 L %d,10 Z" />' %
+                     (i, x, x + 10, x + 10, x))
+        if i == 4:
+            shape = '<g>%s</g>' % shape
+        electrodes.append(shape)
+    lines = ['<line id="line%d" x1="%d" y1="5" x2="%d" y2="5" />' %
+             (i, 20 * i + 5, 20 * i + 25) for i in xrange(5)]
+    # Path connection and connection with an end point outside electrodes.
+    lines += ['<path id="path0" d="M 5,5 L 45,5" />',
+              '<line id="outside" x1="5" y1="5" x2="5" y2="50" />']
+    return SVG_TEMPLATE % ('\n    '.join(electrodes), '\n    '.join(lines))
+
+
+def test_read_device_svg():
+    """
+    test streaming SVG reader matches `svg_model`
+    """
+    svg = _svg()
+    df_shapes, df_shape_connections = read_device_svg(StringIO(svg))
+
+    df_expected = svg_shapes_to_df(StringIO(svg), xpath=ELECTRODES_XPATH)
+    pd.testing.assert_frame_equal(df_shapes, df_expected)
+    eq_(df_shapes.id.unique().tolist(),
+        ['electrode%d' % i for i in xrange(6)])
+
+    df_expected = extract_connections(StringIO(svg),
+                                      ShapesCanvas(df_expected, 'id'))
+    pd.testing.assert_frame_equal(df_shape_connections, df_expected)
+    eq_(df_shape_connections.line_id.tolist(),
+        ['line%d' % i for i in xrange(5)] + ['path0'])
+
+    # No electrodes or connections.
+    df_shapes, df_shape_connections = \
+        read_device_svg(StringIO(SVG_TEMPLATE % ('', '')))
+    eq_(df_shapes.shape[0], 0)
+    eq_(df_shape_connections.shape[0], 0)
+
+
+def test_vertex_buffer():
+    """
+    test vertex buffer grows beyond preallocated capacity
+    """
+    vertices = VertexBuffer(capacity=2)
+    eq_(vertices.extend([]), 0)
+    eq_(vertices.extend([('1', '2'), ('3.5', '-4e1')]), 2)
+    eq_(vertices.extend([(5, 6)] * 3), 3)
+    eq_(vertices.xy.tolist(), [[1, 2], [3.5, -40]] + [[5, 6]] * 3)
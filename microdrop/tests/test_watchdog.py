@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+
+from nose.tools import eq_, ok_
+from pyutilib.component.core import Plugin, PluginGlobals, implements
+
+from microdrop.interfaces import IPlugin
+from microdrop.watchdog import MainLoopWatchdog
+import microdrop.plugin_manager as pm
+
+
+PluginGlobals.push_env('microdrop.managed')
+
+
+class StallPlugin(Plugin):
+    implements(IPlugin)
+
+    def __init__(self):
+        self.name = 'microdrop.test_stall'
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def on_test_stall(self):
+        self.entered.set()
+        self.release.wait(5)
+
+    def on_test_tracked(self):
+        return pm.get_active_dispatch(threading.current_thread().ident)
+
+
+PluginGlobals.pop_env()
+
+
+def _wait_for(condition, timeout_s=5):
+    start = time.time()
+    while not condition() and time.time() - start < timeout_s:
+        time.sleep(.01)
+    return condition()
+
+
+def test_watchdog_attributes_stall():
+    """
+    test stall is attributed to signal observer blocking main loop thread
+    """
+    plugin = StallPlugin()
+    # Heartbeats are sent explicitly below.
+    watchdog = MainLoopWatchdog(threshold_s=.2, interval_s=.05,
+                                schedule=lambda interval_ms, callback: None)
+    thread = threading.Thread(target=pm.emit_signal, args=('on_test_stall', ))
+    try:
+        pm.track_dispatch(True)
+        thread.start()
+        ok_(plugin.entered.wait(5))
+        watchdog.start(thread)
+
+        ok_(_wait_for(lambda: watchdog._stall is not None))
+        eq_(watchdog._stall.offender, 'on_test_stall: microdrop.test_stall')
+        ok_(any(function == 'on_test_stall'
+                for filename, lineno, function, text in watchdog._stall.stack))
+
+        # Main loop recovers.
+        plugin.release.set()
+        thread.join()
+        eq_(pm.get_active_dispatch(thread.ident), None)
+        watchdog.beat()
+        ok_(_wait_for(lambda: watchdog.stalls))
+        ok_(watchdog.stalls[0].duration > 0)
+        report = watchdog.report().splitlines()
+        eq_(report[0], 'GTK main loop stalls (> 0.2 s): 1')
+        ok_(report[2].endswith('on_test_stall: microdrop.test_stall'))
+    finally:
+        plugin.release.set()
+        watchdog.stop()
+        plugin.deactivate()
+
+
+class _RecordHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_tracked_dispatch():
+    """
+    test tracked dispatch records active observer and keeps debug logging
+    """
+    plugin = StallPlugin()
+    handler = _RecordHandler()
+    root = logging.getLogger()
+    level = root.level
+    root.addHandler(handler)
+    root.setLevel(logging.DEBUG)
+    try:
+        pm.track_dispatch(True)
+        result = pm.emit_signal('on_test_tracked')
+        eq_(result[plugin.name], ('on_test_tracked', plugin.name))
+        eq_(pm.get_active_dispatch(threading.current_thread().ident), None)
+        ok_('  call: %s.on_test_tracked(...)' % plugin.name in
+            handler.messages)
+    finally:
+        pm.track_dispatch(False)
+        root.setLevel(level)
+        root.removeHandler(handler)
+        plugin.release.set()
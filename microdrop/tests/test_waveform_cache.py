@@ -0,0 +1,211 @@
+import time
+
+from nose.tools import assert_raises, eq_, ok_
+import blinker
+import pandas as pd
+import trollius as asyncio
+
+from microdrop.core_plugins.electrode_controller_plugin.execute import \
+    execute_actuation, WaveformCache
+
+
+class WaveformGenerator(object):
+    def __init__(self, latency_s=0, fail=False):
+        self.latency_s = latency_s
+        # `True` or name of parameter to fail setting.
+        self.fail = fail
+        self.calls = []
+
+    @asyncio.coroutine
+    def _set(self, key, value):
+        self.calls.append((key, value))
+        if self.fail == key:
+            raise RuntimeError('Failed to set %s.' % key)
+        yield asyncio.From(asyncio.sleep(self.latency_s))
+        if self.fail is True:
+            raise RuntimeError('Failed to set %s.' % key)
+        raise asyncio.Return(value)
+
+    def set_voltage(self, voltage):
+        return self._set('voltage', voltage)
+
+    def set_frequency(self, frequency):
+        return self._set('frequency', frequency)
+
+    @asyncio.coroutine
+    def actuate(self, electrode_states, duration_s=0):
+        raise asyncio.Return(electrode_states.index.tolist())
+
+    def connect(self, signals):
+        signals.signal('on-actuation-request').connect(self.actuate,
+                                                       weak=False)
+        signals.signal('set-voltage').connect(self.set_voltage, weak=False)
+        signals.signal('set-frequency').connect(self.set_frequency,
+                                                weak=False)
+
+
+class ClosureWaveformGenerator(WaveformGenerator):
+    def __init__(self, identify=True, **kwargs):
+        super(ClosureWaveformGenerator, self).__init__(**kwargs)
+        self.identify = identify
+
+    def connect(self, signals):
+        # Connect new closures to each step namespace.
+        def set_voltage(voltage):
+            return self._set('voltage', voltage)
+
+        def set_frequency(frequency):
+            return self._set('frequency', frequency)
+
+        for key, receiver in (('voltage', set_voltage),
+                              ('frequency', set_frequency)):
+            if self.identify:
+                receiver.waveform_generator = self
+            signals.signal('set-%s' % key).connect(receiver, weak=False)
+        signals.signal('on-actuation-request').connect(self.actuate,
+                                                       weak=False)
+
+
+def _run(coroutine):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+        asyncio.set_event_loop(None)
+
+
+@asyncio.coroutine
+def _actuate(generator, cache, voltage, frequency):
+    # Connect to new signals namespace for each step (like a plugin would).
+    signals = blinker.Namespace()
+    generator.connect(signals)
+    yield asyncio.From(execute_actuation(signals, pd.Series(), pd.Series(),
+                                         voltage, frequency, 0,
+                                         waveform_cache=cache))
+
+
+def test_waveform_cache():
+    """
+    test only changed waveform parameters are set, concurrently
+    """
+    generator = WaveformGenerator(latency_s=.05)
+    cache = WaveformCache()
+
+    start = time.time()
+    _run(_actuate(generator, cache, 100, 10e3))
+    # Frequency and voltage are set concurrently.
+    ok_(time.time() - start < .09)
+    eq_(sorted(generator.calls), [('frequency', 10e3), ('voltage', 100)])
+
+    del generator.calls[:]
+    _run(_actuate(generator, cache, 100, 10e3))
+    eq_(generator.calls, [])
+
+    _run(_actuate(generator, cache, 90, 10e3))
+    eq_(generator.calls, [('voltage', 90)])
+
+    del generator.calls[:]
+    cache.invalidate()
+    _run(_actuate(generator, cache, 90, 10e3))
+    eq_(sorted(generator.calls), [('frequency', 10e3), ('voltage', 90)])
+
+
+def test_waveform_cache_receivers():
+    """
+    test waveform parameters are set again on different waveform generators
+    """
+    cache = WaveformCache()
+    _run(_actuate(WaveformGenerator(), cache, 100, 10e3))
+
+    generator = WaveformGenerator()
+    _run(_actuate(generator, cache, 100, 10e3))
+    eq_(sorted(generator.calls), [('frequency', 10e3), ('voltage', 100)])
+
+
+def test_waveform_cache_generators():
+    """
+    test waveform cache is invalidated when waveform generators change
+    """
+    generator = WaveformGenerator()
+    cache = WaveformCache()
+    _run(_actuate(generator, cache, 100, 10e3))
+
+    @asyncio.coroutine
+    def _actuate_voltage_generator():
+        # Only connect new generator to `set-voltage`.
+        signals = blinker.Namespace()
+        generator.connect(signals)
+        signals.signal('set-voltage').connect(WaveformGenerator().set_voltage,
+                                              weak=False)
+        yield asyncio.From(execute_actuation(signals, pd.Series(),
+                                             pd.Series(), 100, 10e3, 0,
+                                             waveform_cache=cache))
+
+    del generator.calls[:]
+    _run(_actuate_voltage_generator())
+    eq_(sorted(generator.calls), [('frequency', 10e3), ('voltage', 100)])
+
+
+def test_waveform_cache_error():
+    """
+    test waveform cache is invalidated when setting waveform fails
+    """
+    generator = WaveformGenerator()
+    cache = WaveformCache()
+    _run(_actuate(generator, cache, 100, 10e3))
+
+    generator.fail = True
+    assert_raises(RuntimeError, _run, _actuate(generator, cache, 90, 10e3))
+
+    generator.fail = False
+    del generator.calls[:]
+    _run(_actuate(generator, cache, 100, 10e3))
+    eq_(sorted(generator.calls), [('frequency', 10e3), ('voltage', 100)])
+
+
+def test_waveform_cache_closures():
+    """
+    test waveform cache identifies generators connecting closures each step
+    """
+    generator = ClosureWaveformGenerator()
+    cache = WaveformCache()
+    _run(_actuate(generator, cache, 100, 10e3))
+    del generator.calls[:]
+    _run(_actuate(generator, cache, 100, 10e3))
+    eq_(generator.calls, [])
+
+    # Closures without a waveform generator identity are never cached (even
+    # if a new closure reuses the address of a collected one).
+    generator = ClosureWaveformGenerator(identify=False)
+    for i in xrange(3):
+        del generator.calls[:]
+        _run(_actuate(generator, cache, 100, 10e3))
+        eq_(sorted(generator.calls), [('frequency', 10e3), ('voltage', 100)])
+
+
+def test_waveform_cache_concurrent_error():
+    """
+    test parameter set concurrently with a failure is not cached
+    """
+    generator = WaveformGenerator(latency_s=.05, fail='frequency')
+    cache = WaveformCache()
+
+    @asyncio.coroutine
+    def _actuate_failure():
+        try:
+            yield asyncio.From(_actuate(generator, cache, 100, 10e3))
+        except RuntimeError:
+            # Voltage is set after frequency failed.
+            yield asyncio.From(asyncio.sleep(.1))
+        else:
+            raise AssertionError('Setting frequency did not fail.')
+
+    _run(_actuate_failure())
+    eq_(sorted(generator.calls), [('frequency', 10e3), ('voltage', 100)])
+
+    generator.fail = False
+    del generator.calls[:]
+    _run(_actuate(generator, cache, 100, 10e3))
+    eq_(sorted(generator.calls), [('frequency', 10e3), ('voltage', 100)])
@@ -0,0 +1,226 @@
+'''
+.. versionadded:: X.X.X
+
+GTK main loop latency watchdog.
+
+A heartbeat callback is scheduled on the GTK main loop (see
+:func:`gobject.timeout_add`) and a background thread checks how long ago the
+last heartbeat ran.  When the main loop does not respond for longer than a
+threshold (e.g., a long synchronous handler on the GTK thread), the watchdog
+captures the stack of the GTK thread and the signal and observer currently
+dispatched by :func:`microdrop.plugin_manager.emit_signal`, and logs a
+warning.  Once the main loop recovers, the stall duration is added to the
+session statistics for the offender; :meth:`MainLoopWatchdog.report` ranks
+offenders by total stall time.
+
+Example
+-------
+
+    >>> watchdog = MainLoopWatchdog(threshold_s=.5)
+    >>> watchdog.start(gtk_thread)
+    >>> ...
+    >>> watchdog.stop()
+    >>> logging.info(watchdog.report())
+'''
+from StringIO import StringIO
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from . import plugin_manager
+
+logger = logging.getLogger(__name__)
+
+
+class Stall(object):
+    '''
+    Main loop stall.
+
+    Attributes
+    ----------
+    start : float
+        Time of last heartbeat before stall.
+    offender : str
+        Signal and observer (``<function>: <observer>``) dispatched when stall
+        was detected, or innermost function of GTK thread stack.
+    stack : list
+        GTK thread stack (see :func:`traceback.extract_stack`) when stall was
+        detected.
+    duration : float
+        Stall duration (in seconds), ``None`` until main loop recovers.
+    '''
+    def __init__(self, start, offender, stack):
+        self.start = start
+        self.offender = offender
+        self.stack = stack
+        self.duration = None
+
+
+class MainLoopWatchdog(object):
+    '''
+    Parameters
+    ----------
+    threshold_s : float, optional
+        Minimum main loop response time (in seconds) reported as a stall.
+    interval_s : float, optional
+        Heartbeat interval (in seconds).
+    schedule : function, optional
+        Function scheduling a periodic callback on the main loop, called as
+        ``schedule(interval_ms, callback)`` (default:
+        :func:`gobject.timeout_add`).
+
+    Attributes
+    ----------
+    stalls : list
+        Stalls recorded this session.
+    '''
+    def __init__(self, threshold_s=1., interval_s=.1, schedule=None):
+        if schedule is None:
+            import gobject
+
+            schedule = gobject.timeout_add
+        self.threshold_s = threshold_s
+        self.interval_s = interval_s
+        self.schedule = schedule
+        self.stalls = []
+        self.last_beat = None
+        self.thread_ident = None
+        self._stall = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def beat(self):
+        '''
+        Heartbeat main loop callback.
+
+        Returns
+        -------
+        bool
+            ``True`` until watchdog is stopped (i.e., repeat callback).
+        '''
+        self.last_beat = time.time()
+        return not self._stopped.is_set()
+
+    def start(self, thread=None):
+        '''
+        Start heartbeat and watchdog thread.
+
+        Parameters
+        ----------
+        thread : threading.Thread, optional
+            Thread running the GTK main loop (default: current thread).
+
+        Returns
+        -------
+        MainLoopWatchdog
+            Watchdog.
+        '''
+        if thread is None:
+            thread = threading.current_thread()
+        self.thread_ident = thread.ident
+        self._stopped.clear()
+        self.last_beat = time.time()
+        self.schedule(int(self.interval_s * 1e3), self.beat)
+        plugin_manager.track_dispatch(True)
+        self._thread = threading.Thread(target=self._watch,
+                                        name='MainLoopWatchdog')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        '''
+        Stop heartbeat and watchdog thread.
+        '''
+        self._stopped.set()
+        plugin_manager.track_dispatch(False)
+        if self._thread is not None and \
+                self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def _watch(self):
+        while not self._stopped.wait(min(self.interval_s,
+                                         .25 * self.threshold_s)):
+            self.check()
+
+    def check(self, now=None):
+        '''
+        Detect start of stall or record end of stall.
+
+        Parameters
+        ----------
+        now : float, optional
+            Current time (default: :func:`time.time`).
+        '''
+        if now is None:
+            now = time.time()
+        last_beat = self.last_beat
+        stall = self._stall
+        if stall is None:
+            if now - last_beat - self.interval_s > self.threshold_s:
+                self._stall = stall = self.capture(last_beat)
+                logger.warning('GTK main loop not responding for %.1f s: %s',
+                               now - last_beat, stall.offender)
+                map(logger.debug, traceback.format_list(stall.stack))
+        elif last_beat > stall.start:
+            # Main loop recovered.
+            stall.duration = max(last_beat - stall.start - self.interval_s,
+                                 0)
+            self.stalls.append(stall)
+            self._stall = None
+            logger.warning('GTK main loop stalled for %.1f s: %s',
+                           stall.duration, stall.offender)
+
+    def capture(self, start):
+        '''
+        Returns
+        -------
+        Stall
+            Stall with offender and stack captured from GTK thread.
+        '''
+        frame = sys._current_frames().get(self.thread_ident)
+        stack = traceback.extract_stack(frame) if frame is not None else []
+        dispatch = plugin_manager.get_active_dispatch(self.thread_ident)
+        if dispatch is not None:
+            offender = '%s: %s' % dispatch
+        elif stack:
+            filename, lineno, function, text = stack[-1]
+            offender = '%s (%s:%d)' % (function, filename, lineno)
+        else:
+            offender = 'unknown'
+        return Stall(start, offender, stack)
+
+    def report(self, count=10):
+        '''
+        Parameters
+        ----------
+        count : int, optional
+            Maximum number of offenders to list.
+
+        Returns
+        -------
+        str
+            Offenders ranked by total stall time, with the number of stalls
+            and the longest stall for each offender.
+        '''
+        offenders = {}
+        for stall in self.stalls:
+            total, stalls, longest = offenders.get(stall.offender, (0, 0, 0))
+            offenders[stall.offender] = (total + stall.duration, stalls + 1,
+                                         max(longest, stall.duration))
+        output = StringIO()
+        print >> output, ('GTK main loop stalls (> %.1f s): %d' %
+                          (self.threshold_s, len(self.stalls)))
+        if offenders:
+            print >> output, '%10s %6s %10s  %s' % ('Total (s)', 'Count',
+                                                    'Max (s)', 'Offender')
+            for offender, (total, stalls, longest) in \
+                    sorted(offenders.iteritems(),
+                           key=lambda item: -item[1][0])[:count]:
+                print >> output, '%10.1f %6d %10.1f  %s' % (total, stalls,
+                                                            longest,
+                                                            offender)
+        return output.getvalue().rstrip()